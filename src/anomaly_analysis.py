@@ -7,98 +7,294 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from data_loader import EnergyDataLoader
+from session import get_session
+from intervals import StateIntervals
+from time_grid import detect_step
+from threshold_sweep import ThresholdSweep
+from rolling_detector import RollingAnomalyDetector
+from cleaning import PercentileFilter
+from anomaly_model import AnomalyModelService
+from physics_check import PhysicsResidualChecker, COEFFICIENTS
+from downtime_analysis import DowntimeAnalyzer
+from decimation import decimate_for_axes, decimate_points_for_axes
+from parallel_render import FigureRenderer
+from artifact_cache import ArtifactCache
 from config import CONSTRAINTS, GTA_COLUMNS, FIGURES_PATH
 import os
 
 sns.set_style("whitegrid")
 
+# Values this low mean the unit is effectively shut down
+NEAR_ZERO_RULES = [
+    ('hp_near_zero', 'HP_Admission', '<', 10),
+    ('mp_near_zero', 'MP_Extraction', '<', 10),
+]
+
 
 class AnomalyAnalyzer:
     """Analyze and visualize anomalies in the energy data"""
 
-    def __init__(self):
-        self.loader = EnergyDataLoader()
-        self.data = self.loader.load_data()
-        self.totals = self.loader.calculate_system_totals()
+    def __init__(self, session=None):
+        self.session = session if session is not None else get_session()
+        self.loader = self.session.loader
+        self.artifacts = ArtifactCache(self.session, self)
         os.makedirs(FIGURES_PATH, exist_ok=True)
 
+    @property
+    def data(self):
+        """The session's current frame (follows load_data and append)"""
+        return self.session.data
+
+    @property
+    def totals(self):
+        """Memoized system totals of the session's current frame"""
+        return self.session.system_totals()
+
     def detect_anomalies_by_constraints(self):
         """Detect anomalies based on stated constraints"""
-        anomaly_report = {}
+        # Near-zero values (likely shutdowns) are checked alongside the constraints
+        result = self.loader.check_constraints(extra_rules=NEAR_ZERO_RULES, pack_masks=True)
 
-        for gta_name, columns in GTA_COLUMNS.items():
-            hp_col, mp_col, ee_col = columns
-
-            # Find constraint violations
-            hp_above_max = self.data[hp_col] > CONSTRAINTS['max_hp_steam_input']
-            hp_below_min = self.data[hp_col] < CONSTRAINTS['min_steam_requirement']
-            mp_above_max = self.data[mp_col] > CONSTRAINTS['max_mp_steam_extraction']
-            ee_above_max = self.data[ee_col] > CONSTRAINTS['max_energy_production']
+        anomaly_report = {}
 
-            # Near-zero values (likely shutdowns)
-            hp_near_zero = self.data[hp_col] < 10
-            mp_near_zero = self.data[mp_col] < 10
+        for gta_name in GTA_COLUMNS.keys():
+            hp_violations = result.mask('hp_above_max', gta_name) | result.mask('hp_below_min', gta_name)
 
             anomaly_report[gta_name] = {
-                'hp_above_max': hp_above_max.sum(),
-                'hp_below_min': hp_below_min.sum(),
-                'mp_above_max': mp_above_max.sum(),
-                'ee_above_max': ee_above_max.sum(),
-                'hp_near_zero': hp_near_zero.sum(),
-                'mp_near_zero': mp_near_zero.sum(),
-                'hp_violations_mask': hp_above_max | hp_below_min,
-                'mp_violations_mask': mp_above_max,
+                'hp_above_max': result.count('hp_above_max', gta_name),
+                'hp_below_min': result.count('hp_below_min', gta_name),
+                'mp_above_max': result.count('mp_above_max', gta_name),
+                'ee_above_max': result.count('ee_above_max', gta_name),
+                'hp_near_zero': result.count('hp_near_zero', gta_name),
+                'mp_near_zero': result.count('mp_near_zero', gta_name),
+                'hp_violations_mask': pd.Series(hp_violations, index=self.data.index),
+                'mp_violations_mask': pd.Series(result.mask('mp_above_max', gta_name),
+                                                index=self.data.index),
             }
 
         return anomaly_report
 
+    def violation_intervals(self, rule='mp_above_max'):
+        """Run-length index of one constraint rule's violations for all GTAs
+
+        `rule` is a ConstraintEngine rule name (e.g. 'mp_above_max',
+        'hp_above_max', 'hp_below_min'); memoized on the session. Runs are
+        over consecutive rows, which are consecutive time slots only on the
+        time grid (align_to_grid=True).
+        """
+
+        def compute():
+            result = self.loader.check_constraints(pack_masks=True)
+            masks = np.column_stack([result.mask(rule, gta_name) for gta_name in GTA_COLUMNS])
+            return StateIntervals(self.data.index, masks, list(GTA_COLUMNS))
+
+        return self.session.memoize(('violation_intervals', rule), compute)
+
     def analyze_temporal_distribution(self):
         """Check when anomalies occur - are they clustered or random?"""
         print("\n" + "="*70)
         print("TEMPORAL DISTRIBUTION OF ANOMALIES")
         print("="*70)
 
-        for gta_name, columns in GTA_COLUMNS.items():
-            hp_col, mp_col, ee_col = columns
+        # MP anomalies (most significant)
+        result = self.loader.check_constraints(pack_masks=True)
+        # Without a time grid rows can be missing or off the 15-minute phase,
+        # so runs are cut wherever two violations are more than one step apart
+        step = self.loader.grid.step if self.loader.grid is not None else detect_step(self.data.index)
 
-            # MP anomalies (most significant)
-            mp_violations = self.data[mp_col] > CONSTRAINTS['max_mp_steam_extraction']
-
-            if mp_violations.sum() > 0:
-                violation_data = self.data[mp_violations]
+        for gta_name, columns in GTA_COLUMNS.items():
+            mp_col = columns[1]
+            times = np.sort(self.data.index[result.mask('mp_above_max', gta_name)].as_unit('ns').asi8)
+            total_violations = len(times)
 
+            if total_violations > 0:
                 print(f"\n{gta_name} - MP Steam Violations:")
-                print(f"  Total violations: {mp_violations.sum():,} / {len(self.data):,} ({mp_violations.sum()/len(self.data)*100:.1f}%)")
-                print(f"  Date range: {violation_data.index.min()} to {violation_data.index.max()}")
+                print(f"  Total violations: {total_violations:,} / {len(self.data):,} ({total_violations/len(self.data)*100:.1f}%)")
+                print(f"  Date range: {pd.Timestamp(times[0])} to {pd.Timestamp(times[-1])}")
                 print(f"  Max value: {self.data[mp_col].max():.2f} tons/hour")
 
-                # Check if violations are continuous
-                violation_dates = violation_data.index.to_series()
-                gaps = violation_dates.diff()
-                continuous_periods = (gaps <= pd.Timedelta(minutes=15)).sum()
-                print(f"  Continuous violations: {continuous_periods:,} ({continuous_periods/len(violation_dates)*100:.1f}%)")
+                # A violation is continuous when it follows the previous one by at most one step
+                follows = np.diff(times) <= step.value
+                starts = np.flatnonzero(np.concatenate(([True], ~follows)))
+                ends = np.append(starts[1:] - 1, total_violations - 1)
+                longest = pd.Timedelta(int((times[ends] - times[starts]).max()))
+                continuous_periods = int(follows.sum())
+                print(f"  Continuous violations: {continuous_periods:,} ({continuous_periods/total_violations*100:.1f}%)")
+                print(f"  Violation periods: {len(starts):,} (longest {longest})")
+
+        print("\n" + "="*70)
+
+    def rolling_scores(self, window=96, hop=4, alpha=0.05, z_threshold=5.0):
+        """Robust and EWMA z-scores for every GTA and metric (memoized per configuration)
+
+        Returns (detector, scores, flags); arrays are (time, GTA, metric) as in
+        the loader's UnitArrayStore.
+        """
+
+        def compute():
+            detector = RollingAnomalyDetector(window=window, hop=hop, alpha=alpha,
+                                              z_threshold=z_threshold)
+            scores = detector.score(self.loader.get_store().values)
+            return detector, scores, detector.flags(scores)
+
+        return self.session.memoize(('rolling_scores', window, hop, alpha, z_threshold), compute)
+
+    def detect_anomalies_rolling(self, window=96, hop=4, alpha=0.05, z_threshold=5.0):
+        """Flag samples far from their own recent behaviour instead of a fixed limit"""
+        detector, scores, flags = self.rolling_scores(window, hop, alpha, z_threshold)
+        store = self.loader.get_store()
+        mp = store.metric_position('MP_Extraction')
+
+        print("\n" + "="*70)
+        print(f"ROLLING-STATISTICS ANOMALIES (|z| > {z_threshold:g}, "
+              f"window {window} samples, EWMA alpha {alpha:g})")
+        print("="*70)
+
+        report = {}
+        for u, gta_name in enumerate(store.units):
+            mp_static = store.series(gta_name, 'MP_Extraction') > CONSTRAINTS['max_mp_steam_extraction']
+            report[gta_name] = {}
+            print(f"\n{gta_name}:")
+            for m, metric in enumerate(store.metrics):
+                robust = int(flags['robust'][:, u, m].sum())
+                ewma = int(flags['ewma'][:, u, m].sum())
+                report[gta_name][metric] = {'robust': robust, 'ewma': ewma}
+                print(f"  {metric:<18} robust: {robust:>6,}   EWMA: {ewma:>6,}")
+
+            # How many constraint "violations" are also unusual for the unit itself
+            n_static = int(mp_static.sum())
+            both = int((mp_static & flags['robust'][:, u, mp]).sum())
+            report[gta_name]['mp_static_also_robust'] = both
+            if n_static:
+                print(f"  MP > {CONSTRAINTS['max_mp_steam_extraction']} t/h: {n_static:,} samples, "
+                      f"of which {both:,} ({both/n_static*100:.1f}%) are rolling anomalies")
+
+        print("\n" + "="*70)
+
+        return report
+
+    def anomaly_models(self, low_threshold=10):
+        """Per-GTA IsolationForest service (loaded from disk when the training data is unchanged)"""
+        return self.session.memoize(
+            ('anomaly_models', low_threshold),
+            lambda: AnomalyModelService(session=self.session, low_threshold=low_threshold).fit())
+
+    def detect_anomalies_multivariate(self, low_threshold=10):
+        """Flag unusual (HP, MP, EE) combinations with a per-GTA IsolationForest"""
+        service = self.anomaly_models(low_threshold)
+        store = self.loader.get_store()
+
+        print("\n" + "="*70)
+        print("MULTIVARIATE ANOMALIES (IsolationForest on operational data)")
+        print("="*70)
+
+        states = DowntimeAnalyzer(low_threshold, session=self.session).detect_operational_states()
+
+        report = {}
+        for gta_name in store.units:
+            # Downtime is not scored: the models only know operating behaviour
+            operational = states[f'{gta_name}_operational'].to_numpy()
+            flags = service.is_anomaly(gta_name, store.unit(gta_name)) & operational
+            mp_static = store.series(gta_name, 'MP_Extraction') > CONSTRAINTS['max_mp_steam_extraction']
+            info = service.fit_report[gta_name]
+            report[gta_name] = {
+                'anomalies': int(flags.sum()),
+                'mp_static_also_anomalous': int((flags & mp_static).sum()),
+                'model': info['status'],
+            }
+
+            print(f"\n{gta_name}: model {info['status']} ({info['training_rows']:,} operational rows)")
+            print(f"  Anomalous operational samples: {flags.sum():,} "
+                  f"({flags.sum()/operational.sum()*100:.1f}%)")
+            if mp_static.any():
+                print(f"  MP > {CONSTRAINTS['max_mp_steam_extraction']} t/h samples flagged: "
+                      f"{report[gta_name]['mp_static_also_anomalous']:,} / {mp_static.sum():,}")
+
+        print("\n" + "="*70)
+
+        return report
+
+    def check_physics_consistency(self, low_threshold=10, tolerance=3.0, hp_bands=None,
+                                  window=96 * 30, step=96):
+        """Flag samples whose energy does not follow the unit's EE ~ HP + MP relation
+
+        One fit per GTA (per HP load band when `hp_bands` are given, e.g.
+        [150, 190]) over operational samples, plus rolling refits over the
+        trailing `window` samples every `step` samples (default: 30 days,
+        refreshed daily) to catch drift.
+        """
+        store = self.loader.get_store()
+        values = store.values.astype(np.float64)
+        states = DowntimeAnalyzer(low_threshold, session=self.session).detect_operational_states()
+        operational = np.column_stack([states[f'{gta_name}_operational'].to_numpy()
+                                       for gta_name in store.units])
+
+        regimes, n_regimes = None, None
+        if hp_bands is not None:
+            regimes = np.digitize(values[:, :, store.metric_position('HP_Admission')], hp_bands)
+            n_regimes = len(hp_bands) + 1
+
+        checker = PhysicsResidualChecker(tolerance=tolerance)
+        fit = checker.fit(values, operational, regimes=regimes, n_regimes=n_regimes)
+        rolling = checker.rolling_fit(values, operational, window=window, step=step)
+
+        print("\n" + "="*70)
+        print("PHYSICS CONSISTENCY (EE ~ a + b*HP + c*MP on operational data)")
+        print("="*70)
+
+        report = {}
+        for u, gta_name in enumerate(store.units):
+            flags = fit['flags'][:, u]
+            rolling_flags = rolling['flags'][:, u]
+            report[gta_name] = {
+                'coefficients': pd.DataFrame(fit['coefficients'][:, u], columns=COEFFICIENTS),
+                'sigma': fit['sigma'][:, u],
+                'r2': fit['r2'][:, u],
+                'inconsistent': int(flags.sum()),
+                'inconsistent_rolling': int(rolling_flags.sum()),
+                'flags': pd.Series(flags, index=self.data.index),
+            }
+
+            print(f"\n{gta_name}:")
+            for r in range(len(fit['n'])):
+                a, b, c = fit['coefficients'][r, u]
+                label = f"  Regime {r}" if hp_bands is not None else "  Fit"
+                print(f"{label}: EE = {a:.2f} {b:+.4f}*HP {c:+.4f}*MP   "
+                      f"(R²={fit['r2'][r, u]:.3f}, σ={fit['sigma'][r, u]:.2f} MW, "
+                      f"n={int(fit['n'][r, u]):,})")
+            print(f"  Inconsistent samples: {flags.sum():,} "
+                  f"({flags.sum()/max(operational[:, u].sum(), 1)*100:.2f}% of operational)")
+            print(f"  Inconsistent vs rolling {window}-sample fit: {rolling_flags.sum():,}")
 
         print("\n" + "="*70)
 
+        return report
+
     def plot_anomaly_timeline(self):
         """Visualize when anomalies occur over time"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}anomaly_timeline.png")
+        if artifact.reused:
+            return
+
         fig, axes = plt.subplots(3, 1, figsize=(16, 10))
         fig.suptitle('Anomaly Timeline - MP Steam Extraction', fontsize=16, fontweight='bold')
 
         for idx, (gta_name, columns) in enumerate(GTA_COLUMNS.items()):
             mp_col = columns[1]
 
-            # Plot full data
-            axes[idx].plot(self.data.index, self.data[mp_col], alpha=0.5, linewidth=0.5, label='Actual')
+            # Plot full data (decimated to the pixel grid, spikes kept)
+            mp = self.data[mp_col].to_numpy()
+            keep = decimate_for_axes(axes[idx], self.data.index, mp)
+            axes[idx].plot(self.data.index[keep], mp[keep], alpha=0.5, linewidth=0.5, label='Actual')
 
             # Highlight constraint line
             axes[idx].axhline(y=CONSTRAINTS['max_mp_steam_extraction'],
                              color='red', linestyle='--', linewidth=2, label='Constraint (100 t/h)')
 
-            # Highlight violations
-            violations = self.data[self.data[mp_col] > CONSTRAINTS['max_mp_steam_extraction']]
-            axes[idx].scatter(violations.index, violations[mp_col],
+            # Highlight violations (one marker per occupied marker-sized cell)
+            violating = np.where(mp > CONSTRAINTS['max_mp_steam_extraction'], mp, np.nan)
+            keep = decimate_points_for_axes(axes[idx], violating, marker_size=5)
+            axes[idx].scatter(self.data.index[keep], violating[keep],
                             color='red', s=5, alpha=0.7, label='Violations')
 
             axes[idx].set_ylabel('MP Steam (tons/h)')
@@ -110,10 +306,15 @@ class AnomalyAnalyzer:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}anomaly_timeline.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}anomaly_timeline.png")
+        artifact.saved()
         plt.close()
 
     def plot_anomaly_zoom(self):
         """Zoom into anomaly periods to see patterns"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}anomaly_detail.png")
+        if artifact.reused:
+            return
+
         fig, axes = plt.subplots(3, 1, figsize=(16, 10))
         fig.suptitle('Anomaly Detail View - MP Steam Extraction', fontsize=16, fontweight='bold')
 
@@ -129,15 +330,20 @@ class AnomalyAnalyzer:
                 start = max(first_violation - pd.Timedelta(days=7), self.data.index.min())
                 end = min(first_violation + pd.Timedelta(days=7), self.data.index.max())
 
-                window_data = self.data.loc[start:end]
+                window_data = self.loader.slice_range(start, end)
 
-                axes[idx].plot(window_data.index, window_data[mp_col], linewidth=1)
+                mp = window_data[mp_col].to_numpy()
+                violating = mp > CONSTRAINTS['max_mp_steam_extraction']
+                keep = decimate_for_axes(axes[idx], window_data.index, mp, masks=[violating])
+                index, mp, violating = window_data.index[keep], mp[keep], violating[keep]
+
+                axes[idx].plot(index, mp, linewidth=1)
                 axes[idx].axhline(y=CONSTRAINTS['max_mp_steam_extraction'],
                                  color='red', linestyle='--', linewidth=2, label='Constraint')
-                axes[idx].fill_between(window_data.index,
+                axes[idx].fill_between(index,
                                       CONSTRAINTS['max_mp_steam_extraction'],
-                                      window_data[mp_col],
-                                      where=window_data[mp_col] > CONSTRAINTS['max_mp_steam_extraction'],
+                                      mp,
+                                      where=violating,
                                       alpha=0.3, color='red', label='Violation')
 
                 axes[idx].set_ylabel('MP Steam (tons/h)')
@@ -151,8 +357,78 @@ class AnomalyAnalyzer:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}anomaly_detail.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}anomaly_detail.png")
+        artifact.saved()
         plt.close()
 
+    def threshold_sweep(self, metric='MP_Extraction', op='>'):
+        """ThresholdSweep of one metric for all GTAs (columns sorted once, memoized)"""
+        return self.session.memoize(
+            ('threshold_sweep', metric, op),
+            lambda: ThresholdSweep.from_frame(self.data, metric, op=op))
+
+    def sweep_thresholds(self, thresholds=None, metric='MP_Extraction', op='>'):
+        """Violations, % of data removed and violation blocks for candidate limits
+
+        Parameters:
+        -----------
+        thresholds : array-like, optional
+            Candidate limits; defaults to 1000 values over the metric's range
+        metric : str
+            'HP_Admission', 'MP_Extraction' or 'Energy_Production'
+        op : str
+            '>' to test upper limits, '<' to test lower limits
+
+        Returns:
+        --------
+        DataFrame with columns unit, threshold, violations, pct_removed, blocks
+        """
+        if thresholds is None:
+            values = self.loader.get_store().metric(metric)
+            thresholds = np.linspace(np.nanmin(values), np.nanmax(values), 1000)
+        return self.threshold_sweep(metric, op).sweep(thresholds)
+
+    def plot_threshold_sweep(self, thresholds=None, metric='MP_Extraction', op='>',
+                             limits=(150, 180, 200)):
+        """Plot % of data removed and violation blocks against the candidate limit"""
+        sweep = self.sweep_thresholds(thresholds, metric=metric, op=op)
+
+        artifact = self.artifacts.get(f"{FIGURES_PATH}threshold_sweep.png",
+                                      {'thresholds': thresholds, 'metric': metric, 'op': op,
+                                       'limits': limits})
+        if not artifact.reused:
+            fig, axes = plt.subplots(2, 1, figsize=(14, 9), sharex=True)
+            fig.suptitle(f'Threshold Sweep - {metric} ({op} limit)', fontsize=16, fontweight='bold')
+
+            for gta_name, curve in sweep.groupby('unit', sort=False):
+                axes[0].plot(curve['threshold'], curve['pct_removed'], linewidth=1.5, label=gta_name)
+                axes[1].plot(curve['threshold'], curve['blocks'], linewidth=1.5, label=gta_name)
+
+            for limit in limits:
+                for ax in axes:
+                    ax.axvline(x=limit, color='gray', linestyle=':', linewidth=1)
+
+            axes[0].set_ylabel('Data removed (%)')
+            axes[1].set_ylabel('Violation blocks')
+            axes[1].set_xlabel(f'{metric} limit (tons/h)')
+            for ax in axes:
+                ax.legend(loc='upper right')
+                ax.grid(True, alpha=0.3)
+
+            plt.tight_layout()
+            plt.savefig(f"{FIGURES_PATH}threshold_sweep.png", dpi=300, bbox_inches='tight')
+            print(f"✓ Saved: {FIGURES_PATH}threshold_sweep.png")
+            artifact.saved()
+            plt.close()
+
+        # What-if summary at the highlighted limits
+        at_limits = self.sweep_thresholds(limits, metric=metric, op=op)
+        print(f"\n{metric} what-if ({op} limit):")
+        for row in at_limits.itertuples():
+            print(f"  {row.unit} @ {row.threshold:g}: {row.violations:,} violations "
+                  f"({row.pct_removed:.1f}%), {row.blocks:,} blocks")
+
+        return sweep
+
     def calculate_percentiles(self):
         """Calculate percentiles to understand data distribution"""
         print("\n" + "="*70)
@@ -160,19 +436,19 @@ class AnomalyAnalyzer:
         print("="*70)
 
         percentiles = [50, 75, 90, 95, 99, 99.5, 100]
+        # Each column is sorted once per session and shared with later callers
+        quantiles = self.session.quantiles()
 
         for gta_name, columns in GTA_COLUMNS.items():
             hp_col, mp_col, ee_col = columns
 
             print(f"\n{gta_name}:")
             print(f"  HP Steam Admission:")
-            for p in percentiles:
-                val = np.percentile(self.data[hp_col].dropna(), p)
+            for p, val in zip(percentiles, quantiles.percentile(hp_col, percentiles)):
                 print(f"    {p}th percentile: {val:.2f} tons/hour")
 
             print(f"  MP Steam Extraction:")
-            for p in percentiles:
-                val = np.percentile(self.data[mp_col].dropna(), p)
+            for p, val in zip(percentiles, quantiles.percentile(mp_col, percentiles)):
                 marker = " ⚠️ ABOVE CONSTRAINT" if val > CONSTRAINTS['max_mp_steam_extraction'] else ""
                 print(f"    {p}th percentile: {val:.2f} tons/hour{marker}")
 
@@ -237,40 +513,34 @@ class AnomalyAnalyzer:
         print("="*70)
 
         # Option 1: Remove only extreme outliers (>99.5th percentile)
-        data_clean_extreme = self.data.copy()
-        removed_extreme = 0
-
-        for gta_name, columns in GTA_COLUMNS.items():
-            hp_col, mp_col, ee_col = columns
-
-            # Remove only top 0.5% outliers
-            hp_99_5 = np.percentile(data_clean_extreme[hp_col].dropna(), 99.5)
-            mp_99_5 = np.percentile(data_clean_extreme[mp_col].dropna(), 99.5)
-
-            mask = (data_clean_extreme[hp_col] <= hp_99_5) & (data_clean_extreme[mp_col] <= mp_99_5)
-            removed_extreme += (~mask).sum()
-            data_clean_extreme = data_clean_extreme[mask]
+        # Thresholds come from the original data for every GTA, so the result
+        # does not depend on the order the GTAs are checked in
+        outlier_filter = PercentileFilter(
+            {gta_name: columns[:2] for gta_name, columns in GTA_COLUMNS.items()},
+            percentile=99.5, quantiles=self.session.quantiles())
+        data_clean_extreme, extreme_report = outlier_filter.apply(self.data, mode='drop')
+        removed_extreme = extreme_report['rows_removed']
 
         # Option 2: Keep data within stated constraints
-        data_clean_constraints = self.data.copy()
-        removed_constraints = 0
-
+        keep = np.ones(len(self.data), dtype=bool)
         for gta_name, columns in GTA_COLUMNS.items():
-            hp_col, mp_col, ee_col = columns
-
-            mask = (
-                (data_clean_constraints[hp_col] >= CONSTRAINTS['min_steam_requirement']) &
-                (data_clean_constraints[hp_col] <= CONSTRAINTS['max_hp_steam_input']) &
-                (data_clean_constraints[mp_col] <= CONSTRAINTS['max_mp_steam_extraction']) &
-                (data_clean_constraints[ee_col] <= CONSTRAINTS['max_energy_production'])
+            hp, mp, ee = (self.data[col].to_numpy() for col in columns)
+            keep &= (
+                (hp >= CONSTRAINTS['min_steam_requirement']) &
+                (hp <= CONSTRAINTS['max_hp_steam_input']) &
+                (mp <= CONSTRAINTS['max_mp_steam_extraction']) &
+                (ee <= CONSTRAINTS['max_energy_production'])
             )
-            removed_constraints += (~mask).sum()
-            data_clean_constraints = data_clean_constraints[mask]
+        data_clean_constraints = self.data[keep]
+        removed_constraints = int((~keep).sum())
 
         print(f"\nOriginal dataset: {len(self.data):,} records")
         print(f"\nOption 1 - Remove extreme outliers (>99.5th percentile):")
         print(f"  Remaining: {len(data_clean_extreme):,} records")
         print(f"  Removed: {removed_extreme:,} records ({removed_extreme/len(self.data)*100:.2f}%)")
+        print(f"  Removed by column (flagged / only cause):")
+        for col, row in extreme_report['by_column'].iterrows():
+            print(f"    {col:<22} > {row['threshold']:8.2f}: {int(row['flagged']):>5,} / {int(row['only_cause']):>5,}")
         print(f"  ✅ RECOMMENDED for optimization model")
 
         print(f"\nOption 2 - Enforce stated constraints:")
@@ -281,31 +551,42 @@ class AnomalyAnalyzer:
         if save:
             # Save cleaned dataset
             output_path = self.loader.filepath.replace('.csv', '_cleaned_extreme.csv')
-            data_clean_extreme.to_csv(output_path)
-            print(f"\n✅ Saved cleaned dataset to: {output_path}")
+            artifact = self.artifacts.get(output_path)
+            if not artifact.reused:
+                data_clean_extreme.to_csv(output_path)
+                print(f"\n✅ Saved cleaned dataset to: {output_path}")
+                artifact.saved()
 
         print("\n" + "="*70)
 
         return data_clean_extreme, data_clean_constraints
 
-    def run_full_analysis(self):
-        """Run complete anomaly analysis"""
+    def run_full_analysis(self, parallel=False, workers=None):
+        """Run complete anomaly analysis
+
+        With parallel=True the figures are rendered in `workers` forked
+        processes (default: one per CPU) while the text steps run; the
+        printed output is unchanged.
+        """
         print("\n🔍 Running Anomaly Analysis...\n")
 
-        print("1. Detecting anomalies by constraints...")
-        self.detect_anomalies_by_constraints()
+        with FigureRenderer(self, workers if parallel else 1) as renderer:
+            renderer.submit(['plot_anomaly_timeline', 'plot_anomaly_zoom'])
+
+            print("1. Detecting anomalies by constraints...")
+            self.detect_anomalies_by_constraints()
 
-        print("\n2. Analyzing temporal distribution...")
-        self.analyze_temporal_distribution()
+            print("\n2. Analyzing temporal distribution...")
+            self.analyze_temporal_distribution()
 
-        print("\n3. Calculating percentiles...")
-        self.calculate_percentiles()
+            print("\n3. Calculating percentiles...")
+            self.calculate_percentiles()
 
-        print("\n4. Plotting anomaly timeline...")
-        self.plot_anomaly_timeline()
+            print("\n4. Plotting anomaly timeline...")
+            renderer.result('plot_anomaly_timeline')
 
-        print("\n5. Plotting anomaly detail view...")
-        self.plot_anomaly_zoom()
+            print("\n5. Plotting anomaly detail view...")
+            renderer.result('plot_anomaly_zoom')
 
         print("\n6. Creating cleaned dataset options...")
         self.create_cleaned_dataset(save=False)
@@ -0,0 +1,232 @@
+"""
+Multivariate anomaly scoring with IsolationForest
+One model per GTA fitted on its operational samples (HP, MP, EE), persisted
+under outputs/models/ and reused while the training data is unchanged;
+scores come from a numpy traversal of the fitted trees, fast enough for
+one-row-at-a-time scoring of the live feed
+"""
+
+import glob
+import hashlib
+import json
+import os
+import joblib
+import numpy as np
+import sklearn
+from sklearn.ensemble import IsolationForest
+from config import GTA_COLUMNS, MODELS_PATH
+from session import get_session
+from downtime_analysis import DowntimeAnalyzer
+
+
+def average_path_length(n_samples):
+    """Average path length of an unsuccessful BST search among n samples, c(n)"""
+    n = np.asarray(n_samples, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        c = 2.0 * (np.log(n - 1.0) + np.euler_gamma) - 2.0 * (n - 1.0) / n
+    return np.where(n <= 1, 0.0, np.where(n == 2, 1.0, c))
+
+
+class CompiledForest:
+    """A fitted IsolationForest flattened into padded (tree x node) arrays
+
+    score_one reproduces IsolationForest.score_samples for one row by walking
+    all trees at once: every step is one gather per array, so a row costs
+    max_depth vectorized steps instead of a Python call per tree plus input
+    validation. Large batches are faster through scikit-learn itself.
+    """
+
+    def __init__(self, model):
+        trees = [estimator.tree_ for estimator in model.estimators_]
+        n_trees = len(trees)
+        n_nodes = max(tree.node_count for tree in trees)
+
+        self.left = np.zeros((n_trees, n_nodes), dtype=np.intp)
+        self.right = np.zeros((n_trees, n_nodes), dtype=np.intp)
+        self.feature = np.zeros((n_trees, n_nodes), dtype=np.intp)
+        self.threshold = np.zeros((n_trees, n_nodes))
+        self.leaf_value = np.zeros((n_trees, n_nodes))
+        self.max_depth = 0
+
+        for t, (tree, features) in enumerate(zip(trees, model.estimators_features_)):
+            count = tree.node_count
+            is_leaf = tree.children_left[:count] == -1
+            nodes = np.arange(count)
+            # Leaves point at themselves so finished paths stay put
+            self.left[t, :count] = np.where(is_leaf, nodes, tree.children_left[:count])
+            self.right[t, :count] = np.where(is_leaf, nodes, tree.children_right[:count])
+            # With max_features < 1 each tree sees only the columns in
+            # estimators_features_; map its feature ids back to input columns
+            split_feature = np.maximum(tree.feature[:count], 0)
+            if len(features) != model.n_features_in_:
+                split_feature = np.asarray(features)[split_feature]
+            self.feature[t, :count] = split_feature
+            self.threshold[t, :count] = tree.threshold[:count]
+
+            depth = np.zeros(count, dtype=np.int64)
+            for node in range(count):          # parents always precede children
+                if not is_leaf[node]:
+                    depth[tree.children_left[node]] = depth[node] + 1
+                    depth[tree.children_right[node]] = depth[node] + 1
+            # Same operations as scikit-learn: nodes on the path + c(n) - 1
+            self.leaf_value[t, :count] = np.where(
+                is_leaf, (depth + 1) + average_path_length(tree.n_node_samples[:count]) - 1.0, 0.0)
+            self.max_depth = max(self.max_depth, int(depth.max()))
+
+        self.n_trees = n_trees
+        self._denominator = n_trees * float(average_path_length(model.max_samples_))
+        self._tree_idx = np.arange(n_trees)
+
+    def score_one(self, x):
+        """Score a single row (sequence of n_features values); NaN if any is missing"""
+        # scikit-learn walks the trees on float32 inputs; compare at the same precision
+        x = np.asarray(x, dtype=np.float64).astype(np.float32)
+        if np.isnan(x).any():
+            return np.nan
+        trees = self._tree_idx
+        node = np.zeros(self.n_trees, dtype=np.intp)
+        for _ in range(self.max_depth):
+            go_left = x[self.feature[trees, node]] <= self.threshold[trees, node]
+            node = np.where(go_left, self.left[trees, node], self.right[trees, node])
+        # Trees are accumulated one after another and the power is taken on an
+        # array, as in score_samples, so single-row scores match it bit for bit
+        depth = np.cumsum(self.leaf_value[trees, node])[-1:]
+        return -(2.0 ** (-depth / self._denominator))[0]
+
+
+class AnomalyModelService:
+    """Per-GTA IsolationForest models on operational data, fitted once per training window
+
+    Models are saved as outputs/models/<GTA>_iforest_<config>_<fingerprint>.joblib,
+    where the config hashes the model parameters, the low threshold and the
+    scikit-learn version, and the fingerprint also covers the training
+    rows; fit() loads a matching file instead of refitting. A refit only
+    replaces models of the same GTA and config.
+    """
+
+    def __init__(self, session=None, low_threshold=10, model_dir=MODELS_PATH,
+                 n_estimators=100, max_samples=256, contamination=0.01, random_state=42):
+        """
+        Parameters:
+        -----------
+        session : EnergyDataSession, optional
+            Shared dataset session; defaults to the process-wide one
+        low_threshold : float
+            HP admission at or below which a GTA counts as down (tons/hour)
+        model_dir : str
+            Directory for the persisted models
+        n_estimators, max_samples, contamination, random_state :
+            IsolationForest parameters
+        """
+        self.session = session if session is not None else get_session()
+        self.low_threshold = low_threshold
+        self.model_dir = model_dir
+        self.params = {
+            'n_estimators': n_estimators,
+            'max_samples': max_samples,
+            'contamination': contamination,
+            'random_state': random_state,
+        }
+        self.models = {}
+        self.compiled = {}
+        self.fit_report = {}
+
+    def training_data(self):
+        """Operational rows (HP, MP, EE without missing values) per GTA
+
+        Same operational rule as split_gta_data: HP > low_threshold.
+        """
+        states = DowntimeAnalyzer(self.low_threshold, session=self.session).detect_operational_states()
+        store = self.session.loader.get_store()
+        training = {}
+        for gta_name in GTA_COLUMNS:
+            values = store.unit(gta_name).astype(np.float64)
+            operational = states[f'{gta_name}_operational'].to_numpy()
+            rows = values[operational]
+            training[gta_name] = rows[~np.isnan(rows).any(axis=1)]
+        return training
+
+    def fingerprint(self, X):
+        """Hash of the training rows, model parameters and scikit-learn version"""
+        digest = hashlib.sha256()
+        digest.update(np.ascontiguousarray(X).tobytes())
+        digest.update(str(X.shape).encode())
+        digest.update(json.dumps(self.params, sort_keys=True).encode())
+        digest.update(sklearn.__version__.encode())
+        return digest.hexdigest()
+
+    def config_key(self):
+        """Short hash of everything but the training rows that selects a model"""
+        config = dict(self.params, low_threshold=self.low_threshold, sklearn=sklearn.__version__)
+        return hashlib.sha256(json.dumps(config, sort_keys=True).encode()).hexdigest()[:8]
+
+    def _model_prefix(self, gta_name):
+        return os.path.join(self.model_dir, f"{gta_name}_iforest_{self.config_key()}_")
+
+    def _model_path(self, gta_name, fingerprint):
+        return f"{self._model_prefix(gta_name)}{fingerprint[:16]}.joblib"
+
+    def fit(self, force=False):
+        """Fit (or load) every GTA's model; returns self
+
+        `fit_report` records per GTA whether the model was 'loaded' or
+        'fitted', the number of training rows and the model path.
+        """
+        os.makedirs(self.model_dir, exist_ok=True)
+        for gta_name, X in self.training_data().items():
+            fingerprint = self.fingerprint(X)
+            path = self._model_path(gta_name, fingerprint)
+
+            if os.path.exists(path) and not force:
+                model = joblib.load(path)
+                status = 'loaded'
+            else:
+                model = IsolationForest(**self.params).fit(X)
+                # Older training windows of this config are superseded; models
+                # fitted with other parameters or thresholds are kept
+                for stale in glob.glob(f"{glob.escape(self._model_prefix(gta_name))}*.joblib"):
+                    os.remove(stale)
+                joblib.dump(model, path)
+                status = 'fitted'
+
+            self.models[gta_name] = model
+            self.compiled[gta_name] = CompiledForest(model)
+            self.fit_report[gta_name] = {'status': status, 'training_rows': len(X), 'path': path}
+        return self
+
+    def _require_fit(self, gta_name):
+        if not self.models:
+            self.fit()
+        if gta_name not in self.models:
+            raise ValueError(f"Invalid GTA name. Choose from {list(self.models)}")
+
+    def score(self, gta_name, X):
+        """Anomaly scores (IsolationForest.score_samples, lower = more abnormal)
+
+        `X` holds rows of (HP, MP, EE); rows with missing values score NaN.
+        """
+        self._require_fit(gta_name)
+        X = np.asarray(X, dtype=np.float64).reshape(-1, 3)
+        scores = np.full(len(X), np.nan)
+        valid = ~np.isnan(X).any(axis=1)
+        if valid.any():
+            scores[valid] = self.models[gta_name].score_samples(X[valid])
+        return scores
+
+    def score_one(self, gta_name, row):
+        """Score one live sample (HP, MP, EE) with minimal per-call overhead"""
+        self._require_fit(gta_name)
+        return self.compiled[gta_name].score_one(row)
+
+    def is_anomaly(self, gta_name, X):
+        """Boolean anomaly flags (score below the model's offset, as predict() == -1)"""
+        scores = self.score(gta_name, X)
+        with np.errstate(invalid='ignore'):
+            return scores < self.models[gta_name].offset_
+
+
+if __name__ == "__main__":
+    service = AnomalyModelService().fit()
+    for gta_name, info in service.fit_report.items():
+        print(f"{gta_name}: {info['status']} on {info['training_rows']:,} operational rows "
+              f"-> {info['path']}")
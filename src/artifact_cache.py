@@ -0,0 +1,178 @@
+"""
+Content-addressed artifact cache
+Every figure and exported file is keyed by a hash of the data it was drawn
+from (session fingerprint), the parameters that shape it (thresholds,
+constraints, ...) and the source code of every project module in src/.
+When outputs/artifact_manifest.json holds the same key for an existing
+file, the file is reused instead of regenerated; the manifest records per
+artifact whether the last run reused or rebuilt it
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import sys
+import time
+import numpy as np
+from config import BASE_DIR, OUTPUT_PATH, CONSTRAINTS, GTA_COLUMNS
+
+try:
+    import fcntl
+except ImportError:  # Windows: manifest updates are not locked
+    fcntl = None
+
+MANIFEST_PATH = os.path.join(OUTPUT_PATH, 'artifact_manifest.json')
+
+# Source hash per project directory (sources do not change while a run is in progress)
+_SOURCE_HASHES = {}
+
+
+def _json_default(value):
+    """Serialize numpy arrays and scalars in parameter dicts by value"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
+
+
+def _project_sources(base):
+    """Every .py file in the project directory `base` (the flat src/ tree), sorted"""
+    return sorted(os.path.join(base, name) for name in os.listdir(base) if name.endswith('.py'))
+
+
+def source_hash(module):
+    """Hash of the source of every project module next to `module`
+
+    The whole src/ tree is hashed rather than the modules `module` imports,
+    so dependencies pulled in by imports inside functions (e.g. `import re`
+    in config.discover_gta_columns, or a lazily imported analyzer) are never
+    missed; the price is that editing any project module rebuilds every
+    artifact once.
+    """
+    base = os.path.dirname(os.path.abspath(module.__file__))
+    if base not in _SOURCE_HASHES:
+        digest = hashlib.sha256()
+        for path in _project_sources(base):
+            digest.update(os.path.basename(path).encode())
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        _SOURCE_HASHES[base] = digest.hexdigest()
+    return _SOURCE_HASHES[base]
+
+
+def read_manifest(path=MANIFEST_PATH):
+    """Manifest entries by artifact path (relative to the project root)"""
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def manifest_summary(since=None, path=MANIFEST_PATH):
+    """Count of 'reused' and 'rebuilt' artifacts, optionally only those updated at or after `since`
+
+    `since` is a time.strftime('%Y-%m-%d %H:%M:%S') string.
+    """
+    counts = {'reused': 0, 'rebuilt': 0}
+    for entry in read_manifest(path).values():
+        if since is None or entry['updated'] >= since:
+            counts[entry['status']] = counts.get(entry['status'], 0) + 1
+    return counts
+
+
+class Artifact:
+    """One output file: its key and whether the saved copy can be reused"""
+
+    def __init__(self, cache, path, key, params, reused):
+        self.cache = cache
+        self.path = path
+        self.key = key
+        self.params = params
+        self.reused = reused
+
+    def saved(self):
+        """Record that the file was (re)written for this key"""
+        self.cache.record(self, 'rebuilt')
+
+
+class ArtifactCache:
+    """Decides per output file whether it must be regenerated
+
+    Usage inside a plotting method:
+
+        artifact = self.artifacts.get(path, params)
+        if artifact.reused:
+            return
+        ...                     # draw and save to artifact.path
+        artifact.saved()
+    """
+
+    def __init__(self, session, owner, manifest_path=MANIFEST_PATH):
+        """
+        Parameters:
+        -----------
+        session : EnergyDataSession
+            Session whose data the artifacts are drawn from
+        owner : object or module
+            Analyzer (or module) writing the artifacts; the source of the
+            project directory holding its module is part of the key
+        manifest_path : str
+            JSON file recording the key and status of every artifact
+        """
+        self.session = session
+        self.module = owner if inspect.ismodule(owner) else sys.modules[type(owner).__module__]
+        self.manifest_path = manifest_path
+
+    def key(self, path, params=None):
+        """Content key of the artifact at `path` for the current data, params and code"""
+        digest = hashlib.sha256()
+        digest.update(os.path.basename(path).encode())
+        digest.update(self.session.fingerprint().encode())
+        digest.update(json.dumps({'params': params or {}, 'constraints': CONSTRAINTS,
+                                  'units': GTA_COLUMNS},
+                                 sort_keys=True, default=_json_default).encode())
+        digest.update(source_hash(self.module).encode())
+        return digest.hexdigest()
+
+    def _name(self, path):
+        return os.path.relpath(os.path.abspath(path), BASE_DIR)
+
+    def get(self, path, params=None):
+        """Artifact for `path`; `reused` when the manifest key matches an existing file
+
+        A reused artifact is recorded in the manifest and announced right
+        away; a stale one is recorded once saved() is called.
+        """
+        key = self.key(path, params)
+        entry = read_manifest(self.manifest_path).get(self._name(path), {})
+        reused = (self.session.reuse_artifacts and entry.get('key') == key
+                  and os.path.exists(path))
+        artifact = Artifact(self, path, key, params or {}, reused)
+        if reused:
+            self.record(artifact, 'reused')
+            print(f"✓ Reused: {path}")
+        return artifact
+
+    def record(self, artifact, status):
+        """Write the artifact's key and status into the manifest"""
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        # Figures may be written by forked workers (parallel_render.py):
+        # serialize the read-modify-write of the manifest
+        with open(self.manifest_path + '.lock', 'w') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            manifest = read_manifest(self.manifest_path)
+            manifest[self._name(artifact.path)] = {
+                'key': artifact.key,
+                'status': status,
+                'updated': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'params': json.loads(json.dumps(artifact.params, default=_json_default)),
+            }
+            tmp_path = self.manifest_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f, indent=2, sort_keys=True)
+            os.replace(tmp_path, self.manifest_path)
+
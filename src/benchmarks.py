@@ -0,0 +1,230 @@
+"""
+Micro-benchmarks for the data pipeline
+Run all with `python benchmarks.py`, or pass benchmark names to pick some
+"""
+
+import contextlib
+import io
+import sys
+import time
+import numpy as np
+import pandas as pd
+from config import CONSTRAINTS, GTA_COLUMNS
+from constraint_engine import ConstraintEngine
+from data_loader import EnergyDataLoader
+from rolling_detector import RollingAnomalyDetector
+from rollups import RollupStore
+from segmentation import RegimeSegmenter
+
+
+def _time_call(fn, repeats):
+    """Best and mean wall time of `fn()` over `repeats` runs (seconds)"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+
+def benchmark_load_cache(repeats=5):
+    """Cold (CSV parse) vs warm (binary cache) EnergyDataLoader.load_data"""
+    print("\n" + "="*70)
+    print("LOAD BENCHMARK - CSV vs BINARY CACHE")
+    print("="*70)
+
+    loader = EnergyDataLoader()
+    results = {
+        'csv only (use_cache=False)': _time_call(
+            lambda: EnergyDataLoader(use_cache=False).load_data(), repeats),
+        'cold (parse + write cache)': _time_call(
+            lambda: loader.load_data(rebuild_cache=True), repeats),
+        'warm (read cache)': _time_call(loader.load_data, repeats),
+    }
+
+    print(f"\n{'Mode':<32} {'Best (ms)':>10} {'Mean (ms)':>10}")
+    for name, (best, mean) in results.items():
+        print(f"{name:<32} {best*1000:>10.1f} {mean*1000:>10.1f}")
+
+    speedup = results['csv only (use_cache=False)'][0] / results['warm (read cache)'][0]
+    print(f"\nWarm load speed-up vs CSV: {speedup:.1f}x")
+    print("="*70)
+    return results
+
+
+def _legacy_validate_constraints(data):
+    """validate_constraints as it was before the constraint engine (reference)"""
+    violations = {}
+    for gta_name, (hp_col, mp_col, ee_col) in GTA_COLUMNS.items():
+        hp_violations = data[
+            (data[hp_col] > CONSTRAINTS['max_hp_steam_input']) |
+            (data[hp_col] < CONSTRAINTS['min_steam_requirement'])
+        ]
+        mp_violations = data[data[mp_col] > CONSTRAINTS['max_mp_steam_extraction']]
+        ee_violations = data[data[ee_col] > CONSTRAINTS['max_energy_production']]
+        violations[gta_name] = {
+            'hp_violations': len(hp_violations),
+            'mp_violations': len(mp_violations),
+            'ee_violations': len(ee_violations),
+            'hp_range': (data[hp_col].min(), data[hp_col].max()),
+            'mp_range': (data[mp_col].min(), data[mp_col].max()),
+            'ee_range': (data[ee_col].min(), data[ee_col].max())
+        }
+    return violations
+
+
+def _scaled_frame(data, factor):
+    """The dataset repeated `factor` times (values only; the checks ignore time)"""
+    return pd.DataFrame(np.tile(data.to_numpy(), (factor, 1)), columns=data.columns)
+
+
+def benchmark_validation(scales=(1, 10, 100), repeats=3):
+    """Legacy per-GTA filtered-frame validation vs the vectorized ConstraintEngine"""
+    print("\n" + "="*70)
+    print("CONSTRAINT VALIDATION BENCHMARK - LEGACY vs ENGINE")
+    print("="*70)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = EnergyDataLoader().load_data()
+    engine = ConstraintEngine(CONSTRAINTS)
+
+    print(f"\n{'Scale':>6} {'Rows':>12} {'Legacy (ms)':>12} {'Engine (ms)':>12} "
+          f"{'+masks (ms)':>12} {'Speed-up':>9}")
+    results = {}
+    for factor in scales:
+        scaled = _scaled_frame(data, factor)
+
+        legacy = _legacy_validate_constraints(scaled)
+        result = engine.evaluate_frame(scaled)
+        for gta in GTA_COLUMNS:
+            assert legacy[gta]['mp_violations'] == result.count('mp_above_max', gta)
+
+        legacy_t, _ = _time_call(lambda: _legacy_validate_constraints(scaled), repeats)
+        engine_t, _ = _time_call(lambda: engine.evaluate_frame(scaled), repeats)
+        masks_t, _ = _time_call(lambda: engine.evaluate_frame(scaled, pack_masks=True), repeats)
+        results[factor] = (legacy_t, engine_t, masks_t)
+        print(f"{factor:>5}x {len(scaled):>12,} {legacy_t*1000:>12.1f} {engine_t*1000:>12.1f} "
+              f"{masks_t*1000:>12.1f} {legacy_t/engine_t:>8.1f}x")
+        del scaled
+
+    print("="*70)
+    return results
+
+
+def _synthetic_block(data, n_rows, n_units, seed=0):
+    """(n_rows, n_units, 3) block resampled from the real GTA rows, with noise"""
+    columns = [col for cols in GTA_COLUMNS.values() for col in cols]
+    real = data[columns].to_numpy(dtype=np.float32).reshape(len(data), len(GTA_COLUMNS), 3)
+    rng = np.random.default_rng(seed)
+    source_rows = np.arange(n_rows) // 15 % len(data)          # 1-minute rows from 15-minute data
+    source_units = np.arange(n_units) % len(GTA_COLUMNS)
+    block = real[source_rows][:, source_units]
+    block += rng.normal(0, 0.5, size=block.shape).astype(np.float32)
+    return block
+
+
+def benchmark_rolling_detector(years=10, n_units=5, window=1440, hop=60):
+    """Batch RollingAnomalyDetector.score on years of 1-minute data"""
+    print("\n" + "="*70)
+    print("ROLLING DETECTOR BENCHMARK - BATCH SCORING")
+    print("="*70)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = EnergyDataLoader().load_data()
+    n_rows = years * 365 * 24 * 60
+    block = _synthetic_block(data, n_rows, n_units)
+    detector = RollingAnomalyDetector(window=window, hop=hop, min_periods=window // 2)
+
+    results = {}
+    for name, fn in [('robust (median/MAD)', detector.robust_baseline),
+                     ('ewma', detector.ewma_baseline),
+                     ('score (both)', detector.score)]:
+        results[name], _ = _time_call(lambda: fn(block), 1)
+
+    print(f"\n{n_rows:,} rows x {n_units} units x 3 metrics "
+          f"(window={window}, hop={hop})")
+    for name, seconds in results.items():
+        print(f"  {name:<22} {seconds:8.2f} s")
+    print("="*70)
+    return results
+
+
+def benchmark_segmentation(years=(1, 2, 5), n_units=5, min_size=1440):
+    """RegimeSegmenter.fit on growing spans of 1-minute data (time scales as O(T * depth))"""
+    print("\n" + "="*70)
+    print("SEGMENTATION BENCHMARK - CHANGE POINTS PER UNIT")
+    print("="*70)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = EnergyDataLoader().load_data()
+    segmenter = RegimeSegmenter(min_size=min_size)
+
+    results = {}
+    print(f"\n{n_units} units x 3 metrics, segments >= {min_size} samples")
+    for n_years in years:
+        n_rows = n_years * 365 * 24 * 60
+        block = _synthetic_block(data, n_rows, n_units)
+        index = pd.date_range('2024-01-01', periods=n_rows, freq='min')
+        start = time.perf_counter()
+        segmentation = segmenter.fit(index, block, [f'unit_{u}' for u in range(n_units)])
+        results[n_years] = time.perf_counter() - start
+        print(f"  {n_years:>2} years ({n_rows:>10,} rows): {results[n_years]:7.2f} s, "
+              f"{len(segmentation) / n_units:.0f} segments per unit")
+    print("="*70)
+    return results
+
+
+def benchmark_rollups(years=5, n_units=5, n_queries=200, seed=0):
+    """RollupStore build, then random range aggregates against a scan of the raw rows"""
+    print("\n" + "="*70)
+    print("ROLLUP BENCHMARK - RANGE AGGREGATES")
+    print("="*70)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        data = EnergyDataLoader().load_data()
+    n_rows = years * 365 * 24 * 60
+    block = _synthetic_block(data, n_rows, n_units).astype(np.float64)
+    index = pd.date_range('2024-01-01', periods=n_rows, freq='min')
+    units = [f'unit_{u}' for u in range(n_units)]
+
+    start = time.perf_counter()
+    rollups = RollupStore(index, block, units, step=pd.Timedelta(minutes=1))
+    build = time.perf_counter() - start
+
+    rng = np.random.default_rng(seed)
+    bounds = np.sort(rng.integers(0, n_rows, size=(n_queries, 2)), axis=1)
+    flat = block.reshape(n_rows, -1)
+
+    start = time.perf_counter()
+    for a, b in bounds:
+        rollups.aggregate(index[a], index[b])
+    rollup_time = (time.perf_counter() - start) / n_queries
+
+    start = time.perf_counter()
+    for a, b in bounds:
+        rows = flat[a:b + 1]
+        np.nanmean(rows, axis=0), np.nanstd(rows, axis=0), np.nanmin(rows, axis=0), np.nanmax(rows, axis=0)
+    raw_time = (time.perf_counter() - start) / n_queries
+
+    print(f"\n{years} years of 1-minute data ({n_rows:,} rows, {n_units} units x 3 metrics)")
+    print(f"  Build (all levels):    {build:8.2f} s")
+    print(f"  Range query, rollups:  {rollup_time * 1000:8.2f} ms")
+    print(f"  Range query, raw scan: {raw_time * 1000:8.2f} ms  ({raw_time / rollup_time:.0f}x)")
+    print("="*70)
+    return {'build': build, 'rollups': rollup_time, 'raw': raw_time}
+
+
+BENCHMARKS = {
+    'load_cache': benchmark_load_cache,
+    'validation': benchmark_validation,
+    'rolling_detector': benchmark_rolling_detector,
+    'segmentation': benchmark_segmentation,
+    'rollups': benchmark_rollups,
+}
+
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        BENCHMARKS[name]()
@@ -0,0 +1,290 @@
+"""
+Mask-based cleaning pipeline
+Cleaning steps are boolean masks over the data (rows to drop, per-unit
+samples to zero, gaps to impute) applied in one pass over a single float
+block, with a report of what each step changed
+"""
+
+import numpy as np
+import pandas as pd
+from config import GTA_COLUMNS
+from quantiles import QuantileService
+
+
+def _nearest_valid(valid, direction):
+    """Row of the nearest valid sample before (+1) or after (-1) each row, per column
+
+    -1 / T where there is none.
+    """
+    n_rows = len(valid)
+    rows = np.arange(n_rows)[:, None]
+    if direction > 0:
+        return np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    nearest = np.where(valid, rows, n_rows)[::-1]
+    return np.minimum.accumulate(nearest, axis=0)[::-1]
+
+
+class DropRows:
+    """Drop every row where a boolean row mask is True"""
+
+    def __init__(self, mask, name='drop_rows'):
+        """
+        Parameters:
+        -----------
+        mask : array-like of bool, shape (T,)
+            True for rows to remove (aligned with the data rows)
+        name : str
+            Label used in the report
+        """
+        self.mask = np.asarray(mask, dtype=bool)
+        self.name = name
+
+    def row_mask(self, n_rows):
+        """The drop mask, checked against the number of data rows"""
+        if len(self.mask) != n_rows:
+            raise ValueError(f"{self.name}: mask has {len(self.mask)} rows, data has {n_rows}")
+        return self.mask
+
+
+class ZeroWhere:
+    """Set a unit's columns to 0 wherever its mask is True (e.g. while it is down)"""
+
+    def __init__(self, mask, gta_columns=GTA_COLUMNS, name='zero_where'):
+        """
+        Parameters:
+        -----------
+        mask : array-like of bool, shape (T, n_units)
+            True where the unit's values are to be zeroed, one column per unit
+            in the order of `gta_columns`
+        gta_columns : dict
+            Unit name -> columns to zero
+        name : str
+            Label used in the report
+        """
+        self.mask = np.asarray(mask, dtype=bool).reshape(-1, len(gta_columns))
+        self.gta_columns = gta_columns
+        self.name = name
+
+
+class FillGaps:
+    """Impute missing values from the neighbouring valid samples of each column
+
+    Gaps of at most `max_gap` rows are forward filled (backward filled when
+    they start the column); longer gaps get `fill_value`. With max_gap=None
+    and fill_value=0 this matches ffill().bfill().fillna(0).
+    """
+
+    def __init__(self, max_gap=None, fill_value=0, name='fill_gaps'):
+        """
+        Parameters:
+        -----------
+        max_gap : int, optional
+            Longest run of missing rows to impute; None for no limit
+        fill_value : float, optional
+            Value for gaps that are not imputed; None leaves them missing
+        name : str
+            Label used in the report
+        """
+        self.max_gap = max_gap
+        self.fill_value = fill_value
+        self.name = name
+
+
+class CleaningPipeline:
+    """Ordered cleaning steps applied as masks in a single pass
+
+    Row drops are combined into one keep mask first, so the data is copied
+    once (the kept rows); zeroing and gap filling then work in place on that
+    block, in step order. Gap filling therefore always sees the data after
+    all row drops, as the step-by-step pandas version did.
+    """
+
+    def __init__(self, steps):
+        """
+        Parameters:
+        -----------
+        steps : list
+            DropRows, ZeroWhere and FillGaps instances, in order
+        """
+        self.steps = list(steps)
+
+    def run(self, data):
+        """Apply the steps to a numeric frame
+
+        Returns:
+        --------
+        (cleaned, report) where `report` is a list of dicts, one per step,
+        with what the step changed.
+        """
+        n_rows = len(data)
+        keep = np.ones(n_rows, dtype=bool)
+        dropped = {}
+
+        # Row drops only depend on their own masks, so fuse them into one selection
+        for i, step in enumerate(self.steps):
+            if isinstance(step, DropRows):
+                drop = step.row_mask(n_rows) & keep
+                keep &= ~drop
+                dropped[i] = {'step': step.name, 'rows_removed': int(drop.sum()),
+                              'rows_remaining': int(keep.sum())}
+
+        block = data.to_numpy(dtype=np.float64)[keep]
+        column_pos = {col: i for i, col in enumerate(data.columns)}
+
+        report = []
+        for i, step in enumerate(self.steps):
+            if isinstance(step, DropRows):
+                report.append(dropped[i])
+            elif isinstance(step, ZeroWhere):
+                report.append(self._zero(block, step, keep, column_pos))
+            elif isinstance(step, FillGaps):
+                report.append(self._fill(block, step))
+            else:
+                raise TypeError(f"Unknown cleaning step: {step!r}")
+
+        cleaned = pd.DataFrame(block, index=data.index[keep], columns=data.columns, copy=False)
+        return cleaned, report
+
+    @staticmethod
+    def _zero(block, step, keep, column_pos):
+        """Zero unit columns in place where the (kept rows of the) mask is set"""
+        if len(step.mask) != len(keep):
+            raise ValueError(f"{step.name}: mask has {len(step.mask)} rows, data has {len(keep)}")
+        mask = step.mask[keep]
+        zeroed = {}
+        for u, (gta_name, columns) in enumerate(step.gta_columns.items()):
+            rows = mask[:, u]
+            cols = [column_pos[col] for col in columns]
+            block[np.ix_(rows, cols)] = 0
+            zeroed[gta_name] = int(rows.sum())
+        return {'step': step.name, 'rows_zeroed': zeroed}
+
+    @staticmethod
+    def _fill(block, step):
+        """Impute missing values in place, whole block at once"""
+        missing = np.isnan(block)
+        entry = {'step': step.name, 'missing_before': int(missing.sum()),
+                 'imputed': 0, 'filled_with_value': 0, 'missing_after': 0}
+        if not missing.any():
+            return entry
+
+        valid = ~missing
+        previous = _nearest_valid(valid, +1)
+        following = _nearest_valid(valid, -1)
+        n_rows = len(block)
+
+        # Forward fill from the previous valid row, backward fill leading gaps
+        source = np.where(previous >= 0, previous, following)
+        fillable = missing & (source < n_rows)
+        if step.max_gap is not None:
+            gap_length = following - previous - 1
+            fillable &= gap_length <= step.max_gap
+
+        rows, cols = np.nonzero(fillable)
+        block[rows, cols] = block[source[rows, cols], cols]
+        entry['imputed'] = len(rows)
+
+        rest = missing & ~fillable
+        if step.fill_value is not None:
+            block[rest] = step.fill_value
+            entry['filled_with_value'] = int(rest.sum())
+        else:
+            entry['missing_after'] = int(rest.sum())
+        return entry
+
+
+class PercentileFilter:
+    """Upper-percentile outlier filter over several columns of several units
+
+    Every threshold is taken from the original data (so the result does not
+    depend on unit order), the per-column masks are combined with a single
+    bitwise OR, and the data is copied once at the end.
+    """
+
+    def __init__(self, unit_columns, percentile=99.5, quantiles=None, gta_columns=GTA_COLUMNS):
+        """
+        Parameters:
+        -----------
+        unit_columns : dict
+            Unit name -> columns to check, e.g. {'GTA_1': [hp_col, mp_col], ...}
+        percentile : float
+            Values above this percentile of their column are outliers
+        quantiles : QuantileService, optional
+            Source of the (cached) percentiles; built from the data if omitted
+        gta_columns : dict
+            Unit name -> all of its columns, blanked together in mode='null'
+            (units missing here only have their checked columns blanked)
+        """
+        self.unit_columns = unit_columns
+        self.gta_columns = gta_columns
+        self.columns = [col for cols in unit_columns.values() for col in cols]
+        self.percentile = percentile
+        self.quantiles = quantiles
+
+    def thresholds(self, data):
+        """Per-column thresholds on the unfiltered `data`, as a Series"""
+        quantiles = self.quantiles if self.quantiles is not None else QuantileService(data)
+        return pd.Series({col: quantiles.percentile(col, self.percentile) for col in self.columns})
+
+    def masks(self, data, thresholds=None):
+        """(T, n_columns) outlier mask; missing values fail the check as well
+
+        `thresholds` (as returned by thresholds()) are computed from `data`
+        when omitted.
+        """
+        if thresholds is None:
+            thresholds = self.thresholds(data)
+        values = data[self.columns].to_numpy(dtype=np.float64)
+        with np.errstate(invalid='ignore'):
+            return ~(values <= thresholds[self.columns].to_numpy())
+
+    def apply(self, data, mode='drop'):
+        """Filter `data`
+
+        mode='drop' removes every row where any checked column is an
+        outlier; mode='null' only blanks (NaN) the columns of the unit whose
+        checks failed and keeps all rows.
+
+        Returns:
+        --------
+        (filtered, report) where `report` has the thresholds, the number of
+        rows removed or unit values nulled, and a per-column breakdown
+        ('flagged': rows flagged by the column, 'only_cause': rows flagged by
+        no other column of the same scope).
+        """
+        if mode not in ('drop', 'null'):
+            raise ValueError("mode must be 'drop' or 'null'")
+
+        thresholds = self.thresholds(data)
+        masks = self.masks(data, thresholds)
+        flagged = masks.sum(axis=0)
+
+        if mode == 'drop':
+            rows = np.logical_or.reduce(masks, axis=1)
+            per_row = masks.sum(axis=1)
+            only_cause = (masks & (per_row == 1)[:, None]).sum(axis=0)
+            filtered = data[~rows]
+            report = {'rows_removed': int(rows.sum()), 'rows_remaining': len(filtered)}
+        else:
+            block = data.to_numpy(dtype=np.float64, copy=True)
+            column_pos = {col: i for i, col in enumerate(data.columns)}
+            only_cause = np.zeros(len(self.columns), dtype=np.int64)
+            nulled = {}
+            start = 0
+            for unit, columns in self.unit_columns.items():
+                unit_masks = masks[:, start:start + len(columns)]
+                unit_rows = np.logical_or.reduce(unit_masks, axis=1)
+                only_cause[start:start + len(columns)] = (
+                    unit_masks & (unit_masks.sum(axis=1) == 1)[:, None]).sum(axis=0)
+                blanked = self.gta_columns.get(unit, columns)
+                block[np.ix_(unit_rows, [column_pos[col] for col in blanked])] = np.nan
+                nulled[unit] = int(unit_rows.sum())
+                start += len(columns)
+            filtered = pd.DataFrame(block, index=data.index, columns=data.columns, copy=False)
+            report = {'unit_rows_nulled': nulled}
+
+        report['thresholds'] = thresholds
+        report['by_column'] = pd.DataFrame({'threshold': thresholds.to_numpy(),
+                                            'flagged': flagged, 'only_cause': only_cause},
+                                           index=self.columns)
+        return filtered, report
@@ -18,9 +18,34 @@ GTA_COLUMNS = {
     'GTA_3': ['Admission_HP_GTA_3', 'Soutirage_MP_GTA_3', 'Prod_EE_GTA_3']
 }
 
+# Column name patterns, used to discover every GTA in wider historian exports
+# (captures the GTA number; note the energy column of GTA_2 is 'Prod_EE_GTA2_2')
+GTA_COLUMN_PATTERNS = [
+    r'^Admission_HP_GTA_?(\d+)$',
+    r'^Soutirage_MP_GTA_?(\d+)$',
+    r'^Prod_EE_GTA\w*?_(\d+)$',
+]
+
+
+def discover_gta_columns(columns):
+    """Map 'GTA_<n>' -> [hp_col, mp_col, ee_col] for every complete unit in `columns`"""
+    import re
+
+    found = {}
+    for metric_idx, pattern in enumerate(GTA_COLUMN_PATTERNS):
+        for col in columns:
+            match = re.match(pattern, col)
+            if match:
+                found.setdefault(f'GTA_{int(match.group(1))}', [None] * 3)[metric_idx] = col
+
+    units = {name: cols for name, cols in found.items() if None not in cols}
+    return dict(sorted(units.items(), key=lambda item: int(item[0].split('_')[1])))
+
+
 # File paths
 import os
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DATA_PATH = os.path.join(BASE_DIR, 'data', 'Data_Energie.csv')
 OUTPUT_PATH = os.path.join(BASE_DIR, 'outputs/')
 FIGURES_PATH = os.path.join(BASE_DIR, 'outputs', 'figures/')
+MODELS_PATH = os.path.join(BASE_DIR, 'outputs', 'models/')
@@ -0,0 +1,113 @@
+"""
+Vectorized constraint validation engine
+Evaluates every limit in CONSTRAINTS for every GTA in one pass over the
+(time x unit x metric) block; shared by EnergyDataLoader.validate_constraints
+and AnomalyAnalyzer.detect_anomalies_by_constraints
+"""
+
+import warnings
+import numpy as np
+import pandas as pd
+from config import CONSTRAINTS, GTA_COLUMNS
+from unit_store import METRICS
+
+# CONSTRAINTS key -> (rule name, metric, comparison that counts as a violation)
+CONSTRAINT_RULES = {
+    'max_hp_steam_input': ('hp_above_max', 'HP_Admission', '>'),
+    'min_steam_requirement': ('hp_below_min', 'HP_Admission', '<'),
+    'max_mp_steam_extraction': ('mp_above_max', 'MP_Extraction', '>'),
+    'max_energy_production': ('ee_above_max', 'Energy_Production', '>'),
+}
+
+
+class ConstraintResult:
+    """Counts, ranges and (optionally bit-packed) masks from one evaluation"""
+
+    def __init__(self, units, rules, counts, minima, maxima, n_rows, packed_masks=None):
+        self.units = list(units)
+        self.rules = list(rules)
+        self.counts = counts            # (n_units, n_rules) int
+        self.minima = minima            # (n_units, n_metrics)
+        self.maxima = maxima
+        self.n_rows = n_rows
+        self.packed_masks = packed_masks  # (ceil(T / 8), n_units, n_rules) uint8
+
+    def count(self, rule, unit):
+        """Number of rows of `unit` violating `rule`"""
+        return int(self.counts[self.units.index(unit), self.rules.index(rule)])
+
+    def range(self, metric, unit):
+        """(min, max) of a metric for a unit, ignoring missing values"""
+        i, j = self.units.index(unit), METRICS.index(metric)
+        return (self.minima[i, j], self.maxima[i, j])
+
+    def mask(self, rule, unit):
+        """Boolean violation mask of length T (requires pack_masks=True)"""
+        if self.packed_masks is None:
+            raise ValueError("Masks were not kept; evaluate with pack_masks=True")
+        packed = self.packed_masks[:, self.units.index(unit), self.rules.index(rule)]
+        return np.unpackbits(packed, count=self.n_rows).astype(bool)
+
+    def counts_frame(self):
+        """Violation counts as a (unit x rule) DataFrame"""
+        return pd.DataFrame(self.counts, index=self.units, columns=self.rules)
+
+
+class ConstraintEngine:
+    """Evaluate a set of limits over a (T, n_units, n_metrics) array"""
+
+    def __init__(self, constraints=CONSTRAINTS, extra_rules=None):
+        """
+        Parameters:
+        -----------
+        constraints : dict
+            Limits in the format of config.CONSTRAINTS
+        extra_rules : list of (name, metric, op, limit), optional
+            Additional checks, e.g. ('hp_near_zero', 'HP_Admission', '<', 10)
+        """
+        self.rules = [
+            (name, metric, op, constraints[key])
+            for key, (name, metric, op) in CONSTRAINT_RULES.items() if key in constraints
+        ]
+        self.rules += list(extra_rules or [])
+
+        self.rule_names = [rule[0] for rule in self.rules]
+        self._metric_idx = np.array([METRICS.index(rule[1]) for rule in self.rules], dtype=np.intp)
+        self._limits = np.array([rule[3] for rule in self.rules], dtype=np.float64)
+        self._is_upper = np.array([rule[2] == '>' for rule in self.rules])
+
+    def evaluate(self, values, units, pack_masks=False):
+        """Evaluate all rules for all units at once
+
+        `values` is a (T, n_units, n_metrics) array; returns a ConstraintResult.
+        """
+        values = np.asarray(values)
+        n_rows, n_units = values.shape[:2]
+        n_rules = len(self.rules)
+
+        counts = np.zeros((n_units, n_rules), dtype=np.int64)
+        packed = np.empty((-(-n_rows // 8), n_units, n_rules), dtype=np.uint8) if pack_masks else None
+
+        # One comparison per rule over the (T, n_units) plane of its metric;
+        # working on views avoids materialising a (T, n_units, n_rules) float copy
+        with np.errstate(invalid='ignore'):
+            for r in range(n_rules):
+                plane = values[:, :, self._metric_idx[r]]
+                violated = plane > self._limits[r] if self._is_upper[r] else plane < self._limits[r]
+                counts[:, r] = np.count_nonzero(violated, axis=0)
+                if pack_masks:
+                    packed[:, :, r] = np.packbits(violated, axis=0)
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            minima = np.nanmin(values, axis=0)
+            maxima = np.nanmax(values, axis=0)
+
+        return ConstraintResult(units, self.rule_names, counts, minima, maxima, n_rows, packed)
+
+    def evaluate_frame(self, data, gta_columns=GTA_COLUMNS, pack_masks=False):
+        """Evaluate on a wide frame (float64, so limits compare exactly as in pandas)"""
+        columns = [col for cols in gta_columns.values() for col in cols]
+        block = data[columns].to_numpy(dtype=np.float64)
+        values = block.reshape(len(data), len(gta_columns), len(METRICS))
+        return self.evaluate(values, list(gta_columns), pack_masks=pack_masks)
@@ -2,28 +2,363 @@
 Data loading and validation utilities for OCP Energy Optimization
 """
 
+import hashlib
+import json
+import os
 import pandas as pd
 import numpy as np
 from config import DATA_PATH, CONSTRAINTS, GTA_COLUMNS
+from constraint_engine import ConstraintEngine
+from streaming import ChunkedEnergyScanner, EnergyAccumulator
+from time_grid import regularize, format_step
+from unit_store import UnitArrayStore, METRICS
+from rollups import RollupStore
+
+# Bump when the on-disk cache layout changes so old caches are rebuilt
+CACHE_FORMAT_VERSION = 1
+
+
+def file_sha256(filepath, chunk_size=1 << 20):
+    """Hash a file in fixed-size chunks"""
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def data_fingerprint(data):
+    """SHA-256 of a frame's values and timestamps"""
+    return hashlib.sha256(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes()).hexdigest()
 
 
 class EnergyDataLoader:
     """Load and validate energy production data"""
 
-    def __init__(self, filepath=DATA_PATH):
+    def __init__(self, filepath=DATA_PATH, use_cache=True, align_to_grid=True, duplicates='first'):
+        """
+        Parameters:
+        -----------
+        filepath : str
+            Path to the source CSV
+        use_cache : bool
+            Read/write a binary copy of the parsed CSV next to the source
+            (one raw .npy file per column, see `cache_dir`)
+        align_to_grid : bool
+            Store the data on a regular time grid (see time_grid.py): missing
+            slots become NaN rows
+        duplicates : str
+            On a time grid, what to do with rows repeating a timestamp:
+            'first' keeps the first one and lists the dropped rows in the gap
+            report, 'raise' raises ValueError (see time_grid.regularize)
+        """
         self.filepath = filepath
+        self.use_cache = use_cache
+        self.align_to_grid = align_to_grid
+        self.duplicates = duplicates
+        self.cache_dir = os.path.splitext(filepath)[0] + '.cache'
+        self._pending = []
+        self.version = 0
         self.data = None
+        self.store = None
+        self.live = None
+        self.rollups = None
+        self.grid = None
+        self.gap_report = {}
         self.validation_report = {}
 
-    def load_data(self):
-        """Load CSV data and parse datetime"""
-        print(f"Loading data from {self.filepath}...")
-        self.data = pd.read_csv(self.filepath)
-        self.data['Date'] = pd.to_datetime(self.data['Date'])
-        self.data.set_index('Date', inplace=True)
+    def load_data(self, rebuild_cache=False):
+        """Load CSV data and parse datetime
+
+        When caching is enabled the binary copy is used if it still matches
+        the source CSV (size and mtime; SHA-256 when only the mtime changed);
+        otherwise the CSV is parsed
+        and the cache rewritten. `rebuild_cache=True` forces a re-parse.
+        """
+        data = None
+        if self.use_cache and not rebuild_cache:
+            data = self._read_cache()
+
+        if data is not None:
+            print(f"Loading data from {self.filepath} (cached: {self.cache_dir})...")
+        else:
+            print(f"Loading data from {self.filepath}...")
+            data = pd.read_csv(self.filepath)
+            data['Date'] = pd.to_datetime(data['Date'])
+            data.set_index('Date', inplace=True)
+            if self.use_cache:
+                self._write_cache(data)
+
+        if self.align_to_grid:
+            data, self.grid, self.gap_report = regularize(data, duplicates=self.duplicates)
+            report = self.gap_report
+            print(f"Aligned to {format_step(report['step'])} grid: {report['grid_slots']} slots, "
+                  f"{report['missing_slots']} missing, {report['duplicate_rows']} duplicates dropped "
+                  f"(first row kept, see print_gap_report)")
+
+        self.data = data
+        self.store = None
+        self.live = None
+        self.rollups = None
         print(f"Loaded {len(self.data)} records from {self.data.index.min()} to {self.data.index.max()}")
         return self.data
 
+    @property
+    def data(self):
+        """Loaded frame; rows added by append() are concatenated on first access"""
+        if self._pending:
+            self._data = pd.concat([self._data] + self._pending)
+            self._pending = []
+        return self._data
+
+    @data.setter
+    def data(self, frame):
+        self._data = frame
+        self._pending = []
+        self.version += 1
+
+    def append(self, rows):
+        """Append new rows at the end of the data (append-only ingestion)
+
+        `rows` is a frame in the source CSV layout, with a 'Date' column or a
+        DatetimeIndex. The array store and the live statistics (see
+        get_live_stats) are updated in O(len(rows)); the `data` frame is
+        extended lazily on its next access. On a time grid, skipped slots are
+        filled with NaN rows and rows for slots that already exist are dropped
+        as duplicates (both recorded in the gap report; with duplicates='raise'
+        they raise ValueError); without a grid, rows not strictly after the
+        current data raise ValueError. Adding rows bumps `version`, which
+        drops the memoized products of sessions over this loader.
+
+        Returns the number of rows (including gap rows) added.
+        """
+        if self._data is None:
+            self.load_data()
+
+        rows = rows.copy()
+        if 'Date' in rows.columns:
+            rows['Date'] = pd.to_datetime(rows['Date'])
+            rows = rows.set_index('Date')
+        rows.index = pd.DatetimeIndex(rows.index, name='Date')
+        rows = rows[self._data.columns]
+
+        rows = self._place_on_grid(rows) if self.grid is not None else self._check_order(rows)
+        if rows.empty:
+            return 0
+
+        self._pending.append(rows)
+        self.version += 1
+        self.validation_report = {}
+        if self.store is not None:
+            self.store.append(rows.index, UnitArrayStore.block_from_frame(rows, dtype=self.store.values.dtype))
+        if self.live is not None:
+            self.live.update(rows.index, rows.to_numpy(dtype=np.float64))
+        if self.rollups is not None:
+            self.rollups.update(rows.index, UnitArrayStore.block_from_frame(rows, dtype=np.float64))
+        return len(rows)
+
+    def _last_timestamp(self):
+        """Timestamp of the last stored row, including pending appends"""
+        if self._pending:
+            return self._pending[-1].index[-1]
+        return self._data.index[-1] if len(self._data) else None
+
+    def _check_order(self, rows):
+        """Sort and de-duplicate rows that must all come after the current data"""
+        rows = rows.sort_index(kind='stable')
+        rows = rows[~rows.index.duplicated(keep='first')]
+        last = self._last_timestamp()
+        if last is not None and len(rows) and rows.index[0] <= last:
+            raise ValueError(f"append() only accepts rows after {last}, got {rows.index[0]}")
+        return rows
+
+    def _place_on_grid(self, rows):
+        """Map rows to the slots following the grid, filling skipped slots with NaN"""
+        grid = self.grid
+        positions = grid.positions(rows.index)
+        off_grid = np.isnan(positions)
+        positions = positions[~off_grid].astype(np.int64)
+        values = rows.to_numpy(dtype=np.float64)[~off_grid]
+
+        # Slots already on the grid keep their first value, as in regularize()
+        fresh = np.flatnonzero(positions >= grid.length)
+        slots, first = np.unique(positions[fresh], return_index=True)
+        duplicated = np.ones(len(positions), dtype=bool)
+        duplicated[fresh[first]] = False
+        dropped = rows[~off_grid][duplicated]
+        if len(dropped) and self.duplicates == 'raise':
+            raise ValueError(f"{len(dropped)} appended rows repeat a timestamp, "
+                             f"first at {dropped.index[0]}")
+
+        self.gap_report['source_rows'] += len(rows)
+        self.gap_report['off_grid_rows'] += int(off_grid.sum())
+        if len(dropped):
+            self.gap_report['duplicate_rows'] += len(dropped)
+            self.gap_report['duplicate_timestamps'] = self.gap_report['duplicate_timestamps'].append(dropped.index)
+            self.gap_report['duplicates'] = pd.concat([self.gap_report['duplicates'], dropped])
+        if len(slots) == 0:
+            return rows.iloc[:0]
+
+        n_new = int(slots[-1]) + 1 - grid.length
+        block = np.full((n_new, values.shape[1]), np.nan)
+        block[slots - grid.length] = values[fresh[first]]
+
+        filled = np.zeros(n_new, dtype=bool)
+        filled[slots - grid.length] = True
+        edges = np.diff(np.concatenate(([0], (~filled).astype(np.int8), [0])))
+        gap_starts = np.flatnonzero(edges == 1) + grid.length
+        gap_ends = np.flatnonzero(edges == -1) + grid.length
+        if len(gap_starts):
+            new_gaps = pd.DataFrame({
+                'start': [grid.timestamp(p) for p in gap_starts],
+                'end': [grid.timestamp(p - 1) for p in gap_ends],
+                'missing_slots': gap_ends - gap_starts,
+            })
+            self.gap_report['gaps'] = pd.concat([self.gap_report['gaps'], new_gaps],
+                                                ignore_index=True)
+            self.gap_report['missing_slots'] += int((~filled).sum())
+
+        index = pd.date_range(grid.timestamp(grid.length), periods=n_new, freq=grid.step, name='Date')
+        grid.length += n_new
+        self.gap_report['grid_slots'] = grid.length
+        return pd.DataFrame(block, index=index, columns=rows.columns)
+
+    def get_live_stats(self, uptime_thresholds=(10,)):
+        """Incrementally maintained summaries (streaming.EnergyAccumulator)
+
+        Built from the loaded data on first use and kept current by append():
+        basic stats, validation report, system-total statistics and uptime
+        counters for `uptime_thresholds`.
+        """
+        if self._data is None:
+            self.load_data()
+        if self.live is None or set(uptime_thresholds) - set(self.live.operational_counts):
+            thresholds = set(uptime_thresholds) | set(self.live.operational_counts if self.live else ())
+            self.live = EnergyAccumulator(list(self._data.columns), GTA_COLUMNS, CONSTRAINTS,
+                                          uptime_thresholds=sorted(thresholds))
+            data = self.data
+            self.live.update(data.index, data.to_numpy(dtype=np.float64))
+        return self.live
+
+    def get_rollups(self):
+        """Multi-resolution rollups (rollups.RollupStore), kept current by append()
+
+        Built once per load and saved as rollups.npz in `cache_dir`; a saved
+        copy is reloaded when it was built from the same data.
+        """
+        if self._data is None:
+            self.load_data()
+        if self.rollups is None:
+            data = self.data
+            fingerprint = data_fingerprint(data)
+            path = os.path.join(self.cache_dir, 'rollups.npz')
+            if self.use_cache and os.path.exists(path):
+                try:
+                    rollups, saved_fingerprint = RollupStore.load(path)
+                    if saved_fingerprint == fingerprint:
+                        self.rollups = rollups
+                except (OSError, ValueError, KeyError):
+                    pass
+            if self.rollups is None:
+                # Off a grid samples can fall anywhere, so only exact timestamps bound buckets
+                step = self.grid.step if self.grid is not None else pd.Timedelta(1, unit='ns')
+                self.rollups = RollupStore.from_frame(data, GTA_COLUMNS, step)
+                if self.use_cache:
+                    try:
+                        os.makedirs(self.cache_dir, exist_ok=True)
+                        self.rollups.save(path, fingerprint)
+                    except OSError as e:
+                        print(f"Rollups not cached ({e})")
+        return self.rollups
+
+    def slice_range(self, start=None, end=None):
+        """Rows in [start, end] inclusive; positional arithmetic when on a grid"""
+        if self.data is None:
+            self.load_data()
+        if self.grid is not None:
+            return self.data.iloc[self.grid.slice(start, end)]
+        return self.data.loc[start:end]
+
+    def _source_signature(self):
+        """Size and mtime of the source CSV"""
+        st = os.stat(self.filepath)
+        return {'source_size': st.st_size, 'source_mtime_ns': st.st_mtime_ns}
+
+    def _read_cache(self):
+        """Return the cached frame, or None if the cache is missing or stale"""
+        meta_path = os.path.join(self.cache_dir, 'meta.json')
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if meta.get('format_version') != CACHE_FORMAT_VERSION:
+            return None
+
+        signature = self._source_signature()
+        if meta.get('source_size') != signature['source_size']:
+            return None
+        # Same size and mtime: trusted without reading the CSV. Same size but
+        # touched or rewritten: the content hash decides
+        touched = meta.get('source_mtime_ns') != signature['source_mtime_ns']
+        if touched and meta.get('source_sha256') != file_sha256(self.filepath):
+            return None
+
+        try:
+            index = np.load(os.path.join(self.cache_dir, 'index.npy'))
+            columns = {
+                name: np.load(os.path.join(self.cache_dir, f'col_{i}.npy'))
+                for i, name in enumerate(meta['columns'])
+            }
+        except (OSError, ValueError, KeyError):
+            return None
+
+        data = pd.DataFrame(columns, index=pd.DatetimeIndex(index, name='Date'))
+
+        if touched:
+            # Content unchanged, only the timestamp moved: refresh the metadata
+            meta.update(signature)
+            self._write_meta(meta)
+
+        return data
+
+    def _write_cache(self, data):
+        """Store the parsed frame as one .npy file per column"""
+        if any(not np.issubdtype(dtype, np.number) for dtype in data.dtypes):
+            print("Cache skipped: non-numeric columns in source")
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            # Invalidate first so a partially written cache is never trusted
+            meta_path = os.path.join(self.cache_dir, 'meta.json')
+            if os.path.exists(meta_path):
+                os.remove(meta_path)
+
+            np.save(os.path.join(self.cache_dir, 'index.npy'), data.index.values)
+            for i, name in enumerate(data.columns):
+                np.save(os.path.join(self.cache_dir, f'col_{i}.npy'), data[name].to_numpy())
+
+            meta = {
+                'format_version': CACHE_FORMAT_VERSION,
+                'source': os.path.basename(self.filepath),
+                'source_sha256': file_sha256(self.filepath),
+                'columns': list(data.columns),
+            }
+            meta.update(self._source_signature())
+            self._write_meta(meta)
+        except OSError as e:
+            print(f"Cache not written ({e})")
+
+    def _write_meta(self, meta):
+        """Atomically replace the cache metadata file"""
+        meta_path = os.path.join(self.cache_dir, 'meta.json')
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, meta_path)
+
     def get_basic_stats(self):
         """Get basic statistics about the dataset"""
         if self.data is None:
@@ -37,65 +372,80 @@ class EnergyDataLoader:
         }
         return stats
 
-    def validate_constraints(self):
-        """Check if data respects operational constraints"""
+    def check_constraints(self, extra_rules=None, pack_masks=False):
+        """Evaluate all constraint rules for all GTAs in one vectorized pass
+
+        Returns a constraint_engine.ConstraintResult; see ConstraintEngine for
+        `extra_rules` and `pack_masks`.
+        """
         if self.data is None:
             self.load_data()
 
-        violations = {}
-
-        for gta_name, columns in GTA_COLUMNS.items():
-            hp_col, mp_col, ee_col = columns
+        engine = ConstraintEngine(CONSTRAINTS, extra_rules=extra_rules)
+        return engine.evaluate_frame(self.data, GTA_COLUMNS, pack_masks=pack_masks)
 
-            # Check HP steam input constraints
-            hp_violations = self.data[
-                (self.data[hp_col] > CONSTRAINTS['max_hp_steam_input']) |
-                (self.data[hp_col] < CONSTRAINTS['min_steam_requirement'])
-            ]
+    def validate_constraints(self, operating_modes=None):
+        """Check if data respects operational constraints
 
-            # Check MP steam extraction constraints
-            mp_violations = self.data[self.data[mp_col] > CONSTRAINTS['max_mp_steam_extraction']]
-
-            # Check energy production constraints
-            ee_violations = self.data[self.data[ee_col] > CONSTRAINTS['max_energy_production']]
+        With a fitted operating_modes.OperatingModeModel, every GTA also gets
+        'mode_violations': samples outside the normal envelope of their own
+        operating mode, per metric, and 'mode_limits' (the per-mode table).
+        """
+        result = self.check_constraints()
 
+        violations = {}
+        for gta_name in GTA_COLUMNS.keys():
             violations[gta_name] = {
-                'hp_violations': len(hp_violations),
-                'mp_violations': len(mp_violations),
-                'ee_violations': len(ee_violations),
-                'hp_range': (self.data[hp_col].min(), self.data[hp_col].max()),
-                'mp_range': (self.data[mp_col].min(), self.data[mp_col].max()),
-                'ee_range': (self.data[ee_col].min(), self.data[ee_col].max())
+                'hp_violations': result.count('hp_above_max', gta_name) +
+                                 result.count('hp_below_min', gta_name),
+                'mp_violations': result.count('mp_above_max', gta_name),
+                'ee_violations': result.count('ee_above_max', gta_name),
+                'hp_range': result.range('HP_Admission', gta_name),
+                'mp_range': result.range('MP_Extraction', gta_name),
+                'ee_range': result.range('Energy_Production', gta_name)
             }
 
+        if operating_modes is not None:
+            values = self.get_store().values
+            labels = operating_modes.assign_block(values)
+            counts = operating_modes.envelope_violations(values, labels)
+            limits = operating_modes.mode_statistics(values, labels)
+            for u, gta_name in enumerate(operating_modes.units):
+                violations[gta_name]['mode_violations'] = dict(zip(METRICS, counts[u].sum(axis=0).tolist()))
+                violations[gta_name]['mode_limits'] = limits[limits['unit'] == gta_name].reset_index(drop=True)
+
         self.validation_report = violations
         return violations
 
-    def get_gta_data(self, gta_name):
-        """Extract data for a specific GTA"""
+    def get_store(self):
+        """(time x unit x metric) float32 UnitArrayStore, built once per load"""
         if self.data is None:
             self.load_data()
+        if self.store is None:
+            self.store = UnitArrayStore.from_frame(self.data)
+        return self.store
+
+    def get_gta_data(self, gta_name, view=False):
+        """Extract data for a specific GTA
 
+        Returns a writable float64 copy. With view=True, returns a read-only
+        float32 frame over the array store instead (no copy); copy it before
+        modifying.
+        """
         if gta_name not in GTA_COLUMNS:
             raise ValueError(f"Invalid GTA name. Choose from {list(GTA_COLUMNS.keys())}")
+        if view:
+            return self.get_store().unit_frame(gta_name)
 
-        columns = GTA_COLUMNS[gta_name]
-        gta_data = self.data[columns].copy()
-        gta_data.columns = ['HP_Admission', 'MP_Extraction', 'Energy_Production']
+        if self.data is None:
+            self.load_data()
+        gta_data = self.data[GTA_COLUMNS[gta_name]].copy()
+        gta_data.columns = METRICS
         return gta_data
 
     def get_all_gtas_normalized(self):
         """Get all GTA data in normalized format"""
-        if self.data is None:
-            self.load_data()
-
-        all_data = []
-        for gta_name in GTA_COLUMNS.keys():
-            gta_df = self.get_gta_data(gta_name)
-            gta_df['GTA'] = gta_name
-            all_data.append(gta_df)
-
-        return pd.concat(all_data, axis=0)
+        return self.get_store().long_frame()
 
     def calculate_system_totals(self):
         """Calculate total system metrics across all GTAs"""
@@ -127,6 +477,42 @@ class EnergyDataLoader:
 
         return totals
 
+    def scan_chunks(self, chunksize=100_000, totals_path=None):
+        """Streaming mode: validate and summarise the CSV without loading it
+
+        Returns a scanned ChunkedEnergyScanner (get_basic_stats,
+        validate_constraints, system_totals_summary). The validation report
+        is kept so print_validation_report works as after validate_constraints.
+        """
+        scanner = ChunkedEnergyScanner(self.filepath, chunksize=chunksize,
+                                       totals_path=totals_path).scan()
+        self.validation_report = scanner.validate_constraints()
+        return scanner
+
+    def print_gap_report(self):
+        """Print what was fixed when aligning the data to the time grid"""
+        if self.data is None:
+            self.load_data()
+        if not self.gap_report:
+            print("Data not aligned to a time grid (align_to_grid=False)")
+            return
+
+        report = self.gap_report
+        print("\n" + "="*60)
+        print("TIME GRID REPORT")
+        print("="*60)
+        print(f"  Grid: {self.grid.start} + i * {format_step(report['step'])} ({report['grid_slots']} slots)")
+        print(f"  Source rows: {report['source_rows']}")
+        print(f"  Missing slots (NaN rows): {report['missing_slots']} in {len(report['gaps'])} gaps")
+        for _, gap in report['gaps'].iterrows():
+            print(f"    {gap['start']} to {gap['end']} ({gap['missing_slots']} slots)")
+        print(f"  Duplicate timestamps dropped: {report['duplicate_rows']} (first row kept)")
+        for ts, count in report['duplicates'].index.value_counts(sort=False).sort_index().items():
+            print(f"    {ts} ({count} dropped)")
+        print(f"  Off-grid rows dropped: {report['off_grid_rows']}")
+        print(f"  Out-of-order rows: {report['out_of_order_rows']}")
+        print("="*60)
+
     def print_validation_report(self):
         """Print a formatted validation report"""
         if not self.validation_report:
@@ -150,13 +536,26 @@ class EnergyDataLoader:
             print(f"    (Constraint: Max {CONSTRAINTS['max_energy_production']} MWh)")
             print(f"    Violations: {metrics['ee_violations']}")
 
+            if 'mode_violations' in metrics:
+                print(f"  Per-mode envelopes (operating-mode clustering):")
+                for mode in metrics['mode_limits'].itertuples():
+                    print(f"    Mode {mode.mode} ({mode.pct:4.1f}%): "
+                          f"HP {mode.HP_Admission_lower:6.1f}-{mode.HP_Admission_upper:6.1f}  "
+                          f"MP {mode.MP_Extraction_lower:6.1f}-{mode.MP_Extraction_upper:6.1f}  "
+                          f"EE {mode.Energy_Production_lower:5.1f}-{mode.Energy_Production_upper:5.1f}")
+                print(f"    Violations: " + ", ".join(
+                    f"{metric} {count}" for metric, count in metrics['mode_violations'].items()))
+
         print("\n" + "="*60)
 
 
 if __name__ == "__main__":
-    # Test the data loader
+    import sys
+
+    # Test the data loader (pass --rebuild-cache to force a CSV re-parse)
     loader = EnergyDataLoader()
-    loader.load_data()
+    loader.load_data(rebuild_cache='--rebuild-cache' in sys.argv)
+    loader.print_gap_report()
 
     print("\nBasic Statistics:")
     stats = loader.get_basic_stats()
@@ -0,0 +1,101 @@
+"""
+Decimation for long time-series figures
+Reduces a series to the minimum and maximum of each bucket of samples,
+one bucket per output pixel column, so a plot draws ~2 points per pixel
+however long the history is. Spikes survive (they are a bucket's min or
+max), gaps stay gaps, and the samples on both sides of every change in a
+state mask are kept so shaded downtime / violation edges stay exact.
+Scatter markers are thinned to one per occupied marker-sized cell instead
+"""
+
+import numpy as np
+
+# Resolution the figures are saved at (savefig dpi)
+FIGURE_DPI = 300
+
+
+def axes_pixel_width(ax, dpi=FIGURE_DPI):
+    """Width of `ax` in output pixels when its figure is saved at `dpi`"""
+    return max(int(ax.get_position().width * ax.figure.get_figwidth() * dpi), 1)
+
+
+def decimate_indices(values, n_buckets, masks=()):
+    """Sorted positions to draw for a series (or several, (T,) or (T, k))
+
+    Per bucket of consecutive samples: the position of the minimum and
+    maximum of every series and the first missing sample (so lines still
+    break at gaps). Positions next to each change of any boolean mask in
+    `masks` are always kept. Series with no more than 2 * n_buckets
+    samples are returned whole.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values.reshape(len(values), -1)
+    n = len(values)
+    if n <= 2 * n_buckets:
+        return np.arange(n)
+
+    size = -(-n // n_buckets)
+    n_buckets = -(-n // size)
+    padded = np.full((n_buckets * size, values.shape[1]), np.nan)
+    padded[:n] = values
+    blocks = padded.reshape(n_buckets, size, values.shape[1])
+    missing = np.isnan(blocks)
+    starts = (np.arange(n_buckets) * size)[:, None]
+
+    keep = [
+        (starts + np.argmin(np.where(missing, np.inf, blocks), axis=1)).ravel(),
+        (starts + np.argmax(np.where(missing, -np.inf, blocks), axis=1)).ravel(),
+    ]
+    has_gap = missing.any(axis=1)
+    keep.append((starts + np.argmax(missing, axis=1))[has_gap])
+
+    for mask in masks:
+        mask = np.asarray(mask, dtype=bool)
+        changes = np.flatnonzero(mask[1:] != mask[:-1])
+        keep.extend([changes, changes + 1])
+
+    keep.append([0, n - 1])
+    positions = np.unique(np.concatenate([np.asarray(part, dtype=np.int64) for part in keep]))
+    return positions[positions < n]
+
+
+def decimate_points(values, n_columns, n_rows):
+    """Positions of one sample per occupied (column, row) cell of a scatter
+
+    Samples are binned by position into `n_columns` and by value into
+    `n_rows` over the value range; missing values are dropped. The first
+    sample of every occupied cell is kept, so the drawn marker coverage is
+    unchanged while the point count is bounded by the cell grid.
+    """
+    values = np.asarray(values, dtype=np.float64).ravel()
+    positions = np.flatnonzero(~np.isnan(values))
+    if len(positions) <= n_columns:
+        return positions
+
+    column = positions * n_columns // len(values)
+    low, high = values[positions].min(), values[positions].max()
+    span = high - low if high > low else 1.0
+    row = np.minimum(((values[positions] - low) / span * n_rows).astype(np.int64), n_rows - 1)
+    _, first = np.unique(column * n_rows + row, return_index=True)
+    return np.sort(positions[first])
+
+
+def decimate_for_axes(ax, index, values, masks=(), dpi=FIGURE_DPI):
+    """Positions of `index`/`values` worth drawing on `ax` (two points per pixel column)
+
+    Use the same positions for every array drawn together (line, fill and
+    its `where` mask) so they stay aligned.
+    """
+    return decimate_indices(values, axes_pixel_width(ax, dpi), masks)
+
+
+def decimate_points_for_axes(ax, values, marker_size=5, dpi=FIGURE_DPI, overlap=3):
+    """Scatter positions worth drawing on `ax`: about `overlap` markers per marker width
+
+    `marker_size` is the scatter `s` (points squared). Overlapping
+    semi-transparent markers keep dense stretches looking dense.
+    """
+    marker_pixels = max(np.sqrt(marker_size) * dpi / 72 / overlap, 1.0)
+    height = ax.get_position().height * ax.figure.get_figheight() * dpi
+    return decimate_points(values, max(int(axes_pixel_width(ax, dpi) / marker_pixels), 1),
+                           max(int(height / marker_pixels), 1))
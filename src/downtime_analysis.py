@@ -7,7 +7,15 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from data_loader import EnergyDataLoader
+from session import get_session
+from state_machine import HysteresisStateDetector
+from intervals import StateIntervals, bridge_unknown
+from threshold_sweep import DowntimeSweep
+from events import TransitionEvents
+from decimation import decimate_for_axes
+from parallel_render import FigureRenderer
+from artifact_cache import ArtifactCache
+from cleaning import CleaningPipeline, DropRows, ZeroWhere, FillGaps
 from config import CONSTRAINTS, GTA_COLUMNS, FIGURES_PATH
 import os
 
@@ -17,33 +25,81 @@ sns.set_style("whitegrid")
 class DowntimeAnalyzer:
     """Analyze downtime and operational states for GTAs"""
 
-    def __init__(self, low_threshold=10):
+    def __init__(self, low_threshold=10, session=None):
         """
         Parameters:
         -----------
         low_threshold : float
             HP admission below this is considered "down" (tons/hour)
+        session : EnergyDataSession, optional
+            Shared dataset session; defaults to the process-wide one
         """
-        self.loader = EnergyDataLoader()
-        self.data = self.loader.load_data()
+        self.session = session if session is not None else get_session()
+        self.loader = self.session.loader
         self.low_threshold = low_threshold
+        self.artifacts = ArtifactCache(self.session, self)
+
+    @property
+    def data(self):
+        """The session's current frame (follows load_data and append)"""
+        return self.session.data
 
     def detect_operational_states(self):
-        """Classify each timestamp as operational or down for each GTA"""
+        """Classify each timestamp as operational or down for each GTA
+
+        A sample with missing HP (e.g. an empty slot of the time grid) is
+        neither: both its `_operational` and `_down` flags are False.
+        The result is memoized on the session per threshold; treat it as read-only.
+        """
+        return self.session.memoize(('operational_states', self.low_threshold),
+                                    self._compute_operational_states)
+
+    def _compute_operational_states(self):
+        """Threshold HP admission per GTA (uncached)"""
 
         states = pd.DataFrame(index=self.data.index)
 
         for gta_name, columns in GTA_COLUMNS.items():
             hp_col = columns[0]
 
-            # Consider GTA "operational" if HP > threshold
+            # Consider GTA "operational" if HP > threshold, "down" if HP <= threshold
             states[f'{gta_name}_operational'] = self.data[hp_col] > self.low_threshold
+            states[f'{gta_name}_down'] = self.data[hp_col] <= self.low_threshold
             states[f'{gta_name}_HP'] = self.data[hp_col]
 
         return states
 
+    def detect_state_transitions(self, on_threshold=None, off_threshold=None,
+                                 min_on_samples=4, min_off_samples=4):
+        """Hysteresis version of detect_operational_states, plus start-up/shutdown events
+
+        Thresholds default to `low_threshold`; see state_machine.HysteresisStateDetector.
+        Returns (states, events) with `states` in the detect_operational_states layout.
+        """
+        on_threshold = self.low_threshold if on_threshold is None else on_threshold
+        off_threshold = self.low_threshold if off_threshold is None else off_threshold
+        key = ('state_transitions', on_threshold, off_threshold, min_on_samples, min_off_samples)
+
+        def compute():
+            hp_cols = [columns[0] for columns in GTA_COLUMNS.values()]
+            detector = HysteresisStateDetector(list(GTA_COLUMNS), on_threshold, off_threshold,
+                                               min_on_samples, min_off_samples)
+            unit_states, events = detector.detect(self.data.index, self.data[hp_cols].to_numpy())
+
+            states = pd.DataFrame(index=self.data.index)
+            for gta_name, hp_col in zip(GTA_COLUMNS, hp_cols):
+                states[f'{gta_name}_operational'] = unit_states[gta_name]
+                states[f'{gta_name}_HP'] = self.data[hp_col]
+            return states, events
+
+        return self.session.memoize(key, compute)
+
     def calculate_uptime_statistics(self):
-        """Calculate uptime percentages for each GTA"""
+        """Calculate uptime percentages for each GTA
+
+        Percentages are over the samples with an HP measurement; missing
+        samples are counted separately and are not downtime.
+        """
 
         states = self.detect_operational_states()
         total_records = len(states)
@@ -62,14 +118,17 @@ class DowntimeAnalyzer:
             operational_col = f'{gta_name}_operational'
 
             operational_count = states[operational_col].sum()
-            downtime_count = (~states[operational_col]).sum()
+            downtime_count = states[f'{gta_name}_down'].sum()
+            measured_records = operational_count + downtime_count
+            missing_count = total_records - measured_records
 
-            uptime_pct = (operational_count / total_records) * 100
-            downtime_pct = (downtime_count / total_records) * 100
+            uptime_pct = (operational_count / measured_records) * 100
+            downtime_pct = (downtime_count / measured_records) * 100
 
             uptime_stats[gta_name] = {
                 'operational_records': operational_count,
                 'downtime_records': downtime_count,
+                'missing_records': missing_count,
                 'uptime_pct': uptime_pct,
                 'downtime_pct': downtime_pct,
                 'operational_days': operational_count * 15 / 60 / 24,
@@ -81,14 +140,28 @@ class DowntimeAnalyzer:
             print(f"               {uptime_stats[gta_name]['operational_days']:.1f} days")
             print(f"  Downtime:    {downtime_count:,} records ({downtime_pct:.1f}%)")
             print(f"               {uptime_stats[gta_name]['downtime_days']:.1f} days")
+            if missing_count:
+                print(f"  Missing:     {missing_count:,} records (no HP measurement, not counted)")
             print()
 
         print("="*70)
 
         return uptime_stats, states
 
+    def live_uptime_statistics(self):
+        """Uptime counters kept current by EnergyDataLoader.append (no recompute)
+
+        Same format as the stats of calculate_uptime_statistics, without printing.
+        """
+        live = self.loader.get_live_stats(uptime_thresholds=(self.low_threshold,))
+        return live.uptime_statistics(self.low_threshold)
+
     def plot_operational_timeline(self):
         """Visualize operational states over time"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}operational_timeline.png",
+                                      {'low_threshold': self.low_threshold})
+        if artifact.reused:
+            return
 
         states = self.detect_operational_states()
 
@@ -100,24 +173,32 @@ class DowntimeAnalyzer:
             operational_col = f'{gta_name}_operational'
             hp_col = f'{gta_name}_HP'
 
+            # Decimated to the pixel grid; samples around every state change are kept
+            operational = states[operational_col].to_numpy()
+            down = states[f'{gta_name}_down'].to_numpy()
+            keep = decimate_for_axes(axes[idx], states.index, states[hp_col], masks=[operational, down])
+            index, hp = states.index[keep], states[hp_col].to_numpy()[keep]
+            operational, down = operational[keep], down[keep]
+
             # Plot HP values
-            axes[idx].plot(states.index, states[hp_col], linewidth=0.5, alpha=0.7, color='blue')
+            axes[idx].plot(index, hp, linewidth=0.5, alpha=0.7, color='blue')
 
             # Highlight operational periods
-            axes[idx].fill_between(states.index, 0, states[hp_col],
-                                  where=states[operational_col],
+            axes[idx].fill_between(index, 0, hp,
+                                  where=operational,
                                   alpha=0.3, color='green', label='Operational')
 
             # Highlight downtime periods
-            axes[idx].fill_between(states.index, 0, states[hp_col],
-                                  where=~states[operational_col],
+            axes[idx].fill_between(index, 0, hp,
+                                  where=down,
                                   alpha=0.3, color='red', label='Downtime')
 
             # Add threshold line
             axes[idx].axhline(y=self.low_threshold, color='orange', linestyle='--',
                             linewidth=2, label=f'Threshold ({self.low_threshold} t/h)')
 
-            uptime_pct = (states[operational_col].sum() / len(states)) * 100
+            operational_count = states[operational_col].sum()
+            uptime_pct = operational_count / (operational_count + states[f'{gta_name}_down'].sum()) * 100
             axes[idx].set_title(f'{gta_name} - Uptime: {uptime_pct:.1f}%', fontsize=12)
             axes[idx].set_ylabel('HP Steam (tons/h)')
             axes[idx].legend(loc='upper right')
@@ -127,6 +208,7 @@ class DowntimeAnalyzer:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}operational_timeline.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}operational_timeline.png")
+        artifact.saved()
         plt.close()
 
     def analyze_correlation_operational_only(self):
@@ -172,6 +254,10 @@ class DowntimeAnalyzer:
 
     def plot_correlation_comparison(self):
         """Compare correlations: all data vs operational only"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}correlation_comparison.png",
+                                      {'low_threshold': self.low_threshold})
+        if artifact.reused:
+            return
 
         states = self.detect_operational_states()
 
@@ -217,12 +303,29 @@ class DowntimeAnalyzer:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}correlation_comparison.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}correlation_comparison.png")
+        artifact.saved()
         plt.close()
 
+    def downtime_intervals(self):
+        """Run-length index of downtime periods for all GTAs (memoized per threshold)
+
+        Missing samples between two down samples stay inside the period;
+        any other missing sample is outside every period.
+        """
+
+        def compute():
+            states = self.detect_operational_states()
+            down = states[[f'{gta_name}_down' for gta_name in GTA_COLUMNS]].to_numpy()
+            operational = states[[f'{gta_name}_operational' for gta_name in GTA_COLUMNS]].to_numpy()
+            return StateIntervals(states.index, bridge_unknown(down, down | operational),
+                                  list(GTA_COLUMNS))
+
+        return self.session.memoize(('downtime_intervals', self.low_threshold), compute)
+
     def identify_downtime_periods(self):
         """Identify continuous downtime periods"""
 
-        states = self.detect_operational_states()
+        intervals = self.downtime_intervals()
 
         print("\n" + "="*70)
         print("MAJOR DOWNTIME PERIODS (> 7 days continuous)")
@@ -230,96 +333,188 @@ class DowntimeAnalyzer:
         print()
 
         for gta_name in GTA_COLUMNS.keys():
-            operational_col = f'{gta_name}_operational'
-
-            # Find downtime periods
-            is_down = ~states[operational_col]
-
-            # Find start and end of downtime periods
-            downtime_starts = is_down & ~is_down.shift(1, fill_value=False)
-            downtime_ends = is_down & ~is_down.shift(-1, fill_value=False)
-
-            starts = states.index[downtime_starts]
-            ends = states.index[downtime_ends]
-
-            # Calculate durations
-            major_downtimes = []
-            for start, end in zip(starts, ends):
-                duration = (end - start).total_seconds() / 3600 / 24  # days
-                if duration > 7:  # More than 7 days
-                    major_downtimes.append({
-                        'start': start,
-                        'end': end,
-                        'duration_days': duration
-                    })
+            major_downtimes = intervals.longer_than(pd.Timedelta(days=7), unit=gta_name)
+            major_downtimes['duration_days'] = major_downtimes['duration'] / pd.Timedelta(days=1)
 
             print(f"{gta_name}: {len(major_downtimes)} major downtime periods")
-            for i, dt in enumerate(major_downtimes[:5], 1):  # Show first 5
-                print(f"  {i}. {dt['start']} to {dt['end']} ({dt['duration_days']:.1f} days)")
+            for i, dt in enumerate(major_downtimes.head(5).itertuples(), 1):  # Show first 5
+                print(f"  {i}. {dt.start} to {dt.end} ({dt.duration_days:.1f} days)")
             if len(major_downtimes) > 5:
                 print(f"  ... and {len(major_downtimes) - 5} more")
             print()
 
         print("="*70)
 
-    def create_cleaned_dataset(self, save_path=None):
-        """Create dataset with downtime periods removed and missing values handled"""
+    def analyze_operating_regimes(self, min_size=96, penalty=None):
+        """Sustained operating regimes per GTA from change-point segmentation
 
+        The segment table is cached on the session; segment labels
+        (session.segments().label_frame()) can be used to group any analysis.
+        """
+        segments = self.session.segments(min_size, penalty)
         states = self.detect_operational_states()
 
         print("\n" + "="*70)
-        print("CREATING CLEANED DATASET")
+        print(f"OPERATING REGIMES (change points, segments >= {min_size} samples)")
         print("="*70)
-        print()
 
-        # Start with original data
-        cleaned = self.data.copy()
+        labels = segments.labels()
+        regimes = {}
+        for u, gta_name in enumerate(segments.units):
+            table = segments.for_unit(gta_name)
+            # Share of operational samples in each segment
+            operational = states[f'{gta_name}_operational'].to_numpy()
+            table['operational_pct'] = (np.bincount(labels[:, u], weights=operational,
+                                                    minlength=len(table))
+                                        / table['n_samples'].to_numpy() * 100)
+            regimes[gta_name] = table
+
+            print(f"\n{gta_name}: {len(table)} regimes")
+            for seg in table.itertuples():
+                print(f"  {seg.start:%Y-%m-%d} to {seg.end:%Y-%m-%d} "
+                      f"({seg.duration / pd.Timedelta(days=1):6.1f} days): "
+                      f"HP {seg.HP_Admission_mean:6.1f}  MP {seg.MP_Extraction_mean:6.1f}  "
+                      f"EE {seg.Energy_Production_mean:5.1f}  "
+                      f"operational {seg.operational_pct:5.1f}%")
+
+        print("\n" + "="*70)
+
+        return regimes
+
+    def transition_events(self, stable_fraction=0.9):
+        """Start-up / shutdown TransitionEvents of all GTAs (memoized per threshold)
+
+        Transitions are the state changes of detect_operational_states, so
+        each ramp starts or ends at the last/first sample below the threshold.
+        """
+
+        def compute():
+            states = self.detect_operational_states()
+            return TransitionEvents(
+                states.index,
+                states[[f'{gta_name}_operational' for gta_name in GTA_COLUMNS]].to_numpy(),
+                states[[f'{gta_name}_HP' for gta_name in GTA_COLUMNS]].to_numpy(dtype=np.float64),
+                list(GTA_COLUMNS), stable_fraction=stable_fraction)
+
+        return self.session.memoize(('transition_events', self.low_threshold, stable_fraction),
+                                    compute)
+
+    def analyze_transitions(self, stable_fraction=0.9):
+        """Print start-up / shutdown counts, ramp rates and time to stable load"""
+        events = self.transition_events(stable_fraction)
+        summary = events.summary()
+
+        print("\n" + "="*70)
+        print(f"START-UP / SHUTDOWN EVENTS (stable load = {stable_fraction:.0%} of run median HP)")
+        print("="*70)
 
-        # Step 1: Remove rows where ALL GTAs are down
-        all_down_mask = True
         for gta_name in GTA_COLUMNS.keys():
-            operational_col = f'{gta_name}_operational'
-            all_down_mask = all_down_mask & ~states[operational_col]
+            print(f"\n{gta_name}:")
+            for kind, label in [('startup', 'Start-ups'), ('shutdown', 'Shutdowns')]:
+                if (gta_name, kind) not in summary.index:
+                    print(f"  {label}: 0")
+                    continue
+                row = summary.loc[(gta_name, kind)]
+                print(f"  {label}: {row['count']:,} "
+                      f"(median ramp {row['median_ramp_duration']}, "
+                      f"{row['median_ramp_rate']:+.1f} t/h per hour; "
+                      f"{row['reached_stable']:,} with a measured ramp)")
 
-        rows_all_down = all_down_mask.sum()
-        cleaned = cleaned[~all_down_mask]
+        print("\n" + "="*70)
 
-        print(f"Step 1: Removed {rows_all_down:,} rows where all GTAs were down")
-        print(f"        Remaining: {len(cleaned):,} records")
-        print()
+        return events
 
-        # Step 2: For each GTA, set values to 0 when that GTA is down
-        for gta_name, columns in GTA_COLUMNS.items():
-            hp_col, mp_col, ee_col = columns
-            operational_col = f'{gta_name}_operational'
+    def threshold_sweep(self):
+        """DowntimeSweep over every GTA's HP admission (sorted once, memoized on the session)"""
 
-            # Get downtime mask for indices that exist in cleaned data
-            down_indices = states.index[~states[operational_col]]
-            down_indices_in_cleaned = down_indices.intersection(cleaned.index)
-            down_count = len(down_indices_in_cleaned)
+        def compute():
+            hp_cols = [columns[0] for columns in GTA_COLUMNS.values()]
+            return DowntimeSweep(self.data[hp_cols].to_numpy(dtype=np.float64),
+                                 list(GTA_COLUMNS), index=self.data.index)
 
-            # Set to 0 when down (instead of removing rows)
-            cleaned.loc[down_indices_in_cleaned, hp_col] = 0
-            cleaned.loc[down_indices_in_cleaned, mp_col] = 0
-            cleaned.loc[down_indices_in_cleaned, ee_col] = 0
+        return self.session.memoize('downtime_sweep', compute)
 
-            print(f"{gta_name}: Set {down_count:,} downtime records to 0")
+    def sweep_thresholds(self, thresholds=None):
+        """Uptime %, downtime periods and longest outage for many `low_threshold` values
 
-        print()
+        Equivalent to re-running calculate_uptime_statistics and
+        downtime_intervals per threshold, without reloading or rescanning.
+
+        Parameters:
+        -----------
+        thresholds : array-like, optional
+            Candidate thresholds (tons/hour); defaults to 0 - 100 in 0.5 steps
+
+        Returns:
+        --------
+        dict of GTA name -> DataFrame with columns threshold, uptime_pct,
+        operational_records, downtime_records, downtime_periods,
+        longest_outage_samples and longest_outage
+        """
+        if thresholds is None:
+            thresholds = np.arange(0, 100.5, 0.5)
+        sweep = self.threshold_sweep().sweep(thresholds)
+        return {gta_name: table.drop(columns='unit').reset_index(drop=True)
+                for gta_name, table in sweep.groupby('unit', sort=False)}
+
+    def compare_thresholds(self, candidates=(5, 10, 20, 50, 90)):
+        """Print the threshold sweep at a few candidate thresholds"""
+        tables = self.sweep_thresholds(candidates)
+
+        print("\n" + "="*70)
+        print("DOWNTIME THRESHOLD SENSITIVITY")
+        print("="*70)
+
+        for gta_name, table in tables.items():
+            print(f"\n{gta_name}:")
+            for row in table.itertuples():
+                longest = f"{row.longest_outage / pd.Timedelta(days=1):.1f} days"
+                marker = "  <- current" if row.threshold == self.low_threshold else ""
+                print(f"  HP <= {row.threshold:>5g}: uptime {row.uptime_pct:5.1f}%, "
+                      f"{row.downtime_periods:>4,} downtime periods, longest {longest}{marker}")
+
+        print("\n" + "="*70)
+
+        return tables
+
+    def create_cleaned_dataset(self, save_path=None):
+        """Create dataset with downtime periods removed and missing values handled"""
+
+        states = self.detect_operational_states()
 
-        # Step 3: Handle missing values
-        missing_before = cleaned.isnull().sum().sum()
+        print("\n" + "="*70)
+        print("CREATING CLEANED DATASET")
+        print("="*70)
+        print()
 
-        # Forward fill missing values (reasonable for time series)
-        cleaned = cleaned.ffill()
+        # All steps run as masks in one pass over a single copy
+        down = states[[f'{gta_name}_down' for gta_name in GTA_COLUMNS]].to_numpy()
+        measured = down | states[[f'{gta_name}_operational' for gta_name in GTA_COLUMNS]].to_numpy()
+        pipeline = CleaningPipeline([
+            # Step 1: Remove rows where ALL GTAs are down, and rows without any HP measurement
+            DropRows(down.all(axis=1), name='all_down'),
+            DropRows(~measured.any(axis=1), name='not_measured'),
+            # Step 2: For each GTA, set values to 0 when that GTA is down
+            ZeroWhere(down, GTA_COLUMNS, name='zero_downtime'),
+            # Step 3: Forward fill, then backward fill, then 0 for missing values
+            FillGaps(max_gap=None, fill_value=0, name='fill_missing'),
+        ])
+        cleaned, report = pipeline.run(self.data)
+        dropped, unmeasured, zeroed, filled = report
+
+        print(f"Step 1: Removed {dropped['rows_removed']:,} rows where all GTAs were down")
+        if unmeasured['rows_removed']:
+            print(f"        Removed {unmeasured['rows_removed']:,} rows without HP measurements")
+        print(f"        Remaining: {unmeasured['rows_remaining']:,} records")
+        print()
 
-        # If any still missing (at start), backward fill
-        cleaned = cleaned.bfill()
+        for gta_name, down_count in zeroed['rows_zeroed'].items():
+            print(f"{gta_name}: Set {down_count:,} downtime records to 0")
 
-        # If any STILL missing, fill with 0
-        cleaned = cleaned.fillna(0)
+        print()
 
-        missing_after = cleaned.isnull().sum().sum()
+        missing_before = filled['missing_before']
+        missing_after = filled['missing_after']
 
         print(f"Step 3: Handled missing values")
         print(f"        Before: {missing_before} missing values")
@@ -335,32 +530,43 @@ class DowntimeAnalyzer:
 
         # Save if path provided
         if save_path:
-            cleaned.to_csv(save_path)
-            print(f"✓ Saved cleaned dataset to: {save_path}")
+            artifact = self.artifacts.get(save_path, {'low_threshold': self.low_threshold})
+            if not artifact.reused:
+                cleaned.to_csv(save_path)
+                print(f"✓ Saved cleaned dataset to: {save_path}")
+                artifact.saved()
 
         print("="*70)
 
         return cleaned
 
-    def run_full_analysis(self):
-        """Run complete downtime analysis"""
+    def run_full_analysis(self, parallel=False, workers=None):
+        """Run complete downtime analysis
+
+        With parallel=True the figures are rendered in `workers` forked
+        processes (default: one per CPU) while the text steps run; the
+        printed output is unchanged.
+        """
 
         print("\n🔍 Running Downtime Analysis...\n")
 
-        print("1. Calculating uptime statistics...")
-        uptime_stats, states = self.calculate_uptime_statistics()
+        with FigureRenderer(self, workers if parallel else 1) as renderer:
+            renderer.submit(['plot_operational_timeline', 'plot_correlation_comparison'])
+
+            print("1. Calculating uptime statistics...")
+            uptime_stats, states = self.calculate_uptime_statistics()
 
-        print("\n2. Plotting operational timeline...")
-        self.plot_operational_timeline()
+            print("\n2. Plotting operational timeline...")
+            renderer.result('plot_operational_timeline')
 
-        print("\n3. Identifying major downtime periods...")
-        self.identify_downtime_periods()
+            print("\n3. Identifying major downtime periods...")
+            self.identify_downtime_periods()
 
-        print("\n4. Analyzing correlations (operational only)...")
-        self.analyze_correlation_operational_only()
+            print("\n4. Analyzing correlations (operational only)...")
+            self.analyze_correlation_operational_only()
 
-        print("\n5. Creating correlation comparison plot...")
-        self.plot_correlation_comparison()
+            print("\n5. Creating correlation comparison plot...")
+            renderer.result('plot_correlation_comparison')
 
         print("\n6. Creating cleaned dataset...")
         import os
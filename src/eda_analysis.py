@@ -2,11 +2,13 @@
 Exploratory Data Analysis for OCP Energy Optimization
 """
 
-import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
-from data_loader import EnergyDataLoader
+from session import get_session
+from decimation import decimate_for_axes
+from parallel_render import FigureRenderer
+from artifact_cache import ArtifactCache
 from config import CONSTRAINTS, GTA_COLUMNS, FIGURES_PATH
 import os
 
@@ -18,14 +20,28 @@ plt.rcParams['figure.figsize'] = (14, 8)
 class EnergyEDA:
     """Exploratory Data Analysis for energy data"""
 
-    def __init__(self):
-        self.loader = EnergyDataLoader()
-        self.data = self.loader.load_data()
-        self.totals = self.loader.calculate_system_totals()
+    def __init__(self, session=None):
+        self.session = session if session is not None else get_session()
+        self.loader = self.session.loader
+        self.artifacts = ArtifactCache(self.session, self)
         os.makedirs(FIGURES_PATH, exist_ok=True)
 
+    @property
+    def data(self):
+        """The session's current frame (follows load_data and append)"""
+        return self.session.data
+
+    @property
+    def totals(self):
+        """Memoized system totals of the session's current frame"""
+        return self.session.system_totals()
+
     def plot_time_series_overview(self):
         """Plot time series for all GTAs"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}time_series_overview.png")
+        if artifact.reused:
+            return
+
         fig, axes = plt.subplots(3, 1, figsize=(16, 12))
         fig.suptitle('Energy Production Time Series - All GTAs', fontsize=16, fontweight='bold')
 
@@ -34,8 +50,11 @@ class EnergyEDA:
 
         for idx, (metric, title) in enumerate(zip(metrics, titles)):
             for gta_name in GTA_COLUMNS.keys():
-                gta_data = self.loader.get_gta_data(gta_name)
-                axes[idx].plot(gta_data.index, gta_data[metric], label=gta_name, alpha=0.7)
+                gta_data = self.session.gta_data(gta_name)
+                # About two points per pixel column, spikes kept
+                keep = decimate_for_axes(axes[idx], gta_data.index, gta_data[metric])
+                axes[idx].plot(gta_data.index[keep], gta_data[metric].to_numpy()[keep],
+                               label=gta_name, alpha=0.7)
 
             axes[idx].set_title(title, fontsize=12)
             axes[idx].set_ylabel('Value')
@@ -46,10 +65,15 @@ class EnergyEDA:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}time_series_overview.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}time_series_overview.png")
+        artifact.saved()
         plt.close()
 
     def plot_system_totals(self):
         """Plot total system metrics"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}system_totals.png")
+        if artifact.reused:
+            return
+
         fig, axes = plt.subplots(3, 1, figsize=(16, 10))
         fig.suptitle('Total System Metrics Over Time', fontsize=16, fontweight='bold')
 
@@ -57,8 +81,10 @@ class EnergyEDA:
         titles = ['Total HP Steam Admission', 'Total MP Steam Extraction', 'Total Energy Production']
 
         for idx, (metric, title) in enumerate(zip(metrics, titles)):
-            axes[idx].plot(self.totals.index, self.totals[metric], color='navy', linewidth=0.8)
-            axes[idx].fill_between(self.totals.index, self.totals[metric], alpha=0.3)
+            keep = decimate_for_axes(axes[idx], self.totals.index, self.totals[metric])
+            index, values = self.totals.index[keep], self.totals[metric].to_numpy()[keep]
+            axes[idx].plot(index, values, color='navy', linewidth=0.8)
+            axes[idx].fill_between(index, values, alpha=0.3)
             axes[idx].set_title(title, fontsize=12)
             axes[idx].set_ylabel('Value')
             axes[idx].grid(True, alpha=0.3)
@@ -67,15 +93,20 @@ class EnergyEDA:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}system_totals.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}system_totals.png")
+        artifact.saved()
         plt.close()
 
     def plot_correlation_analysis(self):
         """Analyze correlations between variables"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}correlation_analysis.png")
+        if artifact.reused:
+            return
+
         fig, axes = plt.subplots(1, 3, figsize=(18, 5))
         fig.suptitle('Correlation Analysis by GTA', fontsize=16, fontweight='bold')
 
         for idx, gta_name in enumerate(GTA_COLUMNS.keys()):
-            gta_data = self.loader.get_gta_data(gta_name)
+            gta_data = self.session.gta_data(gta_name)
             corr = gta_data.corr()
 
             sns.heatmap(corr, annot=True, fmt='.3f', cmap='coolwarm', center=0,
@@ -85,23 +116,31 @@ class EnergyEDA:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}correlation_analysis.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}correlation_analysis.png")
+        artifact.saved()
         plt.close()
 
     def plot_distribution_analysis(self):
         """Plot distributions of key metrics"""
+        artifact = self.artifacts.get(f"{FIGURES_PATH}distribution_analysis.png")
+        if artifact.reused:
+            return
+
         fig, axes = plt.subplots(3, 3, figsize=(18, 12))
         fig.suptitle('Distribution Analysis - All GTAs', fontsize=16, fontweight='bold')
 
         metrics = ['HP_Admission', 'MP_Extraction', 'Energy_Production']
         metric_labels = ['HP Steam (tons/hour)', 'MP Steam (tons/hour)', 'Energy (MWh)']
 
+        # Bin counts, means and medians of every GTA and metric, computed once
+        summary = self.session.unit_summary(bins=50)
+
         for row_idx, (metric, label) in enumerate(zip(metrics, metric_labels)):
             for col_idx, gta_name in enumerate(GTA_COLUMNS.keys()):
-                gta_data = self.loader.get_gta_data(gta_name)
+                counts, edges = summary.histogram(gta_name, metric)
 
-                axes[row_idx, col_idx].hist(gta_data[metric], bins=50, alpha=0.7, color='steelblue', edgecolor='black')
-                axes[row_idx, col_idx].axvline(gta_data[metric].mean(), color='red', linestyle='--', linewidth=2, label='Mean')
-                axes[row_idx, col_idx].axvline(gta_data[metric].median(), color='green', linestyle='--', linewidth=2, label='Median')
+                axes[row_idx, col_idx].hist(edges[:-1], bins=edges, weights=counts, alpha=0.7, color='steelblue', edgecolor='black')
+                axes[row_idx, col_idx].axvline(summary.stat('mean', gta_name, metric), color='red', linestyle='--', linewidth=2, label='Mean')
+                axes[row_idx, col_idx].axvline(summary.stat('median', gta_name, metric), color='green', linestyle='--', linewidth=2, label='Median')
 
                 if row_idx == 0:
                     axes[row_idx, col_idx].set_title(f'{gta_name}', fontsize=11, fontweight='bold')
@@ -116,46 +155,26 @@ class EnergyEDA:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}distribution_analysis.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}distribution_analysis.png")
+        artifact.saved()
         plt.close()
 
     def calculate_efficiency_metrics(self):
-        """Calculate efficiency metrics for each GTA"""
-        efficiency_data = []
-
-        for gta_name in GTA_COLUMNS.keys():
-            gta_data = self.loader.get_gta_data(gta_name)
-
-            # Energy per unit HP steam
-            gta_data['Energy_per_HP'] = gta_data['Energy_Production'] / gta_data['HP_Admission']
+        """Calculate efficiency metrics for each GTA
 
-            # Energy per unit MP steam
-            gta_data['Energy_per_MP'] = gta_data['Energy_Production'] / gta_data['MP_Extraction']
-
-            # MP extraction efficiency (MP/HP ratio)
-            gta_data['MP_to_HP_Ratio'] = gta_data['MP_Extraction'] / gta_data['HP_Admission']
-
-            # Net steam consumption (HP - MP)
-            gta_data['Net_Steam_Consumption'] = gta_data['HP_Admission'] - gta_data['MP_Extraction']
-
-            efficiency_summary = {
-                'GTA': gta_name,
-                'Avg_Energy_per_HP': gta_data['Energy_per_HP'].mean(),
-                'Avg_Energy_per_MP': gta_data['Energy_per_MP'].mean(),
-                'Avg_MP_to_HP_Ratio': gta_data['MP_to_HP_Ratio'].mean(),
-                'Avg_Net_Steam': gta_data['Net_Steam_Consumption'].mean(),
-                'Total_Energy': gta_data['Energy_Production'].sum(),
-                'Avg_HP': gta_data['HP_Admission'].mean(),
-                'Avg_MP': gta_data['MP_Extraction'].mean()
-            }
-
-            efficiency_data.append(efficiency_summary)
-
-        return pd.DataFrame(efficiency_data)
+        Read from the session's UnitSummary: average energy per HP and per
+        MP steam, MP/HP ratio and net steam (HP - MP) per sample, plus the
+        total energy and average HP/MP admission.
+        """
+        return self.session.unit_summary().efficiency()
 
     def plot_efficiency_comparison(self):
         """Plot efficiency metrics comparison"""
         efficiency_df = self.calculate_efficiency_metrics()
 
+        artifact = self.artifacts.get(f"{FIGURES_PATH}efficiency_comparison.png")
+        if artifact.reused:
+            return efficiency_df
+
         fig, axes = plt.subplots(2, 2, figsize=(14, 10))
         fig.suptitle('GTA Efficiency Comparison', fontsize=16, fontweight='bold')
 
@@ -186,23 +205,22 @@ class EnergyEDA:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}efficiency_comparison.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}efficiency_comparison.png")
+        artifact.saved()
         plt.close()
 
         return efficiency_df
 
     def analyze_temporal_patterns(self):
         """Analyze hourly and daily patterns"""
-        # Add time features
-        totals_copy = self.totals.copy()
-        totals_copy['Hour'] = totals_copy.index.hour
-        totals_copy['DayOfWeek'] = totals_copy.index.dayofweek
-        totals_copy['Date'] = totals_copy.index.date
-
-        # Hourly patterns
-        hourly_avg = totals_copy.groupby('Hour')[['Total_HP_Admission', 'Total_MP_Extraction', 'Total_Energy_Production']].mean()
+        # Hourly and daily patterns from the hour / day rollups (exact means)
+        rollups = self.session.rollups()
+        columns = ['Total_HP_Admission', 'Total_MP_Extraction', 'Total_Energy_Production']
+        hourly_avg = rollups.profile('hour', columns).rename_axis('Hour')
+        daily_avg = rollups.profile('dayofweek', columns).rename_axis('DayOfWeek')
 
-        # Daily patterns
-        daily_avg = totals_copy.groupby('DayOfWeek')[['Total_HP_Admission', 'Total_MP_Extraction', 'Total_Energy_Production']].mean()
+        artifact = self.artifacts.get(f"{FIGURES_PATH}temporal_patterns.png")
+        if artifact.reused:
+            return hourly_avg, daily_avg
 
         fig, axes = plt.subplots(2, 1, figsize=(14, 10))
         fig.suptitle('Temporal Patterns Analysis', fontsize=16, fontweight='bold')
@@ -229,6 +247,7 @@ class EnergyEDA:
         plt.tight_layout()
         plt.savefig(f"{FIGURES_PATH}temporal_patterns.png", dpi=300, bbox_inches='tight')
         print(f"✓ Saved: {FIGURES_PATH}temporal_patterns.png")
+        artifact.saved()
         plt.close()
 
         return hourly_avg, daily_avg
@@ -265,27 +284,36 @@ class EnergyEDA:
 
         print("\n" + "="*70)
 
-    def run_full_analysis(self):
-        """Run complete EDA pipeline"""
+    def run_full_analysis(self, parallel=False, workers=None):
+        """Run complete EDA pipeline
+
+        With parallel=True the figures are rendered in `workers` forked
+        processes (default: one per CPU); the printed output is unchanged.
+        """
         print("\nRunning Full Exploratory Data Analysis...\n")
 
-        print("1. Generating time series overview...")
-        self.plot_time_series_overview()
+        with FigureRenderer(self, workers if parallel else 1) as renderer:
+            renderer.submit(['plot_time_series_overview', 'plot_system_totals',
+                             'plot_correlation_analysis', 'plot_distribution_analysis',
+                             'plot_efficiency_comparison', 'analyze_temporal_patterns'])
+
+            print("1. Generating time series overview...")
+            renderer.result('plot_time_series_overview')
 
-        print("2. Plotting system totals...")
-        self.plot_system_totals()
+            print("2. Plotting system totals...")
+            renderer.result('plot_system_totals')
 
-        print("3. Analyzing correlations...")
-        self.plot_correlation_analysis()
+            print("3. Analyzing correlations...")
+            renderer.result('plot_correlation_analysis')
 
-        print("4. Analyzing distributions...")
-        self.plot_distribution_analysis()
+            print("4. Analyzing distributions...")
+            renderer.result('plot_distribution_analysis')
 
-        print("5. Comparing efficiency metrics...")
-        self.plot_efficiency_comparison()
+            print("5. Comparing efficiency metrics...")
+            renderer.result('plot_efficiency_comparison')
 
-        print("6. Analyzing temporal patterns...")
-        self.analyze_temporal_patterns()
+            print("6. Analyzing temporal patterns...")
+            renderer.result('analyze_temporal_patterns')
 
         print("\n7. Generating summary report...")
         self.generate_summary_report()
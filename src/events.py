@@ -0,0 +1,204 @@
+"""
+Start-up / shutdown event table
+Extracts every state transition of every unit in one vectorized pass over
+the (time x unit) state and HP arrays, with the ramp towards (or away from)
+the stable load of the operating run, and keeps the events as sorted
+arrays per unit so time-range queries are binary searches
+"""
+
+import numpy as np
+import pandas as pd
+
+# Event kinds as stored in TransitionEvents.kinds
+STARTUP = 1
+SHUTDOWN = -1
+
+
+class TransitionEvents:
+    """Start-ups and shutdowns with ramp rates and time to/from stable load
+
+    For every operating run (maximal run of `states` True) the stable
+    level is the median HP of the run. A start-up ramps from the last down
+    sample to the first sample at or above `stable_fraction` of that
+    level; a shutdown ramps from the last such sample to the first down
+    sample. `ramp_duration` and `ramp_rate` (tons/hour per hour, negative
+    for shutdowns) describe that ramp; both are missing when the run never
+    reaches the stable band or the transition has no sample on the other
+    side.
+
+    Samples with missing HP have no state of their own: they carry the
+    state of the previous measured sample (the next one at the start of
+    the data), so a gap never starts or ends a run, and a start-up ramps
+    from the last measured down sample.
+    """
+
+    def __init__(self, index, states, hp, units, stable_fraction=0.9):
+        """
+        Parameters:
+        -----------
+        index : DatetimeIndex
+            Sample timestamps (sorted)
+        states : array-like of bool, shape (T, n_units)
+            Operational state per sample (e.g. DowntimeAnalyzer states)
+        hp : array-like, shape (T, n_units)
+            HP admission per sample
+        units : list of str
+            Unit names for the columns
+        stable_fraction : float
+            Share of the run's median HP that counts as stable load
+        """
+        index = pd.DatetimeIndex(index)
+        n_rows, n_units = len(index), len(units)
+        states = np.asarray(states, dtype=bool).reshape(n_rows, n_units)
+        hp = np.asarray(hp, dtype=np.float64).reshape(n_rows, n_units)
+        self.units = list(units)
+        self.stable_fraction = stable_fraction
+        times = index.as_unit('ns').asi8
+
+        # Nearest measured row at or before / at or after each row, per unit
+        rows_col = np.arange(n_rows).reshape(-1, 1)
+        known = ~np.isnan(hp)
+        previous = np.maximum.accumulate(np.where(known, rows_col, -1), axis=0)
+        following = np.minimum.accumulate(np.where(known, rows_col, n_rows)[::-1], axis=0)[::-1]
+        source = np.where(previous >= 0, previous, following)
+        states = (np.take_along_axis(states, np.clip(source, None, n_rows - 1), axis=0)
+                  & (source < n_rows))
+
+        # Operating runs [start, stop) per unit, unit-major (as StateIntervals)
+        padded = np.zeros((n_units, n_rows + 2), dtype=np.int8)
+        padded[:, 1:-1] = states.T
+        edges = np.diff(padded, axis=1)
+        run_unit, run_start = np.nonzero(edges == 1)
+        _, run_stop = np.nonzero(edges == -1)
+        lengths = run_stop - run_start
+
+        # Samples of all runs back to back: run r occupies [offset[r], offset[r + 1])
+        offset = np.concatenate([[0], np.cumsum(lengths)])
+        run_of = np.repeat(np.arange(len(lengths)), lengths)
+        rows = np.arange(offset[-1]) - offset[run_of] + run_start[run_of]
+        values = hp[rows, run_unit[run_of]]
+
+        # Median HP per run: sort by (run, value), missing values last in each run
+        ordered = values[np.lexsort((values, run_of))]
+        n_valid = np.bincount(run_of, weights=~np.isnan(values), minlength=len(lengths)).astype(np.int64)
+        low = offset[:-1] + np.maximum(n_valid - 1, 0) // 2
+        high = offset[:-1] + np.maximum(n_valid, 1) // 2
+        level = np.full(len(lengths), np.nan)
+        has_values = n_valid > 0
+        level[has_values] = (ordered[low[has_values]] + ordered[high[has_values]]) / 2
+
+        # First and last stable sample of every run
+        with np.errstate(invalid='ignore'):
+            stable = np.flatnonzero(values >= stable_fraction * level[run_of])
+        first = np.searchsorted(stable, offset[:-1])
+        last = np.searchsorted(stable, offset[1:]) - 1
+        stable_padded = np.append(stable, offset[-1])
+        first_idx = stable_padded[first]
+        last_idx = stable_padded[np.maximum(last, 0)]
+        has_first = first_idx < offset[1:]
+        has_last = (last >= 0) & (last_idx >= offset[:-1])
+        first_row = np.full(len(lengths), -1)
+        last_row = np.full(len(lengths), -1)
+        first_row[has_first] = rows[first_idx[has_first]]
+        last_row[has_last] = rows[last_idx[has_last]]
+
+        # Start-ups: runs not open at the first sample; shutdowns: runs closed before the end
+        up = run_start > 0
+        down = run_stop < n_rows
+        kinds = np.concatenate([np.full(up.sum(), STARTUP, dtype=np.int8),
+                                np.full(down.sum(), SHUTDOWN, dtype=np.int8)])
+        unit_codes = np.concatenate([run_unit[up], run_unit[down]])
+        position = np.concatenate([run_start[up], run_stop[down]])
+        # Ramp end points: (from_row, to_row) in time order of the ramp
+        from_row = np.concatenate([previous[run_start[up] - 1, run_unit[up]], last_row[down]])
+        to_row = np.concatenate([first_row[up], run_stop[down]])
+        ramp_ok = (from_row >= 0) & (to_row >= 0)
+        from_row, to_row = np.where(ramp_ok, from_row, 0), np.where(ramp_ok, to_row, 0)
+
+        duration = np.where(ramp_ok, times[to_row] - times[from_row], np.iinfo(np.int64).min)
+        hp_from = hp[from_row, unit_codes]
+        hp_to = hp[to_row, unit_codes]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            rate = (hp_to - hp_from) / (duration / pd.Timedelta(hours=1).value)
+
+        # Sorted by unit, then time: CSR offsets per unit
+        order = np.lexsort((position, unit_codes))
+        self.unit_codes = unit_codes[order]
+        self.positions = position[order]
+        self.kinds = kinds[order]
+        self.times = times[self.positions]
+        self.hp_from = np.where(ramp_ok, hp_from, np.nan)[order]
+        self.hp_to = np.where(ramp_ok, hp_to, np.nan)[order]
+        self.stable_level = np.concatenate([level[up], level[down]])[order]
+        self.ramp_duration = duration[order]
+        self.ramp_rate = np.where(ramp_ok, rate, np.nan)[order]
+        self.unit_ptr = np.searchsorted(self.unit_codes, np.arange(n_units + 1))
+
+    @classmethod
+    def from_frame(cls, states, hp, stable_fraction=0.9):
+        """Build from a boolean state DataFrame and an HP DataFrame (one column per unit)"""
+        return cls(states.index, states.to_numpy(dtype=bool), hp.to_numpy(dtype=np.float64),
+                   list(states.columns), stable_fraction)
+
+    def __len__(self):
+        return len(self.positions)
+
+    def _unit_slice(self, unit):
+        """Rows of one unit's events"""
+        u = self.units.index(unit)
+        return slice(self.unit_ptr[u], self.unit_ptr[u + 1])
+
+    def table(self, rows=None):
+        """Events as a DataFrame: unit, event, time, hp_from, hp_to, stable_level,
+        ramp_duration, ramp_rate"""
+        rows = slice(None) if rows is None else rows
+        return pd.DataFrame({
+            'unit': np.asarray(self.units, dtype=object)[self.unit_codes[rows]],
+            'event': np.where(self.kinds[rows] == STARTUP, 'startup', 'shutdown'),
+            'time': pd.DatetimeIndex(self.times[rows].astype('datetime64[ns]')),
+            'hp_from': self.hp_from[rows],
+            'hp_to': self.hp_to[rows],
+            'stable_level': self.stable_level[rows],
+            'ramp_duration': pd.to_timedelta(self.ramp_duration[rows], unit='ns'),
+            'ramp_rate': self.ramp_rate[rows],
+        })
+
+    def _select(self, units, start=None, end=None, kind=None):
+        """Row numbers of events of `units` with start <= time <= end"""
+        a = -np.inf if start is None else pd.Timestamp(start).as_unit('ns').value
+        b = np.inf if end is None else pd.Timestamp(end).as_unit('ns').value
+        parts = []
+        for unit in units:
+            sl = self._unit_slice(unit)
+            lo = sl.start + np.searchsorted(self.times[sl], a, side='left')
+            hi = sl.start + np.searchsorted(self.times[sl], b, side='right')
+            parts.append(np.arange(lo, hi))
+        rows = np.concatenate(parts) if parts else np.arange(0)
+        if kind is not None:
+            rows = rows[self.kinds[rows] == (STARTUP if kind == 'startup' else SHUTDOWN)]
+        return rows
+
+    def for_unit(self, unit, kind=None):
+        """All events of one unit ('startup' / 'shutdown' only with `kind`), in time order"""
+        return self.table(self._select([unit], kind=kind))
+
+    def between(self, start, end, unit=None, kind=None):
+        """Events with start <= time <= end, optionally for one unit and kind"""
+        units = self.units if unit is None else [unit]
+        return self.table(self._select(units, start, end, kind))
+
+    def last_before(self, ts, unit):
+        """Most recent event of `unit` at or before `ts` (a one-row table, or empty)"""
+        sl = self._unit_slice(unit)
+        k = sl.start + np.searchsorted(self.times[sl], pd.Timestamp(ts).as_unit('ns').value,
+                                       side='right') - 1
+        return self.table(np.arange(k, k + 1) if k >= sl.start else np.arange(0))
+
+    def summary(self):
+        """Per unit and event kind: count, median ramp duration and median ramp rate"""
+        table = self.table()
+        return (table.groupby(['unit', 'event'], sort=False)
+                .agg(count=('time', 'size'),
+                     median_ramp_duration=('ramp_duration', 'median'),
+                     median_ramp_rate=('ramp_rate', 'median'),
+                     reached_stable=('ramp_rate', 'count')))
@@ -0,0 +1,159 @@
+"""
+Run-length interval index for boolean per-unit states
+Stores every period where a state holds (down, violating MP, violating HP,
+...) as sorted start/stop arrays per unit, built in one vectorized pass, so
+point and range queries are binary searches instead of rescans
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def bridge_unknown(mask, known):
+    """Resolve the unknown samples of a boolean (T, n_units) state
+
+    An unknown sample is True only when the nearest known samples on both
+    sides are True: a gap inside a run neither splits nor ends it, and a
+    run never extends into a gap at its edges.
+    """
+    mask = np.asarray(mask, dtype=bool)
+    known = np.asarray(known, dtype=bool)
+    n_rows = len(mask)
+    rows = np.arange(n_rows).reshape(-1, 1)
+    previous = np.maximum.accumulate(np.where(known, rows, -1), axis=0)
+    following = np.minimum.accumulate(np.where(known, rows, n_rows)[::-1], axis=0)[::-1]
+    before = np.take_along_axis(mask, np.clip(previous, 0, None), axis=0) & (previous >= 0)
+    after = np.take_along_axis(mask, np.clip(following, None, n_rows - 1), axis=0) & (following < n_rows)
+    return np.where(known, mask, before & after)
+
+
+class StateIntervals:
+    """Maximal runs of True in a boolean (time x unit) state
+
+    Intervals are half-open in time: [start, stop), where `stop` is the
+    timestamp of the first sample after the run. Tables also report `end`,
+    the last sample inside the run, as the existing downtime reports do.
+    """
+
+    def __init__(self, index, mask, units):
+        """
+        Parameters:
+        -----------
+        index : DatetimeIndex
+            Sample timestamps (sorted)
+        mask : array-like of bool, shape (T, n_units)
+            State per sample and unit; missing values must already be
+            resolved (see bridge_unknown)
+        units : list of str
+            Unit names for the mask columns
+        """
+        index = pd.DatetimeIndex(index)
+        mask = np.asarray(mask, dtype=bool).reshape(len(index), len(units))
+        self.units = list(units)
+        self.n_samples_total = len(index)
+
+        # Unit-major diff of the padded mask: +1 opens a run, -1 closes it
+        padded = np.zeros((len(self.units), len(index) + 2), dtype=np.int8)
+        padded[:, 1:-1] = mask.T
+        edges = np.diff(padded, axis=1)
+        unit_codes, start_pos = np.nonzero(edges == 1)
+        _, stop_pos = np.nonzero(edges == -1)
+
+        # Times are kept as int64 nanoseconds; a run reaching the end of the
+        # data stops one sampling step after the last sample
+        times = index.as_unit('ns').asi8
+        if len(index) > 1:
+            after_last = times[-1] + (times[-1] - times[-2])
+        else:
+            after_last = times[-1] + pd.Timedelta(minutes=15).value if len(index) else 0
+        times_ext = np.append(times, after_last)
+
+        self.unit_codes = unit_codes
+        self.start_pos = start_pos
+        self.stop_pos = stop_pos
+        self.starts = times_ext[start_pos]
+        self.stops = times_ext[stop_pos]
+        self.ends = times_ext[stop_pos - 1] if len(stop_pos) else times_ext[:0]
+        # Row range of each unit's intervals (CSR-style offsets)
+        self.unit_ptr = np.searchsorted(unit_codes, np.arange(len(self.units) + 1))
+
+    @classmethod
+    def from_states(cls, states):
+        """Build from a boolean DataFrame with one column per unit"""
+        return cls(states.index, states.to_numpy(dtype=bool), list(states.columns))
+
+    def __len__(self):
+        return len(self.start_pos)
+
+    @staticmethod
+    def _to_time(values):
+        """int64 nanoseconds -> DatetimeIndex"""
+        return pd.DatetimeIndex(np.asarray(values, dtype='datetime64[ns]'))
+
+    @staticmethod
+    def _ts(ts):
+        """Timestamp -> int64 nanoseconds"""
+        return pd.Timestamp(ts).as_unit('ns').value
+
+    def _unit_slice(self, unit):
+        """Rows of one unit's intervals"""
+        u = self.units.index(unit)
+        return slice(self.unit_ptr[u], self.unit_ptr[u + 1])
+
+    def table(self, rows=None):
+        """Intervals as a DataFrame: unit, start, end, stop, n_samples, duration"""
+        rows = slice(None) if rows is None else rows
+        start = self._to_time(self.starts[rows])
+        end = self._to_time(self.ends[rows])
+        return pd.DataFrame({
+            'unit': np.asarray(self.units, dtype=object)[self.unit_codes[rows]],
+            'start': start,
+            'end': end,
+            'stop': self._to_time(self.stops[rows]),
+            'n_samples': self.stop_pos[rows] - self.start_pos[rows],
+            'duration': end - start,
+        })
+
+    def for_unit(self, unit):
+        """All intervals of one unit, in time order"""
+        return self.table(np.arange(len(self))[self._unit_slice(unit)])
+
+    def active_at(self, ts):
+        """Units whose state holds at time `ts`"""
+        t = self._ts(ts)
+        active = []
+        for u, unit in enumerate(self.units):
+            lo, hi = self.unit_ptr[u], self.unit_ptr[u + 1]
+            k = lo + np.searchsorted(self.starts[lo:hi], t, side='right') - 1
+            if k >= lo and self.stops[k] > t:
+                active.append(unit)
+        return active
+
+    def overlapping(self, start, end, unit=None):
+        """Intervals intersecting [start, end], optionally for one unit"""
+        a, b = self._ts(start), self._ts(end)
+        units = self.units if unit is None else [unit]
+        rows = []
+        for name in units:
+            sl = self._unit_slice(name)
+            lo = sl.start + np.searchsorted(self.stops[sl], a, side='right')
+            hi = sl.start + np.searchsorted(self.starts[sl], b, side='right')
+            rows.append(np.arange(lo, hi))
+        return self.table(np.concatenate(rows) if rows else np.arange(0))
+
+    def longer_than(self, min_duration, unit=None):
+        """Intervals whose end - start exceeds `min_duration`"""
+        rows = np.flatnonzero(self.ends - self.starts > pd.Timedelta(min_duration).value)
+        if unit is not None:
+            rows = rows[self.unit_codes[rows] == self.units.index(unit)]
+        return self.table(rows)
+
+    def duration_histogram(self, bins, unit=None):
+        """Histogram of interval lengths (stop - start) in hours
+
+        Returns (counts, bin_edges) as numpy.histogram.
+        """
+        durations = (self.stops - self.starts) / pd.Timedelta(hours=1).value
+        if unit is not None:
+            durations = durations[self._unit_slice(unit)]
+        return np.histogram(durations, bins=bins)
@@ -0,0 +1,182 @@
+"""
+Operating-mode clustering
+Labels every sample of a GTA with an operating mode (shutdown, low load,
+full power, ...) from its (HP, MP, EE) point. One MiniBatchKMeans per GTA
+is fitted on standardized features; the centroids are kept (and can be
+saved) so new samples are assigned with vectorized distance computations,
+and per-mode envelopes replace the single static CONSTRAINTS limits
+"""
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from unit_store import METRICS
+
+# Rows per distance computation in assign()
+_ASSIGN_BATCH = 1 << 16
+
+
+class OperatingModeModel:
+    """Per-GTA operating modes with per-mode envelopes
+
+    Modes are numbered by ascending mean HP admission of their centroid, so
+    mode 0 is the lowest-load one (shutdown when the unit has downtime). A
+    sample outside the [lower, upper] percentile envelope of its mode for
+    some metric counts as a mode violation. Missing rows get mode -1.
+    """
+
+    def __init__(self, n_modes=4, batch_size=4096, envelope=(0.5, 99.5), random_state=42):
+        """
+        Parameters:
+        -----------
+        n_modes : int
+            Clusters per GTA
+        batch_size : int
+            MiniBatchKMeans batch size
+        envelope : (float, float)
+            Lower and upper percentile of each metric within a mode that
+            bound its normal range
+        random_state : int
+            Seed of the k-means initialisation and batches
+        """
+        self.n_modes = n_modes
+        self.batch_size = batch_size
+        self.envelope = envelope
+        self.random_state = random_state
+        self.units = []
+        self.metrics = list(METRICS)
+        self.centroids = None   # (n_units, n_modes, n_metrics), data units
+        self.center = None      # (n_units, n_metrics) standardization
+        self.scale = None
+        self.limits = None      # (n_units, n_modes, n_metrics, 2) lower / upper
+
+    def fit(self, values, units, metrics=METRICS):
+        """Fit every unit's modes on a (T, n_units, n_metrics) block; returns self"""
+        values = np.asarray(values, dtype=np.float64)
+        n_units, n_metrics = values.shape[1:]
+        self.units = list(units)
+        self.metrics = list(metrics)
+        self.centroids = np.full((n_units, self.n_modes, n_metrics), np.nan)
+        self.center = np.zeros((n_units, n_metrics))
+        self.scale = np.ones((n_units, n_metrics))
+
+        for u in range(n_units):
+            X = values[:, u, :]
+            X = X[~np.isnan(X).any(axis=1)]
+            if len(X) < self.n_modes:
+                continue
+            self.center[u] = X.mean(axis=0)
+            self.scale[u] = np.where(X.std(axis=0) > 0, X.std(axis=0), 1.0)
+            kmeans = MiniBatchKMeans(n_clusters=self.n_modes, batch_size=self.batch_size,
+                                     n_init=3, random_state=self.random_state)
+            kmeans.fit((X - self.center[u]) / self.scale[u])
+            centroids = kmeans.cluster_centers_ * self.scale[u] + self.center[u]
+            order = np.argsort(centroids[:, self.metrics.index('HP_Admission')])
+            self.centroids[u] = centroids[order]
+
+        self.limits = self.mode_statistics(values, self.assign_block(values), raw=True)
+        return self
+
+    def assign(self, unit, X):
+        """Mode of each (HP, MP, EE) row of one unit, in batches of distance computations"""
+        u = self.units.index(unit)
+        X = np.asarray(X, dtype=np.float64).reshape(-1, len(self.metrics))
+        labels = np.full(len(X), -1, dtype=np.int64)
+        # Nearest centroid in standardized space: |x|^2 - 2 x.c + |c|^2
+        centroids = (self.centroids[u] - self.center[u]) / self.scale[u]
+        if np.isnan(centroids).any():
+            return labels
+        c_norm = (centroids ** 2).sum(axis=1)
+        for lo in range(0, len(X), _ASSIGN_BATCH):
+            batch = (X[lo:lo + _ASSIGN_BATCH] - self.center[u]) / self.scale[u]
+            valid = ~np.isnan(batch).any(axis=1)
+            distance = c_norm - 2 * batch[valid] @ centroids.T
+            labels[lo:lo + _ASSIGN_BATCH][valid] = np.argmin(distance, axis=1)
+        return labels
+
+    def assign_block(self, values):
+        """(T, n_units) modes of a (T, n_units, n_metrics) block"""
+        values = np.asarray(values)
+        return np.column_stack([self.assign(unit, values[:, u, :])
+                                for u, unit in enumerate(self.units)])
+
+    def mode_statistics(self, values, labels, raw=False):
+        """Per unit and mode: samples, share, mean and envelope of every metric
+
+        Returns a tidy DataFrame (unit, mode, n_samples, pct, and
+        <metric>_mean / _lower / _upper columns); with raw=True only the
+        (n_units, n_modes, n_metrics, 2) envelope array.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_units, n_metrics = values.shape[1:]
+        limits = np.full((n_units, self.n_modes, n_metrics, 2), np.nan)
+        means = np.full((n_units, self.n_modes, n_metrics), np.nan)
+        counts = np.zeros((n_units, self.n_modes), dtype=np.int64)
+
+        for u in range(n_units):
+            # Group rows by mode once (stable sort), then slice each group
+            order = np.argsort(labels[:, u], kind='stable')
+            bounds = np.searchsorted(labels[order, u], np.arange(-1, self.n_modes + 1))
+            for m in range(self.n_modes):
+                rows = order[bounds[m + 1]:bounds[m + 2]]
+                counts[u, m] = len(rows)
+                if len(rows):
+                    X = values[rows, u, :]
+                    means[u, m] = X.mean(axis=0)
+                    limits[u, m] = np.percentile(X, self.envelope, axis=0).T
+
+        if raw:
+            return limits
+
+        table = pd.DataFrame({
+            'unit': np.repeat(self.units, self.n_modes),
+            'mode': np.tile(np.arange(self.n_modes), n_units),
+            'n_samples': counts.ravel(),
+            'pct': (counts / np.maximum(counts.sum(axis=1, keepdims=True), 1) * 100).ravel(),
+        })
+        for j, metric in enumerate(self.metrics):
+            table[f'{metric}_mean'] = means[:, :, j].ravel()
+            table[f'{metric}_lower'] = limits[:, :, j, 0].ravel()
+            table[f'{metric}_upper'] = limits[:, :, j, 1].ravel()
+        return table
+
+    def envelope_violations(self, values, labels=None):
+        """(n_units, n_modes, n_metrics) counts of samples outside their mode's envelope"""
+        values = np.asarray(values, dtype=np.float64)
+        labels = self.assign_block(values) if labels is None else labels
+        n_units, n_metrics = values.shape[1:]
+        counts = np.zeros((n_units, self.n_modes, n_metrics), dtype=np.int64)
+        units = np.arange(n_units)[None, :]
+        bounds = self.limits[units, np.maximum(labels, 0)]        # (T, n_units, n_metrics, 2)
+        with np.errstate(invalid='ignore'):
+            outside = (values < bounds[..., 0]) | (values > bounds[..., 1])
+        outside &= (labels >= 0)[..., None]
+        for u in range(n_units):
+            counts[u] = np.array([np.bincount(labels[:, u][outside[:, u, j]], minlength=self.n_modes)
+                                  for j in range(n_metrics)]).T
+        return counts
+
+    def save(self, path):
+        """Write centroids, standardization and envelopes to an .npz file"""
+        np.savez(path, units=np.array(self.units), metrics=np.array(self.metrics),
+                 centroids=self.centroids, center=self.center, scale=self.scale,
+                 limits=self.limits, envelope=np.array(self.envelope))
+
+    @classmethod
+    def load(cls, path):
+        """Model saved with save(); assignment needs no refit"""
+        saved = np.load(path)
+        model = cls(n_modes=saved['centroids'].shape[1], envelope=tuple(saved['envelope']))
+        model.units = [str(unit) for unit in saved['units']]
+        model.metrics = [str(metric) for metric in saved['metrics']]
+        for name in ('centroids', 'center', 'scale', 'limits'):
+            setattr(model, name, saved[name])
+        return model
+
+
+if __name__ == "__main__":
+    from session import get_session
+
+    session = get_session()
+    session.loader.validate_constraints(operating_modes=session.operating_modes())
+    session.loader.print_validation_report()
@@ -0,0 +1,98 @@
+"""
+Parallel figure rendering
+Runs an analyzer's figure methods in forked worker processes with the Agg
+backend. Workers inherit the analyzer (and its loaded session) from the
+parent when they are forked, so only the method name crosses the process
+boundary; each method's printed output is captured and replayed in the
+parent in step order, so the log reads exactly as a serial run
+"""
+
+import contextlib
+import io
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Analyzers visible to forked workers, by registration key
+_OWNERS = {}
+
+
+def _render(key, method):
+    """Worker side: call `method` on the inherited analyzer, capturing its output"""
+    import matplotlib.pyplot as plt
+
+    plt.switch_backend('Agg')
+    buffer = io.StringIO()
+    with contextlib.redirect_stdout(buffer):
+        value = getattr(_OWNERS[key], method)()
+    plt.close('all')
+    return buffer.getvalue(), value
+
+
+class FigureRenderer:
+    """Render figure methods of one analyzer in a process pool
+
+    Usage inside run_full_analysis:
+
+        with FigureRenderer(self, workers) as renderer:
+            renderer.submit(['plot_a', 'plot_b'])   # start rendering now
+            ...                                     # text steps run meanwhile
+            renderer.result('plot_a')               # prints plot_a's output
+
+    With workers=1, or where the 'fork' start method is unavailable, methods
+    simply run in-process when their result is requested. Figures rendered
+    in workers do not add to the parent's session memo.
+    """
+
+    def __init__(self, owner, workers=None):
+        """
+        Parameters:
+        -----------
+        owner : object
+            Analyzer whose methods are rendered
+        workers : int, optional
+            Worker processes; defaults to the number of CPUs
+        """
+        self.owner = owner
+        self.workers = workers if workers is not None else (os.cpu_count() or 1)
+        self._executor = None
+        self._futures = {}
+        self._key = None
+
+    @property
+    def parallel(self):
+        """Whether figures are rendered in worker processes"""
+        return self.workers > 1 and 'fork' in multiprocessing.get_all_start_methods()
+
+    def __enter__(self):
+        if self.parallel:
+            # Registered before the workers fork so they inherit it
+            self._key = id(self)
+            _OWNERS[self._key] = self.owner
+            sys.stdout.flush()
+            self._executor = ProcessPoolExecutor(max_workers=self.workers,
+                                                 mp_context=multiprocessing.get_context('fork'))
+        return self
+
+    def submit(self, methods):
+        """Start rendering the named methods (no-op when running serially)"""
+        if self._executor is not None:
+            for method in methods:
+                self._futures[method] = self._executor.submit(_render, self._key, method)
+
+    def result(self, method):
+        """Wait for a method, print its captured output and return its value"""
+        if method not in self._futures:
+            return getattr(self.owner, method)()
+        output, value = self._futures.pop(method).result()
+        sys.stdout.write(output)
+        return value
+
+    def __exit__(self, *exc):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            _OWNERS.pop(self._key, None)
+            self._executor = None
+        self._futures.clear()
+        return False
@@ -0,0 +1,202 @@
+"""
+Physics-residual consistency check
+Energy production is modelled per GTA (and optionally per operating regime)
+as EE ~ a + b*HP + c*MP. All units and regimes are fitted with one batched
+least-squares solve on sufficient statistics (X'X, X'y, y'y, n), which also
+make rolling-window refits a matter of differencing cumulative sums
+"""
+
+import numpy as np
+from unit_store import METRICS
+
+COEFFICIENTS = ['intercept', 'hp', 'mp']
+
+
+def _design(values, mask):
+    """Design Z = [1, HP, MP], target EE and weights, zeroed where not used
+
+    `values` is (T, n_units, 3) in METRICS order, `mask` (T, n_units) bool.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    hp = values[:, :, METRICS.index('HP_Admission')]
+    mp = values[:, :, METRICS.index('MP_Extraction')]
+    ee = values[:, :, METRICS.index('Energy_Production')]
+    valid = mask & ~(np.isnan(hp) | np.isnan(mp) | np.isnan(ee))
+
+    Z = np.stack([np.ones_like(hp), hp, mp], axis=-1)
+    Z = np.where(valid[..., None], Z, 0.0)
+    y = np.where(valid, ee, 0.0)
+    return Z, y, valid.astype(np.float64)
+
+
+def sufficient_statistics(Z, y, weight):
+    """X'X, X'y, y'y and n summed over time for weighted rows of Z (T, n_units, 3)"""
+    Zw = Z * weight[..., None]
+    xtx = np.einsum('tui,tuj->uij', Zw, Z)
+    xty = np.einsum('tui,tu->ui', Zw, y)
+    yty = np.einsum('tu,tu->u', weight * y, y)
+    return xtx, xty, yty, weight.sum(axis=0)
+
+
+def solve(xtx, xty, yty, n, ridge=1e-9, min_rows=10):
+    """Batched least squares over any leading shape
+
+    Returns (coefficients (..., 3), residual std (...)); NaN where a fit has
+    fewer than `min_rows` rows.
+    """
+    # A tiny ridge on each diagonal term (relative to its own scale) keeps
+    # empty or collinear fits solvable without biasing well-posed ones
+    diagonal = np.diagonal(xtx, axis1=-2, axis2=-1)
+    penalty = np.eye(xtx.shape[-1]) * (ridge * np.maximum(diagonal, 1.0))[..., None, :]
+    beta = np.linalg.solve(xtx + penalty, xty[..., None])[..., 0]
+
+    sse = yty - 2 * np.einsum('...i,...i->...', beta, xty) + np.einsum('...i,...ij,...j->...', beta, xtx, beta)
+    dof = np.maximum(n - xtx.shape[-1], 1)
+    sigma = np.sqrt(np.maximum(sse, 0.0) / dof)
+
+    enough = n >= min_rows
+    return np.where(enough[..., None], beta, np.nan), np.where(enough, sigma, np.nan)
+
+
+class PhysicsResidualChecker:
+    """Flag samples whose energy does not match the unit's own HP/MP relation
+
+    A sample is inconsistent when |EE - (a + b*HP + c*MP)| exceeds
+    `tolerance` residual standard deviations of its fit (and at least
+    `min_band` MW).
+    """
+
+    def __init__(self, tolerance=3.0, min_band=0.5, ridge=1e-9, min_rows=10):
+        """
+        Parameters:
+        -----------
+        tolerance : float
+            Band half-width in residual standard deviations
+        min_band : float
+            Lower bound on the band half-width (MW)
+        ridge : float
+            Relative ridge term for numerically safe solves
+        min_rows : int
+            Fits with fewer rows are left undefined (no flags)
+        """
+        self.tolerance = tolerance
+        self.min_band = min_band
+        self.ridge = ridge
+        self.min_rows = min_rows
+
+    def fit(self, values, mask, regimes=None, n_regimes=None):
+        """Fit every unit (x regime) at once
+
+        Parameters:
+        -----------
+        values : array (T, n_units, 3)
+            HP, MP, EE per unit (METRICS order)
+        mask : array (T, n_units) of bool
+            Rows used for fitting and checking (e.g. operational samples)
+        regimes : array (T, n_units) of int, optional
+            Regime label per sample (0 .. n_regimes - 1, negative = none);
+            one model per unit and regime
+
+        Returns:
+        --------
+        dict with 'coefficients' (n_regimes, n_units, 3), 'sigma' and 'n'
+        (n_regimes, n_units), 'r2' and the sample-level 'residuals',
+        'band' and 'flags' (T, n_units).
+        """
+        mask = np.asarray(mask, dtype=bool)
+        if regimes is None:
+            regimes = np.zeros(mask.shape, dtype=np.int64)
+        regimes = np.where(mask, regimes, -1)
+        if n_regimes is None:
+            n_regimes = max(int(regimes.max(initial=-1)) + 1, 1)
+
+        Z, y, weight = _design(values, mask)
+        stats = [sufficient_statistics(Z, y, weight * (regimes == r)) for r in range(n_regimes)]
+        xtx, xty, yty, n = (np.stack(parts) for parts in zip(*stats))
+        beta, sigma = solve(xtx, xty, yty, n, self.ridge, self.min_rows)
+
+        # Fitted value of every sample from its own (regime, unit) model
+        label = np.maximum(regimes, 0)
+        units = np.arange(mask.shape[1])[None, :]
+        coef = beta[label, units]                            # (T, n_units, 3)
+        residuals = np.where(weight > 0, y - np.einsum('tui,tui->tu', Z, coef), np.nan)
+        band = np.maximum(self.tolerance * sigma[label, units], self.min_band)
+        with np.errstate(invalid='ignore'):
+            flags = (np.abs(residuals) > band) & (regimes >= 0)
+
+        y_mean = np.where(n > 0, xty[..., 0] / np.maximum(n, 1), np.nan)
+        total = yty - n * y_mean ** 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            r2 = 1 - sigma ** 2 * np.maximum(n - 3, 1) / total
+
+        return {
+            'coefficients': beta,
+            'sigma': sigma,
+            'n': n,
+            'r2': r2,
+            'residuals': residuals,
+            'band': np.where(regimes >= 0, band, np.nan),
+            'flags': flags,
+        }
+
+    def rolling_fit(self, values, mask, window, step):
+        """Refit every `step` samples on the preceding `window` samples
+
+        Per-block sufficient statistics are summed once and accumulated, so
+        each refit is a difference of two cumulative sums plus a 3x3 solve,
+        independent of the window length. Samples are checked against the
+        fit of the window before their block (out of sample).
+
+        Returns:
+        --------
+        dict with 'coefficients' (n_blocks, n_units, 3), 'sigma' (n_blocks,
+        n_units) and sample-level 'residuals', 'band' and 'flags'.
+        """
+        if window % step:
+            raise ValueError("window must be a multiple of step")
+        mask = np.asarray(mask, dtype=bool)
+        Z, y, weight = _design(values, mask)
+        n_rows, n_units = mask.shape
+        n_blocks = -(-n_rows // step)
+        starts = np.arange(n_blocks) * step
+
+        # Per-block statistics (one (T, n_units) product at a time), then
+        # running totals with a leading zero block
+        Zw = Z * weight[..., None]
+        n_coef = Z.shape[-1]
+        block_xtx = np.empty((n_blocks, n_units, n_coef, n_coef))
+        for i in range(n_coef):
+            for j in range(i, n_coef):
+                block_xtx[:, :, i, j] = np.add.reduceat(Zw[:, :, i] * Z[:, :, j], starts, axis=0)
+                block_xtx[:, :, j, i] = block_xtx[:, :, i, j]
+        block_xty = np.add.reduceat(Zw * y[..., None], starts, axis=0)
+        block_yty = np.add.reduceat(weight * y * y, starts, axis=0)
+        block_n = np.add.reduceat(weight, starts, axis=0)
+
+        def cumulative(block):
+            return np.concatenate([np.zeros((1,) + block.shape[1:]), np.cumsum(block, axis=0)])
+
+        k = window // step
+        stats = []
+        for block in (block_xtx, block_xty, block_yty, block_n):
+            total = cumulative(block)
+            # Window for block b covers blocks [b - k, b)
+            upper = total[:n_blocks]
+            lower = total[np.maximum(np.arange(n_blocks) - k, 0)]
+            stats.append(upper - lower)
+        beta, sigma = solve(*stats, ridge=self.ridge, min_rows=self.min_rows)
+
+        block_of_row = np.arange(n_rows) // step
+        coef = beta[block_of_row]                             # (T, n_units, 3)
+        residuals = np.where(weight > 0, y - np.einsum('tui,tui->tu', Z, coef), np.nan)
+        band = np.maximum(self.tolerance * sigma[block_of_row], self.min_band)
+        with np.errstate(invalid='ignore'):
+            flags = np.abs(residuals) > band
+
+        return {
+            'coefficients': beta,
+            'sigma': sigma,
+            'residuals': residuals,
+            'band': np.where(weight > 0, band, np.nan),
+            'flags': flags,
+        }
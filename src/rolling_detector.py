@@ -0,0 +1,309 @@
+"""
+Rolling-statistics anomaly detection
+Scores every unit and metric at once against a trailing robust baseline
+(median / MAD) and an exponentially weighted mean / variance, in batch over
+the (time x unit x metric) block or sample by sample for live data
+"""
+
+from functools import lru_cache
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.signal import lfilter
+
+# MAD -> standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+# Window medians are computed this many values at a time to bound memory
+_CHUNK_VALUES = 1 << 22
+
+
+def _median_last_axis(values):
+    """Median over the last axis ignoring NaN (NaN where there is no value)"""
+    values = np.asarray(values)
+    missing = np.isnan(values)
+    rows_with_nan = missing.any(axis=-1)
+    if not rows_with_nan.any():
+        return np.median(values, axis=-1)
+
+    median = np.empty(values.shape[:-1])
+    median[~rows_with_nan] = np.median(values[~rows_with_nan], axis=-1)
+    # Sorting moves NaN to the end, so the valid values are a prefix
+    ordered = np.sort(values[rows_with_nan], axis=-1)
+    n_valid = np.count_nonzero(~missing[rows_with_nan], axis=-1)
+    low = np.maximum((n_valid - 1) // 2, 0)[:, None]
+    high = np.maximum(n_valid // 2, 0)[:, None]
+    median[rows_with_nan] = np.where(
+        n_valid > 0,
+        (np.take_along_axis(ordered, low, axis=-1)[:, 0]
+         + np.take_along_axis(ordered, high, axis=-1)[:, 0]) / 2,
+        np.nan)
+    return median
+
+
+def _block_stats(blocks):
+    """Median, MAD around it and valid count over the last axis of (..., hop) blocks"""
+    median = _median_last_axis(blocks)
+    mad = _median_last_axis(np.abs(blocks - median[..., None]))
+    return median, mad, np.count_nonzero(~np.isnan(blocks), axis=-1)
+
+
+def _window_baseline(medians, mads, counts, min_periods, min_scale, consistency=1.0):
+    """Robust location and scale from the block statistics of one window (last axis)
+
+    Location is the median of block medians; scale combines the typical
+    within-block MAD with the MAD of the block medians (level changes),
+    multiplied by `consistency` (see _gaussian_consistency).
+    """
+    location = _median_last_axis(medians)
+    within = MAD_SCALE * _median_last_axis(mads)
+    between = MAD_SCALE * _median_last_axis(np.abs(medians - location[..., None]))
+    scale = np.maximum(consistency * np.hypot(within, between), min_scale)
+    enough = counts.sum(axis=-1) >= min_periods
+    return np.where(enough, location, np.nan), np.where(enough, scale, np.nan)
+
+
+@lru_cache(maxsize=None)
+def _gaussian_consistency(window, hop):
+    """Factor making the block-based scale estimate sigma on Gaussian white noise
+
+    The MAD of a few samples around their own median underestimates the
+    spread (about 14% low overall for hop=4), so the factor is calibrated
+    once per (window, hop) on simulated N(0, 1) windows with a fixed seed.
+    hop=1 is the plain rolling MAD and needs no correction.
+    """
+    if hop == 1:
+        return 1.0
+    k = window // hop
+    n_windows = max(1000, (1 << 20) // window)
+    noise = np.random.default_rng(0).standard_normal((n_windows, k, hop))
+    medians, mads, counts = _block_stats(noise)
+    _, scale = _window_baseline(medians, mads, counts, min_periods=0, min_scale=0.0)
+    return 1.0 / scale.mean()
+
+
+class RollingAnomalyDetector:
+    """Robust (rolling median / MAD) and EWMA z-scores over a (T, n_units, n_metrics) block
+
+    Every sample is compared with statistics of the samples *before* it, so
+    an outlier does not mask itself:
+
+    - robust: (x - median) / (1.4826 * MAD) over the trailing `window`
+      samples. Samples are summarised in blocks of `hop` (median and MAD
+      per block), and the window baseline is the median of the block
+      medians, with a scale combining within-block MADs and the spread of
+      the block medians, calibrated to be consistent for Gaussian noise.
+      Work is one O(T) pass over the samples plus O(T * window / hop**2)
+      over the block summaries; hop=1 is the exact rolling median / MAD.
+    - ewma: (x - mean) / std of an exponentially weighted mean and variance
+      with smoothing `alpha`; missing samples are skipped.
+
+    Scales are floored at `min_scale` so flat stretches (shutdowns at 0)
+    do not produce infinite scores. StreamingAnomalyDetector produces the
+    same scores one sample at a time.
+    """
+
+    def __init__(self, window=96, hop=4, alpha=0.05, min_periods=None, min_scale=1.0,
+                 z_threshold=5.0):
+        """
+        Parameters:
+        -----------
+        window : int
+            Trailing samples in the robust baseline (96 = one day of 15-min data)
+        hop : int
+            Samples per summary block (and between baseline refreshes)
+        alpha : float
+            EWMA smoothing factor in (0, 1]
+        min_periods : int, optional
+            Valid samples needed before a score is produced; default window // 2
+        min_scale : float
+            Lower bound on MAD-based and EWMA standard deviations (data units)
+        z_threshold : float
+            |z| above which a sample is flagged
+        """
+        if window < 1 or hop < 1:
+            raise ValueError("window and hop must be at least 1")
+        if window % hop:
+            raise ValueError("window must be a multiple of hop")
+        if not 0 < alpha <= 1:
+            raise ValueError("alpha must be in (0, 1]")
+        self.window = window
+        self.hop = hop
+        self.alpha = alpha
+        self.min_periods = window // 2 if min_periods is None else min_periods
+        self.min_scale = min_scale
+        self.z_threshold = z_threshold
+        self.consistency = _gaussian_consistency(window, hop)
+
+    def robust_baseline(self, values):
+        """Per-sample trailing (median, scale) arrays, same shape as `values`"""
+        values = np.asarray(values, dtype=np.float64)
+        flat = values.reshape(len(values), -1)
+        n_rows, n_cols = flat.shape
+        n_blocks = -(-n_rows // self.hop)
+        k = self.window // self.hop
+
+        # (n_blocks, n_cols, hop) blocks; the last one is padded with NaN
+        padded = np.full((n_blocks * self.hop, n_cols), np.nan)
+        padded[:n_rows] = flat
+        blocks = padded.reshape(n_blocks, self.hop, n_cols).transpose(0, 2, 1)
+
+        medians = np.empty((n_blocks, n_cols))
+        mads = np.empty((n_blocks, n_cols))
+        counts = np.empty((n_blocks, n_cols), dtype=np.int64)
+        step = max(1, _CHUNK_VALUES // (n_cols * self.hop))
+        for lo in range(0, n_blocks, step):
+            chunk = slice(lo, lo + step)
+            medians[chunk], mads[chunk], counts[chunk] = _block_stats(blocks[chunk])
+
+        # Block b is scored against blocks [b - k, b)
+        def trailing(stats, fill):
+            front = np.full((k, n_cols), fill, dtype=stats.dtype)
+            return sliding_window_view(np.vstack([front, stats]), k, axis=0)[:n_blocks]
+
+        windows = trailing(medians, np.nan), trailing(mads, np.nan), trailing(counts, 0)
+        location = np.empty((n_blocks, n_cols))
+        scale = np.empty((n_blocks, n_cols))
+        step = max(1, _CHUNK_VALUES // (n_cols * k))
+        for lo in range(0, n_blocks, step):
+            chunk = slice(lo, lo + step)
+            location[chunk], scale[chunk] = _window_baseline(
+                *(window[chunk] for window in windows), self.min_periods, self.min_scale,
+                self.consistency)
+
+        location = np.repeat(location, self.hop, axis=0)[:n_rows].reshape(values.shape)
+        scale = np.repeat(scale, self.hop, axis=0)[:n_rows].reshape(values.shape)
+        return location, scale
+
+    def ewma_baseline(self, values):
+        """Per-sample (mean, std) of the EWMA *before* each sample, same shape as `values`
+
+        Both recursions are linear filters, so each column runs through
+        scipy.signal.lfilter over its observed samples (missing ones skipped).
+        """
+        values = np.asarray(values, dtype=np.float64)
+        # One contiguous row per column keeps the per-column filters cache friendly
+        columns = np.ascontiguousarray(values.reshape(len(values), -1).T)
+        a = self.alpha
+        decay = [1.0, -(1 - a)]
+        min_obs = max(self.min_periods, 1)
+
+        mean = np.full(columns.shape, np.nan)
+        var = np.full(columns.shape, np.nan)
+        for col, column in enumerate(columns):
+            observed = ~np.isnan(column)
+            x = column[observed]
+            if len(x) == 0:
+                continue
+            # m_t = (1 - a) m_t-1 + a x_t, starting from m_0 = x_0
+            m, _ = lfilter([a], decay, x, zi=[(1 - a) * x[0]])
+            # v_t = (1 - a) v_t-1 + a (1 - a) (x_t - m_t-1)^2, starting from v_0 = 0
+            sq_step = np.zeros_like(x)
+            sq_step[1:] = (x[1:] - m[:-1]) ** 2
+            v = lfilter([a * (1 - a)], decay, sq_step)
+
+            # Before sample t the state is that after the observed samples in [0, t)
+            if len(x) == len(column):
+                mean[col, min_obs:] = m[min_obs - 1:-1]
+                var[col, min_obs:] = v[min_obs - 1:-1]
+                continue
+            # n_before never decreases, so the ready samples are a suffix
+            n_before = np.cumsum(observed)
+            n_before -= observed
+            ready = np.searchsorted(n_before, min_obs)
+            mean[col, ready:] = m.take(n_before[ready:] - 1)
+            var[col, ready:] = v.take(n_before[ready:] - 1)
+
+        std = np.maximum(np.sqrt(var), self.min_scale)
+        return mean.T.reshape(values.shape), std.T.reshape(values.shape)
+
+    def score(self, values):
+        """Robust and EWMA z-scores: dict of arrays shaped like `values`"""
+        values = np.asarray(values, dtype=np.float64)
+        median, scale = self.robust_baseline(values)
+        mean, std = self.ewma_baseline(values)
+        return {
+            'robust': (values - median) / scale,
+            'ewma': (values - mean) / std,
+        }
+
+    def flags(self, scores):
+        """Boolean arrays of |z| > z_threshold per score (missing scores never flag)"""
+        with np.errstate(invalid='ignore'):
+            return {name: np.abs(z) > self.z_threshold for name, z in scores.items()}
+
+    def stream(self, n_units, n_metrics):
+        """A StreamingAnomalyDetector with this configuration"""
+        return StreamingAnomalyDetector(self, n_units, n_metrics)
+
+
+class StreamingAnomalyDetector:
+    """Sample-by-sample scoring with the same results as RollingAnomalyDetector.score
+
+    Keeps the samples of the current block, the statistics of the last
+    window // hop blocks and the EWMA state, so memory and work per sample
+    are constant.
+    """
+
+    def __init__(self, detector, n_units, n_metrics):
+        self.detector = detector
+        self.shape = (n_units, n_metrics)
+        self.reset()
+
+    def reset(self):
+        """Forget all samples"""
+        d = self.detector
+        k = d.window // d.hop
+        self._block = np.full((d.hop,) + self.shape, np.nan)
+        self._medians = np.full((k,) + self.shape, np.nan)
+        self._mads = np.full((k,) + self.shape, np.nan)
+        self._counts = np.zeros((k,) + self.shape, dtype=np.int64)
+        self._n_seen = 0
+        self._location = np.full(self.shape, np.nan)
+        self._scale = np.full(self.shape, np.nan)
+        self._mean = np.full(self.shape, np.nan)
+        self._var = np.zeros(self.shape)
+        self._n_obs = np.zeros(self.shape, dtype=np.int64)
+
+    def update(self, sample):
+        """Score one (n_units, n_metrics) sample, then add it to the state
+
+        Returns a dict with 'robust' and 'ewma' z-score arrays.
+        """
+        d = self.detector
+        sample = np.asarray(sample, dtype=np.float64).reshape(self.shape)
+
+        position = self._n_seen % d.hop
+        if position == 0 and self._n_seen:
+            # Close the finished block and refresh the window baseline
+            slot = (self._n_seen // d.hop - 1) % len(self._medians)
+            self._medians[slot], self._mads[slot], self._counts[slot] = _block_stats(
+                np.moveaxis(self._block, 0, -1))
+            self._location, self._scale = _window_baseline(
+                np.moveaxis(self._medians, 0, -1), np.moveaxis(self._mads, 0, -1),
+                np.moveaxis(self._counts, 0, -1), d.min_periods, d.min_scale, d.consistency)
+
+        ready = self._n_obs >= d.min_periods
+        mean = np.where(ready, self._mean, np.nan)
+        std = np.maximum(np.sqrt(np.where(ready, self._var, np.nan)), d.min_scale)
+        scores = {
+            'robust': (sample - self._location) / self._scale,
+            'ewma': (sample - mean) / std,
+        }
+
+        # Fold the sample in: current block and EWMA recursion (missing values skipped)
+        self._block[position] = sample
+        self._n_seen += 1
+        observed = ~np.isnan(sample)
+        first = observed & (self._n_obs == 0)
+        diff = np.where(observed, sample - self._mean, 0.0)
+        increment = d.alpha * diff
+        self._mean = np.where(first, sample, np.where(observed, self._mean + increment, self._mean))
+        self._var = np.where(observed & ~first, (1 - d.alpha) * (self._var + diff * increment),
+                             self._var)
+        self._n_obs += observed
+        return scores
+
+    def flags(self, scores):
+        """Boolean |z| > z_threshold per score"""
+        return self.detector.flags(scores)
@@ -0,0 +1,325 @@
+"""
+Multi-resolution rollups
+Pre-aggregates every GTA metric and the system totals into a pyramid of
+calendar buckets (raw slots -> hour -> day -> week / month) holding count,
+sum, min, max and sum of squares. Each level is reduced from the finer one
+it nests in, so the raw rows are read once; appended rows extend the
+pyramid by merging into the open buckets. Range aggregates are assembled
+from the coarsest buckets that fit inside the range, with finer levels only
+at its edges
+"""
+
+import numpy as np
+import pandas as pd
+from unit_store import UnitArrayStore, METRICS
+
+STATS = ('count', 'sum', 'min', 'max', 'sumsq')
+
+# Arrays held by every RollupLevel
+_ARRAYS = ('start', 'stop') + STATS
+
+# Calendar levels above the raw slots, finest first: (name, parent level)
+LEVELS = (('hour', 'raw'), ('day', 'hour'), ('week', 'day'), ('month', 'day'))
+
+_DAY_NS = 86_400 * 10**9
+_WEEK_NS = 7 * _DAY_NS
+
+
+def _floor(times, level):
+    """Bucket start of int64 ns timestamps at a calendar level (weeks start on Monday)"""
+    times = np.asarray(times, dtype=np.int64)
+    if level == 'hour':
+        return times.astype('datetime64[ns]').astype('datetime64[h]').astype('datetime64[ns]').astype(np.int64)
+    days = times // _DAY_NS
+    if level == 'day':
+        return days * _DAY_NS
+    if level == 'week':
+        # 1970-01-01 was a Thursday
+        return (days - (days + 3) % 7) * _DAY_NS
+    months = times.astype('datetime64[ns]').astype('datetime64[M]')
+    return months.astype('datetime64[ns]').astype(np.int64)
+
+
+def _bucket_stop(starts, level):
+    """Exclusive end of buckets starting at `starts`"""
+    if level == 'hour':
+        return starts + 3600 * 10**9
+    if level == 'day':
+        return starts + _DAY_NS
+    if level == 'week':
+        return starts + _WEEK_NS
+    months = starts.astype('datetime64[ns]').astype('datetime64[M]') + 1
+    return months.astype('datetime64[ns]').astype(np.int64)
+
+
+class RollupLevel:
+    """Buckets of one resolution: start/stop times (int64 ns) and (n_buckets, n_columns) stats"""
+
+    def __init__(self, name, start, stop, count, total, low, high, sumsq):
+        self.name = name
+        self.start = start
+        self.stop = stop
+        self.count = count
+        self.sum = total
+        self.min = low
+        self.max = high
+        self.sumsq = sumsq
+
+    @classmethod
+    def from_values(cls, times, values, step):
+        """Raw level: one bucket per sample of a (T, n_columns) block"""
+        times = np.asarray(times, dtype=np.int64)
+        valid = ~np.isnan(values)
+        zeroed = np.where(valid, values, 0.0)
+        return cls('raw', times, times + step, valid.astype(np.int64), zeroed,
+                   np.where(valid, values, np.inf), np.where(valid, values, -np.inf),
+                   zeroed * zeroed)
+
+    def __len__(self):
+        return len(self.start)
+
+    def coarsen(self, name):
+        """Next level up: buckets of this level merged per calendar `name` bucket"""
+        starts = _floor(self.start, name)
+        first = np.flatnonzero(np.concatenate([[True], starts[1:] != starts[:-1]])) if len(starts) else np.arange(0)
+        if len(first) == 0:
+            empty = self.sum[:0]
+            return RollupLevel(name, starts, starts, self.count[:0], empty, empty, empty, empty)
+        return RollupLevel(name, starts[first], _bucket_stop(starts[first], name),
+                           np.add.reduceat(self.count, first, axis=0),
+                           np.add.reduceat(self.sum, first, axis=0),
+                           np.minimum.reduceat(self.min, first, axis=0),
+                           np.maximum.reduceat(self.max, first, axis=0),
+                           np.add.reduceat(self.sumsq, first, axis=0))
+
+    def extend(self, other):
+        """Append the buckets of `other` (all later), merging a shared boundary bucket"""
+        if len(other) == 0:
+            return
+        if len(self) and other.start[0] == self.start[-1]:
+            self.count[-1] += other.count[0]
+            self.sum[-1] += other.sum[0]
+            self.min[-1] = np.minimum(self.min[-1], other.min[0])
+            self.max[-1] = np.maximum(self.max[-1], other.max[0])
+            self.sumsq[-1] += other.sumsq[0]
+            other = RollupLevel(other.name, *(getattr(other, attr)[1:] for attr in _ARRAYS))
+        for attr in _ARRAYS:
+            setattr(self, attr, np.concatenate([getattr(self, attr), getattr(other, attr)]))
+
+    def reduce(self, a, b):
+        """Stats over buckets [a, b): (count, sum, min, max, sumsq) per column"""
+        return (self.count[a:b].sum(axis=0), self.sum[a:b].sum(axis=0),
+                self.min[a:b].min(axis=0, initial=np.inf), self.max[a:b].max(axis=0, initial=-np.inf),
+                self.sumsq[a:b].sum(axis=0))
+
+
+def _column_names(units, metrics):
+    """'<unit>_<metric>' for every unit and metric, then 'Total_<metric>'"""
+    return ([f'{unit}_{metric}' for unit in units for metric in metrics]
+            + [f'Total_{metric}' for metric in metrics])
+
+
+def _derived(count, total, low, high, sumsq):
+    """Mean, std (ddof=1), min and max from raw stats; NaN where there are no samples"""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / count
+        variance = np.maximum(sumsq - total * mean, 0.0) / (count - 1)
+    empty = count == 0
+    return {
+        'mean': mean,
+        'std': np.where(count > 1, np.sqrt(variance), np.nan),
+        'min': np.where(empty, np.nan, low),
+        'max': np.where(empty, np.nan, high),
+    }
+
+
+class RollupStore:
+    """Rollup pyramid of every unit metric and the system totals
+
+    Columns are '<unit>_<metric>' (e.g. 'GTA_1_HP_Admission') and
+    'Total_<metric>', the sum over units (missing when any unit is missing,
+    as in EnergyDataLoader.calculate_system_totals). Levels are 'raw'
+    (one bucket per sample), 'hour', 'day', 'week' (Monday start) and
+    'month'.
+    """
+
+    def __init__(self, index, values, units, metrics=METRICS, step=pd.Timedelta(minutes=15)):
+        """
+        Parameters:
+        -----------
+        index : DatetimeIndex
+            Sample timestamps (sorted, unique)
+        values : array (T, n_units, n_metrics)
+            Measurements, e.g. UnitArrayStore.block_from_frame(data, dtype=np.float64)
+        units, metrics : list of str
+            Names of the value axes
+        step : Timedelta
+            Sampling step; a bucket lies inside a query range when its last
+            slot (stop - step) does
+        """
+        self.units = list(units)
+        self.metrics = list(metrics)
+        self.step = pd.Timedelta(step).value
+        self.columns = _column_names(self.units, self.metrics)
+        self._column_pos = {name: i for i, name in enumerate(self.columns)}
+        self.levels = self._build(index, values)
+
+    def _flatten(self, values):
+        """(T, n_units, n_metrics) -> (T, n_columns) with the system totals appended"""
+        values = np.asarray(values, dtype=np.float64)
+        return np.concatenate([values.reshape(len(values), -1), values.sum(axis=1)], axis=1)
+
+    def _build(self, index, values):
+        """Levels by name, each reduced from its parent"""
+        times = pd.DatetimeIndex(index).as_unit('ns').asi8
+        levels = {'raw': RollupLevel.from_values(times, self._flatten(values), self.step)}
+        for name, parent in LEVELS:
+            levels[name] = levels[parent].coarsen(name)
+        return levels
+
+    @classmethod
+    def from_frame(cls, data, gta_columns, step=pd.Timedelta(minutes=15)):
+        """Rollups of a wide frame in the source CSV layout"""
+        values = UnitArrayStore.block_from_frame(data, gta_columns, dtype=np.float64)
+        return cls(data.index, values, list(gta_columns), METRICS, step)
+
+    def update(self, index, values):
+        """Add rows after the current data (same layout as the constructor)
+
+        The new rows get a pyramid of their own, which is merged level by
+        level; only the open bucket of each level is touched.
+        """
+        for name, level in self._build(index, values).items():
+            self.levels[name].extend(level)
+
+    def _positions(self, columns):
+        if columns is None:
+            return list(range(len(self.columns))), list(self.columns)
+        columns = [columns] if isinstance(columns, str) else list(columns)
+        missing = [c for c in columns if c not in self._column_pos]
+        if missing:
+            raise ValueError(f"Unknown columns {missing}. Choose from {self.columns}")
+        return [self._column_pos[c] for c in columns], columns
+
+    def _range(self, start, end):
+        """[lo, hi) in int64 ns for an inclusive [start, end]"""
+        lo = np.iinfo(np.int64).min if start is None else pd.Timestamp(start).as_unit('ns').value
+        hi = np.iinfo(np.int64).max if end is None else pd.Timestamp(end).as_unit('ns').value + 1
+        return lo, hi
+
+    def cover(self, start=None, end=None):
+        """Bucket runs answering [start, end]: list of (level name, first, stop) bucket ranges
+
+        The coarsest level contributes the buckets lying wholly inside the
+        range; what is left on either side is covered by finer levels.
+        """
+        order = ['month', 'week', 'day', 'hour', 'raw']
+        parts = []
+
+        def visit(lo, hi, depth):
+            for d in range(depth, len(order)):
+                level = self.levels[order[d]]
+                a = np.searchsorted(level.start, lo, side='left')
+                # Whole buckets: last slot (stop - step) before hi
+                b = np.searchsorted(level.stop, min(hi, np.iinfo(np.int64).max - self.step) + self.step,
+                                    side='left')
+                if a < b:
+                    parts.append((order[d], int(a), int(b)))
+                    if d + 1 < len(order):
+                        visit(lo, int(level.start[a]), d + 1)
+                        visit(int(level.stop[b - 1]), hi, d + 1)
+                    return
+
+        visit(*self._range(start, end), 0)
+        return parts
+
+    def aggregate(self, start=None, end=None, columns=None):
+        """Count, sum, mean, std, min and max of each column over [start, end]
+
+        Equal to the statistics of the raw samples in the range (missing
+        samples skipped), computed from the covering buckets.
+        """
+        positions, names = self._positions(columns)
+        n = len(self.columns)
+        count, total, sumsq = np.zeros(n, dtype=np.int64), np.zeros(n), np.zeros(n)
+        low, high = np.full(n, np.inf), np.full(n, -np.inf)
+        for name, a, b in self.cover(start, end):
+            c, s, lo, hi, sq = self.levels[name].reduce(a, b)
+            count += c
+            total += s
+            low = np.minimum(low, lo)
+            high = np.maximum(high, hi)
+            sumsq += sq
+
+        derived = _derived(count, total, low, high, sumsq)
+        return pd.DataFrame({
+            'count': count[positions],
+            'sum': total[positions],
+            'mean': derived['mean'][positions],
+            'std': derived['std'][positions],
+            'min': derived['min'][positions],
+            'max': derived['max'][positions],
+        }, index=pd.Index(names, name='column'))
+
+    def series(self, start=None, end=None, columns=None, stat='mean', level=None, max_points=2000):
+        """One statistic per bucket over [start, end], indexed by bucket start
+
+        Without `level`, the finest level with at most `max_points` buckets
+        in the range is used, so a shift is shown at raw resolution and
+        16 months by day or week. Buckets overlapping the range edges are
+        included whole.
+        """
+        positions, names = self._positions(columns)
+        lo, hi = self._range(start, end)
+        if level is None:
+            for level in ['raw', 'hour', 'day', 'week', 'month']:
+                bucket = self.levels[level]
+                n = np.searchsorted(bucket.start, hi, 'left') - np.searchsorted(bucket.stop, lo, 'right')
+                if n <= max_points:
+                    break
+        bucket = self.levels[level]
+        a = np.searchsorted(bucket.stop, lo, side='right')
+        b = np.searchsorted(bucket.start, hi, side='left')
+
+        raw = tuple(getattr(bucket, s)[a:b] for s in STATS)
+        values = raw[STATS.index(stat)] if stat in STATS else _derived(*raw)[stat]
+        index = pd.DatetimeIndex(bucket.start[a:b].astype('datetime64[ns]'), name=level)
+        return pd.DataFrame(values[:, positions], index=index, columns=names)
+
+    def profile(self, by, columns=None):
+        """Mean of each column by 'hour' of day, 'dayofweek' (0 = Monday) or 'month' of year
+
+        Exact: sums and counts of the hour / day / month buckets are added per
+        group, so the result equals grouping the raw samples.
+        """
+        level = {'hour': 'hour', 'dayofweek': 'day', 'month': 'month'}[by]
+        positions, names = self._positions(columns)
+        bucket = self.levels[level]
+        keys = getattr(pd.DatetimeIndex(bucket.start.astype('datetime64[ns]')), by)
+        sums = pd.DataFrame(bucket.sum[:, positions], columns=names).groupby(keys).sum()
+        counts = pd.DataFrame(bucket.count[:, positions], columns=names).groupby(keys).sum()
+        return sums / counts.where(counts > 0)
+
+    def save(self, path, fingerprint=''):
+        """Write every level to an .npz file (`fingerprint` identifies the source data)"""
+        arrays = {f'{name}__{attr}': getattr(level, attr)
+                  for name, level in self.levels.items()
+                  for attr in _ARRAYS}
+        np.savez(path, units=np.array(self.units), metrics=np.array(self.metrics),
+                 step=np.int64(self.step), fingerprint=np.array(fingerprint), **arrays)
+
+    @classmethod
+    def load(cls, path):
+        """Rollups saved with save(); returns (store, fingerprint)"""
+        saved = np.load(path)
+        store = cls.__new__(cls)
+        store.units = [str(unit) for unit in saved['units']]
+        store.metrics = [str(metric) for metric in saved['metrics']]
+        store.step = int(saved['step'])
+        store.columns = _column_names(store.units, store.metrics)
+        store._column_pos = {name: i for i, name in enumerate(store.columns)}
+        store.levels = {
+            name: RollupLevel(name, *(saved[f'{name}__{attr}'] for attr in _ARRAYS))
+            for name in ['raw'] + [name for name, _ in LEVELS]
+        }
+        return store, str(saved['fingerprint'])
@@ -0,0 +1,42 @@
+"""
+Run the full Phase 1 pipeline on a single shared dataset load
+EDA -> downtime analysis -> anomaly analysis -> per-GTA split
+"""
+
+import time
+from session import EnergyDataSession
+from eda_analysis import EnergyEDA
+from downtime_analysis import DowntimeAnalyzer
+from anomaly_analysis import AnomalyAnalyzer
+from split_gta_data import split_gta_data
+from artifact_cache import manifest_summary, MANIFEST_PATH
+
+
+def run_pipeline(low_threshold=10, session=None, parallel=False, workers=None):
+    """Run every analyzer against one EnergyDataSession
+
+    parallel/workers are passed to each analyzer's run_full_analysis
+    (figures rendered in forked worker processes). Figures and files whose
+    data, parameters and code are unchanged are reused (see artifact_cache.py).
+    """
+    session = session if session is not None else EnergyDataSession()
+    started = time.strftime('%Y-%m-%d %H:%M:%S')
+
+    EnergyEDA(session=session).run_full_analysis(parallel=parallel, workers=workers)
+    DowntimeAnalyzer(low_threshold=low_threshold, session=session).run_full_analysis(
+        parallel=parallel, workers=workers)
+    AnomalyAnalyzer(session=session).run_full_analysis(parallel=parallel, workers=workers)
+    split_gta_data(low_threshold=low_threshold, session=session)
+
+    counts = manifest_summary(since=started)
+    print(f"\nArtifacts: {counts['rebuilt']} rebuilt, {counts['reused']} reused (manifest: {MANIFEST_PATH})")
+
+    return session
+
+
+if __name__ == "__main__":
+    import sys
+
+    # --parallel renders figures in worker processes, --rebuild ignores reusable artifacts
+    session = EnergyDataSession(reuse_artifacts='--rebuild' not in sys.argv)
+    run_pipeline(low_threshold=10, session=session, parallel='--parallel' in sys.argv)
@@ -0,0 +1,271 @@
+"""
+Operating-regime segmentation
+Splits each GTA's history into segments of stable mean HP, MP and energy
+with binary segmentation on cumulative sums: every candidate split of a
+segment is scored at once from prefix sums, so a pass over a segment is
+O(length) and the whole history O(T * depth). Units run in parallel.
+"""
+
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
+from unit_store import METRICS
+
+# MAD -> standard deviation for normally distributed data
+MAD_SCALE = 1.4826
+
+
+def _fill_missing(values):
+    """Carry the last valid value forward (first valid one backward) per column
+
+    Columns without any value become 0. Gaps then add no mean change of
+    their own.
+    """
+    values = np.array(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    rows = np.arange(len(values))[:, None]
+    last = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    first = np.argmax(valid, axis=0)
+    source = np.where(last >= 0, last, first[None, :])
+    filled = np.take_along_axis(values, source, axis=0)
+    return np.where(valid.any(axis=0), filled, 0.0)
+
+
+def _level_scale(values, min_scale):
+    """Robust spread of each column (MAD around the median), floored at min_scale"""
+    median = np.median(values, axis=0)
+    return np.maximum(MAD_SCALE * np.median(np.abs(values - median), axis=0), min_scale)
+
+
+def _best_split(cumsum, start, stop, min_size):
+    """Best single mean-change split of [start, stop): (gain, position) or None
+
+    `cumsum` holds one row of prefix sums per metric, (d, T + 1).
+    """
+    if stop - start < 2 * min_size:
+        return None
+    k = slice(start + min_size, stop - min_size + 1)
+    n_left = np.arange(min_size, stop - start - min_size + 1, dtype=np.float64)
+    n_right = (stop - start) - n_left
+    total = cumsum[:, stop] - cumsum[:, start]
+
+    # Reduction of the squared error when the segment mean is split at k:
+    # sum over metrics of |S_left|^2 / n_left + |S_right|^2 / n_right - |S|^2 / n,
+    # accumulated one metric at a time to keep temporaries at one column
+    score = np.zeros(len(n_left))
+    for j in range(len(cumsum)):
+        left = cumsum[j, k] - cumsum[j, start]
+        right = total[j] - left
+        left *= left
+        left /= n_left
+        right *= right
+        right /= n_right
+        score += left
+        score += right
+    best = int(np.argmax(score))
+    gain = score[best] - (total ** 2).sum() / (stop - start)
+    return float(gain), start + min_size + best
+
+
+def binary_segmentation(signal, penalty, min_size, max_segments=None):
+    """Change points of the mean of a (T, d) signal, as sorted row positions
+
+    The segment whose best split reduces the squared error most is split
+    first, until no split gains more than `penalty` (or `max_segments` is
+    reached).
+    """
+    signal = np.asarray(signal, dtype=np.float64)
+    signal = signal.reshape(len(signal), -1)
+    n = len(signal)
+    # Centred prefix sums keep the differences accurate over long histories;
+    # one contiguous row per metric
+    cumsum = np.zeros((signal.shape[1], n + 1))
+    np.cumsum((signal - signal.mean(axis=0)).T, axis=1, out=cumsum[:, 1:])
+
+    change_points = []
+    heap = []
+
+    def push(start, stop):
+        split = _best_split(cumsum, start, stop, min_size)
+        if split is not None and split[0] > penalty:
+            heapq.heappush(heap, (-split[0], start, stop, split[1]))
+
+    push(0, n)
+    while heap and (max_segments is None or len(change_points) + 1 < max_segments):
+        _, start, stop, k = heapq.heappop(heap)
+        change_points.append(k)
+        push(start, k)
+        push(k, stop)
+    return np.sort(np.asarray(change_points, dtype=np.int64))
+
+
+class Segmentation:
+    """Segments of every unit's history, stored like StateIntervals
+
+    Segments are half-open row ranges [start_pos, stop_pos) that tile each
+    unit's history; `means` holds the mean of every metric per segment
+    (missing samples ignored).
+    """
+
+    def __init__(self, index, values, units, change_points, metrics=METRICS):
+        """
+        Parameters:
+        -----------
+        index : DatetimeIndex
+            Sample timestamps (sorted)
+        values : array (T, n_units, n_metrics)
+            Measurements the segments were found on
+        units : list of str
+            Unit names
+        change_points : list of arrays
+            Sorted change-point row positions per unit
+        """
+        index = pd.DatetimeIndex(index)
+        values = np.asarray(values, dtype=np.float64)
+        self.index = index
+        self.units = list(units)
+        self.metrics = list(metrics)
+        n_rows = len(index)
+
+        starts, stops, codes = [], [], []
+        for u, points in enumerate(change_points):
+            # An empty history has no segments
+            bounds = np.concatenate([[0], points, [n_rows]] if n_rows else [[0]]).astype(np.int64)
+            starts.append(bounds[:-1])
+            stops.append(bounds[1:])
+            codes.append(np.full(len(bounds) - 1, u))
+        self.start_pos = np.concatenate(starts)
+        self.stop_pos = np.concatenate(stops)
+        self.unit_codes = np.concatenate(codes)
+        self.unit_ptr = np.searchsorted(self.unit_codes, np.arange(len(self.units) + 1))
+
+        # Segment means from one reduceat per unit over NaN-zeroed values
+        self.means = np.empty((len(self), len(self.metrics)))
+        for u in range(len(self.units)):
+            rows = slice(self.unit_ptr[u], self.unit_ptr[u + 1])
+            unit_values = values[:, u, :]
+            valid = ~np.isnan(unit_values)
+            sums = np.add.reduceat(np.where(valid, unit_values, 0.0), self.start_pos[rows], axis=0)
+            counts = np.add.reduceat(valid, self.start_pos[rows], axis=0)
+            with np.errstate(invalid='ignore'):
+                self.means[rows] = sums / counts
+
+    def __len__(self):
+        return len(self.start_pos)
+
+    def _unit_slice(self, unit):
+        """Rows of one unit's segments"""
+        u = self.units.index(unit)
+        return slice(self.unit_ptr[u], self.unit_ptr[u + 1])
+
+    def table(self, rows=None):
+        """Segments as a DataFrame: unit, segment, start, end, stop, n_samples,
+        duration and the mean of every metric"""
+        rows = np.arange(len(self)) if rows is None else rows
+        times = self.index.as_unit('ns').asi8
+        if len(times) > 1:
+            after_last = times[-1] + (times[-1] - times[-2])
+        else:
+            after_last = times[-1] + pd.Timedelta(minutes=15).value if len(times) else 0
+        times_ext = np.append(times, after_last)
+
+        start = pd.DatetimeIndex(times_ext[self.start_pos[rows]].astype('datetime64[ns]'))
+        end = pd.DatetimeIndex(times_ext[self.stop_pos[rows] - 1].astype('datetime64[ns]'))
+        table = pd.DataFrame({
+            'unit': np.asarray(self.units, dtype=object)[self.unit_codes[rows]],
+            'segment': np.asarray(rows) - self.unit_ptr[self.unit_codes[rows]],
+            'start': start,
+            'end': end,
+            'stop': pd.DatetimeIndex(times_ext[self.stop_pos[rows]].astype('datetime64[ns]')),
+            'n_samples': self.stop_pos[rows] - self.start_pos[rows],
+            'duration': end - start,
+        })
+        for m, metric in enumerate(self.metrics):
+            table[f'{metric}_mean'] = self.means[rows, m]
+        return table
+
+    def for_unit(self, unit):
+        """All segments of one unit, in time order"""
+        return self.table(np.arange(len(self))[self._unit_slice(unit)])
+
+    def labels(self):
+        """(T, n_units) segment number of every sample (0, 1, ... per unit)"""
+        labels = np.empty((len(self.index), len(self.units)), dtype=np.int64)
+        for u in range(len(self.units)):
+            rows = slice(self.unit_ptr[u], self.unit_ptr[u + 1])
+            lengths = self.stop_pos[rows] - self.start_pos[rows]
+            labels[:, u] = np.repeat(np.arange(len(lengths)), lengths)
+        return labels
+
+    def label_frame(self):
+        """Segment labels as a DataFrame (one column per unit) for groupby"""
+        return pd.DataFrame(self.labels(), index=self.index, columns=self.units)
+
+
+class RegimeSegmenter:
+    """Change-point segmentation of every unit's HP, MP and energy series
+
+    Each metric is scaled by its robust spread, so `penalty` is in units of
+    squared standard deviations times samples: a split is kept when it
+    explains more of the variance than `penalty` (default 3 * log(T) per
+    metric times `min_size`, so only level changes sustained over about
+    `min_size` samples survive).
+    """
+
+    def __init__(self, min_size=96, penalty=None, max_segments=None, min_scale=1.0, n_jobs=None):
+        """
+        Parameters:
+        -----------
+        min_size : int
+            Shortest segment in samples (96 = one day of 15-min data)
+        penalty : float, optional
+            Minimum squared-error reduction for a change point
+        max_segments : int, optional
+            Upper bound on segments per unit
+        min_scale : float
+            Lower bound on the per-metric scale (data units)
+        n_jobs : int, optional
+            Units segmented concurrently; defaults to one thread per unit
+        """
+        if min_size < 1:
+            raise ValueError("min_size must be at least 1")
+        self.min_size = min_size
+        self.penalty = penalty
+        self.max_segments = max_segments
+        self.min_scale = min_scale
+        self.n_jobs = n_jobs
+
+    def _penalty(self, n_rows, n_metrics):
+        if self.penalty is not None:
+            return self.penalty
+        return 3.0 * np.log(max(n_rows, 2)) * n_metrics * self.min_size
+
+    def change_points(self, values):
+        """Change points of one unit's (T, n_metrics) series"""
+        if len(values) == 0:
+            return np.zeros(0, dtype=np.int64)
+        filled = _fill_missing(values)
+        signal = filled / _level_scale(filled, self.min_scale)
+        return binary_segmentation(signal, self._penalty(*signal.shape), self.min_size,
+                                   self.max_segments)
+
+    def fit(self, index, values, units, metrics=METRICS):
+        """Segment every unit of a (T, n_units, n_metrics) block; returns a Segmentation
+
+        Each unit costs O(T * depth), depth being the number of splitting
+        levels (about log2 of its segment count for balanced splits, up to
+        the segment count itself). The numpy work on long arrays releases
+        the GIL, so units are processed by a thread pool without copying
+        the data.
+        """
+        values = np.asarray(values)
+        per_unit = [values[:, u, :] for u in range(len(units))]
+        workers = self.n_jobs if self.n_jobs is not None else max(len(units), 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            change_points = list(pool.map(self.change_points, per_unit))
+        return Segmentation(index, values, units, change_points, metrics)
+
+    def fit_store(self, store):
+        """Segment a UnitArrayStore"""
+        return self.fit(store.index, store.values, store.units, store.metrics)
@@ -0,0 +1,106 @@
+"""
+Shared in-process dataset session
+Loads Data_Energie.csv once and memoizes the views derived from it so that
+every analyzer in a pipeline run works on the same frame
+"""
+
+from data_loader import EnergyDataLoader, data_fingerprint
+from quantiles import QuantileService
+from segmentation import RegimeSegmenter
+from operating_modes import OperatingModeModel
+from summary_stats import UnitSummary
+from config import DATA_PATH
+
+# Sessions created through get_session(), one per source file
+_SESSIONS = {}
+
+
+class EnergyDataSession:
+    """One loaded dataset plus memoized derived products
+
+    Frames handed out by the session are shared between analyzers and must be
+    treated as read-only; copy before modifying. Memoized products are
+    dropped as soon as the loader's data changes (load_data, append), so a
+    memo never describes older data.
+    """
+
+    def __init__(self, loader=None, reuse_artifacts=True):
+        """
+        Parameters:
+        -----------
+        loader : EnergyDataLoader, optional
+            Loader of the dataset; loaded on construction if needed
+        reuse_artifacts : bool
+            Let analyzers skip figures/files whose content key is unchanged
+            (see artifact_cache.py); False regenerates everything
+        """
+        self.loader = loader if loader is not None else EnergyDataLoader()
+        self.reuse_artifacts = reuse_artifacts
+        if self.loader.data is None:
+            self.loader.load_data()
+        self._memo = {}
+        self._version = self.loader.version
+
+    @property
+    def data(self):
+        """The loader's current frame, including rows added by append()"""
+        return self.loader.data
+
+    def memoize(self, key, compute):
+        """Return the cached result for `key`, computing it on first use"""
+        if self._version != self.loader.version:
+            self.invalidate()
+        if key not in self._memo:
+            self._memo[key] = compute()
+        return self._memo[key]
+
+    def invalidate(self):
+        """Drop all derived products (done automatically when the loader's data changes)"""
+        self._memo.clear()
+        self._version = self.loader.version
+
+    def fingerprint(self):
+        """Memoized SHA-256 of the loaded data (values and timestamps)"""
+        return self.memoize('fingerprint', lambda: data_fingerprint(self.data))
+
+    def system_totals(self):
+        """Memoized EnergyDataLoader.calculate_system_totals"""
+        return self.memoize('system_totals', self.loader.calculate_system_totals)
+
+    def rollups(self):
+        """EnergyDataLoader.get_rollups (kept current across appends by the loader)"""
+        return self.loader.get_rollups()
+
+    def quantiles(self):
+        """Memoized QuantileService over the loaded data (columns sorted once)"""
+        return self.memoize('quantiles', lambda: QuantileService(self.data))
+
+    def unit_summary(self, bins=50):
+        """Memoized UnitSummary (histograms, means, medians, ...) of every GTA"""
+        return self.memoize(('unit_summary', bins),
+                            lambda: UnitSummary.from_store(self.loader.get_store(), bins=bins))
+
+    def segments(self, min_size=96, penalty=None):
+        """Memoized operating-regime Segmentation of every GTA (see segmentation.py)"""
+        return self.memoize(
+            ('segments', min_size, penalty),
+            lambda: RegimeSegmenter(min_size=min_size, penalty=penalty).fit_store(
+                self.loader.get_store()))
+
+    def operating_modes(self, n_modes=4):
+        """Memoized OperatingModeModel fitted on every GTA (see operating_modes.py)"""
+        store = self.loader.get_store()
+        return self.memoize(('operating_modes', n_modes),
+                            lambda: OperatingModeModel(n_modes=n_modes).fit(store.values, store.units))
+
+    def gta_data(self, gta_name):
+        """Memoized read-only EnergyDataLoader.get_gta_data(view=True)"""
+        return self.memoize(('gta_data', gta_name),
+                            lambda: self.loader.get_gta_data(gta_name, view=True))
+
+
+def get_session(filepath=DATA_PATH):
+    """Return the process-wide session for `filepath`, loading it on first use"""
+    if filepath not in _SESSIONS:
+        _SESSIONS[filepath] = EnergyDataSession(EnergyDataLoader(filepath))
+    return _SESSIONS[filepath]
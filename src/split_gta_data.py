@@ -5,16 +5,20 @@ For GTA_2, remove downtime periods entirely
 
 import pandas as pd
 import os
-from data_loader import EnergyDataLoader
+import sys
 from config import GTA_COLUMNS, BASE_DIR
 from downtime_analysis import DowntimeAnalyzer
+from artifact_cache import ArtifactCache
+from session import get_session
 
 
-def split_gta_data(low_threshold=10):
+def split_gta_data(low_threshold=10, session=None):
     """
     Create separate CSV files for each GTA
     For GTA_2: Remove downtime periods
     For GTA_1 and GTA_3: Keep all data but mark operational state
+
+    `session` is the shared EnergyDataSession (defaults to the process-wide one)
     """
 
     print("\n" + "="*70)
@@ -22,12 +26,12 @@ def split_gta_data(low_threshold=10):
     print("="*70)
     print()
 
-    # Load data
-    loader = EnergyDataLoader()
-    data = loader.load_data()
+    # Load data (once, shared with the downtime analyzer)
+    session = session if session is not None else get_session()
+    data = session.data
 
     # Get operational states
-    analyzer = DowntimeAnalyzer(low_threshold=low_threshold)
+    analyzer = DowntimeAnalyzer(low_threshold=low_threshold, session=session)
     states = analyzer.detect_operational_states()
 
     # Create output directory
@@ -36,6 +40,16 @@ def split_gta_data(low_threshold=10):
 
     print(f"Output directory: {output_dir}\n")
 
+    # Files whose data, threshold and code are unchanged are not rewritten
+    artifacts = ArtifactCache(session, sys.modules[__name__])
+
+    def save_csv(frame, path, indent=''):
+        artifact = artifacts.get(path, {'low_threshold': low_threshold})
+        if not artifact.reused:
+            frame.to_csv(path, index=False)
+            print(f"{indent}✓ Saved: {path}")
+            artifact.saved()
+
     # Process each GTA
     for gta_name, columns in GTA_COLUMNS.items():
         hp_col, mp_col, ee_col = columns
@@ -51,14 +65,17 @@ def split_gta_data(low_threshold=10):
         gta_df['Energy_Production'] = data[ee_col]
         gta_df['Operational'] = states[operational_col]
 
-        # Statistics before filtering
+        # Statistics before filtering (percentages of the measured records)
         total_records = len(gta_df)
         operational_records = gta_df['Operational'].sum()
-        downtime_records = (~gta_df['Operational']).sum()
+        downtime_records = states[f'{gta_name}_down'].sum()
+        measured_records = operational_records + downtime_records
 
         print(f"  Total records: {total_records:,}")
-        print(f"  Operational: {operational_records:,} ({operational_records/total_records*100:.1f}%)")
-        print(f"  Downtime: {downtime_records:,} ({downtime_records/total_records*100:.1f}%)")
+        print(f"  Operational: {operational_records:,} ({operational_records/measured_records*100:.1f}%)")
+        print(f"  Downtime: {downtime_records:,} ({downtime_records/measured_records*100:.1f}%)")
+        if measured_records < total_records:
+            print(f"  Missing: {total_records - measured_records:,} (no HP measurement)")
 
         # Special handling for GTA_2: Remove downtime
         if gta_name == 'GTA_2':
@@ -68,22 +85,19 @@ def split_gta_data(low_threshold=10):
 
             # Save filtered version
             output_path = os.path.join(output_dir, f'{gta_name}_operational_only.csv')
-            gta_df_filtered.to_csv(output_path, index=False)
-            print(f"  ✓ Saved: {output_path}")
+            save_csv(gta_df_filtered, output_path, indent='  ')
             print(f"    Records: {len(gta_df_filtered):,} (downtime removed)")
 
             # Also save full version with operational flag for reference
             output_path_full = os.path.join(output_dir, f'{gta_name}_full.csv')
-            gta_df.to_csv(output_path_full, index=False)
-            print(f"  ✓ Saved: {output_path_full}")
+            save_csv(gta_df, output_path_full, indent='  ')
             print(f"    Records: {len(gta_df):,} (includes downtime)")
 
         else:
             # For GTA_1 and GTA_3: Keep all data
             gta_df = gta_df.drop(columns=['Operational'])
             output_path = os.path.join(output_dir, f'{gta_name}.csv')
-            gta_df.to_csv(output_path, index=False)
-            print(f"  ✓ Saved: {output_path}")
+            save_csv(gta_df, output_path, indent='  ')
             print(f"    Records: {len(gta_df):,}")
 
         print()
@@ -107,7 +121,7 @@ def split_gta_data(low_threshold=10):
         combined_operational[f'{gta_name}_Energy_Production'] = data[ee_col].where(operational_mask, 0)
         combined_operational[f'{gta_name}_Operational'] = operational_mask
 
-    # Remove rows where ALL GTAs are down
+    # Remove rows where no GTA is operational (all down, or not measured)
     all_down = True
     for gta_name in GTA_COLUMNS.keys():
         all_down = all_down & ~combined_operational[f'{gta_name}_Operational']
@@ -115,10 +129,9 @@ def split_gta_data(low_threshold=10):
     combined_operational = combined_operational[~all_down]
 
     output_path = os.path.join(output_dir, 'all_gtas_operational.csv')
-    combined_operational.to_csv(output_path, index=False)
-    print(f"✓ Saved: {output_path}")
+    save_csv(combined_operational, output_path)
     print(f"  Records: {len(combined_operational):,}")
-    print(f"  Removed: {all_down.sum():,} rows where all GTAs were down")
+    print(f"  Removed: {all_down.sum():,} rows where no GTA was operational")
     print()
 
     # Create summary statistics file
@@ -133,12 +146,13 @@ def split_gta_data(low_threshold=10):
         operational_mask = states[operational_col]
         operational_data = data[operational_mask]
 
+        downtime_records = states[f'{gta_name}_down'].sum()
         stats = {
             'GTA': gta_name,
             'Total_Records': len(data),
             'Operational_Records': operational_mask.sum(),
-            'Downtime_Records': (~operational_mask).sum(),
-            'Uptime_Percentage': (operational_mask.sum() / len(data)) * 100,
+            'Downtime_Records': downtime_records,
+            'Uptime_Percentage': operational_mask.sum() / (operational_mask.sum() + downtime_records) * 100,
             'Avg_HP_Operational': operational_data[hp_col].mean(),
             'Avg_MP_Operational': operational_data[mp_col].mean(),
             'Avg_Energy_Operational': operational_data[ee_col].mean(),
@@ -153,8 +167,7 @@ def split_gta_data(low_threshold=10):
 
     summary_df = pd.DataFrame(summary)
     summary_path = os.path.join(output_dir, 'gta_summary_statistics.csv')
-    summary_df.to_csv(summary_path, index=False)
-    print(f"✓ Saved: {summary_path}")
+    save_csv(summary_df, summary_path)
     print()
 
     print("="*70)
@@ -0,0 +1,160 @@
+"""
+Online operational-state detection with hysteresis
+A per-GTA state machine that switches on when HP stays above an on-threshold
+for a minimum dwell and off when it stays at or below an off-threshold,
+emitting start-up and shutdown events as they are confirmed
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def _run_lengths(condition, carry):
+    """Length of the current True run at each row, continuing runs of length `carry`"""
+    counts = np.cumsum(condition, axis=0)
+    last_reset = np.maximum.accumulate(np.where(condition, 0, counts), axis=0)
+    runs = counts - last_reset
+    before_first_reset = np.cumsum(~condition, axis=0) == 0
+    return runs + before_first_reset * carry
+
+
+class HysteresisStateDetector:
+    """Streaming on/off state per unit with thresholds and minimum dwell times
+
+    A unit turns ON once HP > on_threshold for `min_on_samples` consecutive
+    samples and OFF once HP <= off_threshold (or missing) for
+    `min_off_samples` consecutive samples. With on == off and dwell 1 this is
+    exactly the `HP > threshold` rule of DowntimeAnalyzer.
+
+    `update` handles one sample with constant work per unit, `update_batch`
+    a micro-batch, and `detect` a whole history with the same vectorized
+    kernel; all three produce identical states and events.
+    """
+
+    def __init__(self, units, on_threshold=15, off_threshold=10, min_on_samples=4,
+                 min_off_samples=4, step=pd.Timedelta(minutes=15), initial_state=None):
+        """
+        Parameters:
+        -----------
+        units : list of str
+            Unit names, one per column of the HP samples
+        on_threshold, off_threshold : float
+            HP (tons/hour) above which a unit may start / at or below which it may stop
+        min_on_samples, min_off_samples : int
+            Consecutive samples needed to confirm a start-up / shutdown
+        step : Timedelta
+            Sample spacing, used to date the onset of a confirmed transition
+        initial_state : bool, optional
+            State before the first sample; by default taken from the first
+            sample (HP > on_threshold) without emitting an event
+        """
+        if off_threshold > on_threshold:
+            raise ValueError("off_threshold must not exceed on_threshold")
+        if min_on_samples < 1 or min_off_samples < 1:
+            raise ValueError("Dwell times must be at least one sample")
+
+        self.units = list(units)
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.min_on_samples = min_on_samples
+        self.min_off_samples = min_off_samples
+        self.step = pd.Timedelta(step)
+        self.initial_state = initial_state
+        self.reset()
+
+    def reset(self):
+        """Forget all state (as before the first sample)"""
+        n = len(self.units)
+        self.state = None if self.initial_state is None else np.full(n, bool(self.initial_state))
+        self._above_run = np.zeros(n, dtype=np.int64)
+        self._below_run = np.zeros(n, dtype=np.int64)
+
+    def update(self, timestamp, hp):
+        """Process one sample (HP per unit); returns the events it confirmed
+
+        Scalar fast path of update_batch for live feeds: constant work per unit.
+        """
+        values = np.asarray(hp, dtype=np.float64).ravel().tolist()
+        if self.state is None:
+            self.state = np.array([value > self.on_threshold for value in values])
+
+        timestamp = pd.Timestamp(timestamp)
+        events = []
+        for col, value in enumerate(values):
+            above = value > self.on_threshold
+            below = not value > self.off_threshold
+            self._above_run[col] = self._above_run[col] + 1 if above else 0
+            self._below_run[col] = self._below_run[col] + 1 if below else 0
+
+            if not self.state[col] and self._above_run[col] == self.min_on_samples:
+                self.state[col] = True
+                events.append(self._event(col, 'startup', timestamp, self.min_on_samples))
+            elif self.state[col] and self._below_run[col] == self.min_off_samples:
+                self.state[col] = False
+                events.append(self._event(col, 'shutdown', timestamp, self.min_off_samples))
+        return events
+
+    def _event(self, col, kind, timestamp, dwell):
+        """Event record for a transition confirmed at `timestamp`"""
+        return {
+            'unit': self.units[col],
+            'event': kind,
+            'time': timestamp,
+            'onset': timestamp - (dwell - 1) * self.step,
+        }
+
+    def update_batch(self, timestamps, hp):
+        """Process consecutive samples (rows x units)
+
+        Returns (states, events): a boolean (rows x units) array and the list
+        of start-up/shutdown events confirmed in this batch.
+        """
+        hp = np.asarray(hp, dtype=np.float64)
+        timestamps = pd.DatetimeIndex(timestamps)
+        if len(hp) == 0:
+            return np.zeros((0, len(self.units)), dtype=bool), []
+
+        if self.state is None:
+            self.state = hp[0] > self.on_threshold
+
+        with np.errstate(invalid='ignore'):
+            above = hp > self.on_threshold
+            below = ~(hp > self.off_threshold)
+
+        above_run = _run_lengths(above, self._above_run)
+        below_run = _run_lengths(below, self._below_run)
+
+        # +1 where a start-up is confirmed, -1 for a shutdown, 0 otherwise;
+        # the state is the last confirmation so far (forward fill)
+        marks = (above_run == self.min_on_samples).astype(np.int8)
+        marks -= (below_run == self.min_off_samples).astype(np.int8)
+        rows = np.arange(len(hp))[:, None]
+        last_mark = np.maximum.accumulate(np.where(marks != 0, rows, -1), axis=0)
+        mark_at_last = np.take_along_axis(marks, np.maximum(last_mark, 0), axis=0)
+        states = np.where(last_mark >= 0, mark_at_last > 0, self.state[None, :])
+
+        previous = np.vstack([self.state[None, :], states[:-1]])
+        changed = states != previous
+        events = []
+        for row, col in zip(*np.nonzero(changed)):
+            if states[row, col]:
+                events.append(self._event(col, 'startup', timestamps[row], self.min_on_samples))
+            else:
+                events.append(self._event(col, 'shutdown', timestamps[row], self.min_off_samples))
+
+        self.state = states[-1].copy()
+        self._above_run = above_run[-1].copy()
+        self._below_run = below_run[-1].copy()
+        return states, events
+
+    def detect(self, index, hp):
+        """Batch path over a full history from a fresh state
+
+        Returns (states, events): a boolean DataFrame (index x units) and an
+        events DataFrame with columns unit, event, time, onset.
+        """
+        self.reset()
+        states, events = self.update_batch(index, hp)
+        states = pd.DataFrame(states, index=index, columns=self.units)
+        events = pd.DataFrame(events, columns=['unit', 'event', 'time', 'onset'])
+        return states, events
@@ -0,0 +1,322 @@
+"""
+Chunked streaming ingestion for large historian exports
+Validates and summarises a CSV in bounded-memory chunks, for files that do
+not fit in RAM (multi-year 1-minute data, all GTAs)
+"""
+
+import numpy as np
+import pandas as pd
+from config import DATA_PATH, CONSTRAINTS, discover_gta_columns
+from constraint_engine import ConstraintEngine
+from quantiles import QuantileSketches
+
+
+class RunningStats:
+    """Per-column count/mean/variance/min/max, updated block by block
+
+    Mean and variance use Chan's parallel update, so blocks (or whole
+    RunningStats objects) can be merged in any order without losing precision.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        n = len(self.columns)
+        self.count = np.zeros(n, dtype=np.int64)
+        self.missing = np.zeros(n, dtype=np.int64)
+        self.mean = np.zeros(n)
+        self.m2 = np.zeros(n)
+        self.min = np.full(n, np.inf)
+        self.max = np.full(n, -np.inf)
+
+    def update(self, block):
+        """Fold a (rows x columns) array into the statistics"""
+        block = np.asarray(block, dtype=np.float64)
+        if block.ndim == 1:
+            block = block[:, None]
+        if len(block) == 0:
+            return self
+
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        self.missing += len(block) - count
+
+        filled = np.where(valid, block, 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = filled.sum(axis=0) / count
+            m2 = (np.where(valid, block - mean, 0.0) ** 2).sum(axis=0)
+        has = count > 0
+        self._merge(count, np.where(has, mean, 0.0), np.where(has, m2, 0.0))
+
+        self.min = np.fmin(self.min, np.where(valid, block, np.inf).min(axis=0))
+        self.max = np.fmax(self.max, np.where(valid, block, -np.inf).max(axis=0))
+        return self
+
+    def merge(self, other):
+        """Combine with another RunningStats over the same columns"""
+        self._merge(other.count, other.mean, other.m2)
+        self.missing += other.missing
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        return self
+
+    def _merge(self, count, mean, m2):
+        total = self.count + count
+        with np.errstate(invalid='ignore', divide='ignore'):
+            delta = mean - self.mean
+            weight = np.where(total > 0, count / total, 0.0)
+        self.mean = self.mean + delta * weight
+        self.m2 = self.m2 + m2 + delta ** 2 * self.count * weight
+        self.count = total
+
+    def std(self):
+        """Sample standard deviation (ddof=1, as pandas)"""
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.sqrt(np.where(self.count > 1, self.m2 / (self.count - 1), np.nan))
+
+    def describe(self):
+        """count/mean/std/min/max per column, laid out like DataFrame.describe()"""
+        empty = self.count == 0
+        return pd.DataFrame({
+            'count': self.count.astype(float),
+            'mean': np.where(empty, np.nan, self.mean),
+            'std': self.std(),
+            'min': np.where(empty, np.nan, self.min),
+            'max': np.where(empty, np.nan, self.max),
+        }, index=self.columns).T
+
+
+class EnergyAccumulator:
+    """Incrementally maintained summaries of a wide energy frame
+
+    Holds record counts, date range, per-column running statistics and
+    quantile sketches, constraint violation counters, system-total
+    statistics and uptime counters. Each update costs O(rows in the update);
+    results use the same formats as EnergyDataLoader and DowntimeAnalyzer.
+    """
+
+    def __init__(self, columns, gta_columns=None, constraints=CONSTRAINTS,
+                 uptime_thresholds=(), step_minutes=15, quantile_k=200):
+        self.columns = list(columns)
+        self.gta_columns = gta_columns if gta_columns is not None else discover_gta_columns(self.columns)
+        self.units = list(self.gta_columns)
+        self.engine = ConstraintEngine(constraints)
+        self.step_minutes = step_minutes
+
+        col_pos = {col: i for i, col in enumerate(self.columns)}
+        self._unit_cols = [col_pos[col] for cols in self.gta_columns.values() for col in cols]
+
+        self.total_records = 0
+        self.date_min = None
+        self.date_max = None
+        self.stats = RunningStats(self.columns)
+        self.quantiles = QuantileSketches(self.columns, k=quantile_k)
+        self.totals_stats = RunningStats(
+            ['Total_HP_Admission', 'Total_MP_Extraction', 'Total_Energy_Production'])
+        self.violation_counts = np.zeros((len(self.units), len(self.engine.rule_names)), dtype=np.int64)
+        self.operational_counts = {
+            threshold: np.zeros(len(self.units), dtype=np.int64) for threshold in uptime_thresholds
+        }
+        self.downtime_counts = {
+            threshold: np.zeros(len(self.units), dtype=np.int64) for threshold in uptime_thresholds
+        }
+
+    def update(self, dates, values):
+        """Fold new rows in; returns their (rows, n_units, 3) block and system totals"""
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return None, None
+
+        dates = pd.DatetimeIndex(dates)
+        chunk_min, chunk_max = dates.min(), dates.max()
+        self.date_min = chunk_min if self.date_min is None else min(self.date_min, chunk_min)
+        self.date_max = chunk_max if self.date_max is None else max(self.date_max, chunk_max)
+
+        self.total_records += len(values)
+        self.stats.update(values)
+        self.quantiles.update(values)
+
+        unit_values = values[:, self._unit_cols].reshape(len(values), len(self.units), 3)
+        self.violation_counts += self.engine.evaluate(unit_values, self.units).counts
+
+        # Plain sums so a missing value propagates, as in calculate_system_totals
+        totals = unit_values.sum(axis=1)
+        self.totals_stats.update(totals)
+
+        hp = unit_values[:, :, 0]
+        # Missing HP is neither operational nor down
+        for threshold, counts in self.operational_counts.items():
+            counts += np.count_nonzero(hp > threshold, axis=0)
+            self.downtime_counts[threshold] += np.count_nonzero(hp <= threshold, axis=0)
+
+        return unit_values, totals
+
+    def _count(self, rule, unit_idx):
+        """Accumulated violations of one rule for one unit"""
+        return int(self.violation_counts[unit_idx, self.engine.rule_names.index(rule)])
+
+    def get_basic_stats(self):
+        """Same keys as EnergyDataLoader.get_basic_stats"""
+        return {
+            'total_records': self.total_records,
+            'date_range': (self.date_min, self.date_max),
+            'missing_values': dict(zip(self.columns, self.stats.missing.tolist())),
+            'data_shape': (self.total_records, len(self.columns)),
+        }
+
+    def validate_constraints(self):
+        """Same format as EnergyDataLoader.validate_constraints"""
+        col_pos = {col: i for i, col in enumerate(self.columns)}
+        report = {}
+        for i, (gta, cols) in enumerate(self.gta_columns.items()):
+            report[gta] = {
+                'hp_violations': self._count('hp_above_max', i) + self._count('hp_below_min', i),
+                'mp_violations': self._count('mp_above_max', i),
+                'ee_violations': self._count('ee_above_max', i),
+            }
+            for key, col in zip(['hp_range', 'mp_range', 'ee_range'], cols):
+                j = col_pos[col]
+                report[gta][key] = (self.stats.min[j], self.stats.max[j])
+        return report
+
+    def system_totals_summary(self):
+        """Streaming equivalent of calculate_system_totals().describe() (no quartiles)"""
+        return self.totals_stats.describe()
+
+    def percentiles(self, percentiles=(50, 75, 90, 95, 99, 99.5, 100), columns=None):
+        """Approximate percentiles (rows) by column from the quantile sketches"""
+        return self.quantiles.percentiles(list(percentiles), columns)
+
+    def uptime_statistics(self, threshold):
+        """Same format as the stats returned by DowntimeAnalyzer.calculate_uptime_statistics"""
+        if threshold not in self.operational_counts:
+            raise ValueError(f"Uptime not tracked for threshold {threshold}; "
+                             f"tracked: {list(self.operational_counts)}")
+
+        uptime_stats = {}
+        for gta_name, operational_count, downtime_count in zip(
+                self.units, self.operational_counts[threshold], self.downtime_counts[threshold]):
+            operational_count, downtime_count = int(operational_count), int(downtime_count)
+            measured = operational_count + downtime_count
+            uptime_stats[gta_name] = {
+                'operational_records': operational_count,
+                'downtime_records': downtime_count,
+                'missing_records': self.total_records - measured,
+                'uptime_pct': operational_count / measured * 100 if measured else np.nan,
+                'downtime_pct': downtime_count / measured * 100 if measured else np.nan,
+                'operational_days': operational_count * self.step_minutes / 60 / 24,
+                'downtime_days': downtime_count * self.step_minutes / 60 / 24
+            }
+        return uptime_stats
+
+
+class ChunkedEnergyScanner:
+    """Single bounded-memory pass over an energy CSV
+
+    Mirrors EnergyDataLoader.get_basic_stats, validate_constraints and
+    calculate_system_totals, but only ever holds one chunk in memory. Units
+    are discovered from the header, so exports with more GTAs than
+    GTA_COLUMNS are covered.
+    """
+
+    def __init__(self, filepath=DATA_PATH, chunksize=100_000, constraints=CONSTRAINTS,
+                 gta_columns=None, totals_path=None):
+        """
+        Parameters:
+        -----------
+        filepath : str
+            Source CSV with a 'Date' column
+        chunksize : int
+            Rows per chunk; peak memory is proportional to this
+        constraints : dict
+            Limits in the format of config.CONSTRAINTS
+        gta_columns : dict, optional
+            Unit -> [hp, mp, ee] columns; discovered from the header if omitted
+        totals_path : str, optional
+            If given, the per-timestamp system totals are appended to this CSV
+            chunk by chunk instead of being kept in memory
+        """
+        self.filepath = filepath
+        self.chunksize = chunksize
+        self.constraints = constraints
+        self.gta_columns = gta_columns
+        self.totals_path = totals_path
+        self.accumulator = None
+        self.chunks_read = 0
+
+    @property
+    def total_records(self):
+        """Rows read so far"""
+        return self.accumulator.total_records if self.accumulator else 0
+
+    def scan(self):
+        """Read the whole file chunk by chunk; returns self"""
+        header = pd.read_csv(self.filepath, nrows=0).columns
+        columns = [c for c in header if c != 'Date']
+        self.accumulator = EnergyAccumulator(columns, self.gta_columns, self.constraints)
+        self.gta_columns = self.accumulator.gta_columns
+        self.chunks_read = 0
+
+        for chunk in pd.read_csv(self.filepath, chunksize=self.chunksize):
+            self._consume(chunk, columns)
+
+        return self
+
+    def _consume(self, chunk, columns):
+        dates = pd.to_datetime(chunk['Date'])
+        _, totals = self.accumulator.update(dates, chunk[columns].to_numpy(dtype=np.float64))
+        self.chunks_read += 1
+
+        if self.totals_path and totals is not None:
+            totals_df = pd.DataFrame(totals, columns=self.accumulator.totals_stats.columns,
+                                     index=pd.DatetimeIndex(dates, name='Date'))
+            totals_df.to_csv(self.totals_path, mode='w' if self.chunks_read == 1 else 'a',
+                             header=self.chunks_read == 1)
+
+    def _require_scan(self):
+        if self.accumulator is None:
+            self.scan()
+
+    def get_basic_stats(self):
+        """Same keys as EnergyDataLoader.get_basic_stats"""
+        self._require_scan()
+        return self.accumulator.get_basic_stats()
+
+    def validate_constraints(self):
+        """Same format as EnergyDataLoader.validate_constraints"""
+        self._require_scan()
+        return self.accumulator.validate_constraints()
+
+    def system_totals_summary(self):
+        """Streaming equivalent of calculate_system_totals().describe() (no quartiles)"""
+        self._require_scan()
+        return self.accumulator.system_totals_summary()
+
+    def percentiles(self, percentiles=(50, 75, 90, 95, 99, 99.5, 100), columns=None):
+        """Approximate percentiles (rows) by column, in constant memory"""
+        self._require_scan()
+        return self.accumulator.percentiles(percentiles, columns)
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    chunksize = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+
+    scanner = ChunkedEnergyScanner(path, chunksize=chunksize).scan()
+    print(f"Scanned {scanner.total_records:,} records in {scanner.chunks_read} chunks "
+          f"({len(scanner.gta_columns)} units: {', '.join(scanner.gta_columns)})")
+
+    print("\nBasic Statistics:")
+    for key, value in scanner.get_basic_stats().items():
+        print(f"  {key}: {value}")
+
+    print("\nConstraint Violations:")
+    for gta, metrics in scanner.validate_constraints().items():
+        print(f"  {gta}: {metrics}")
+
+    print("\nSystem Totals Summary:")
+    print(scanner.system_totals_summary())
+
+    print("\nApproximate Percentiles:")
+    print(scanner.percentiles())
@@ -0,0 +1,141 @@
+"""
+Per-unit distribution summaries
+One vectorized pass over the (time x unit x metric) block yields, for every
+GTA and metric, the histogram and the summary statistics the EDA figures and
+report use (count, mean, median, min, max, std, totals and the efficiency
+ratios), so plotting and reporting read a cached object instead of
+recomputing from the rows of each unit
+"""
+
+import numpy as np
+import pandas as pd
+from unit_store import METRICS
+
+
+def _column_histograms(values, bins):
+    """Equal-width histograms of every column of a (T, C) array, missing values skipped
+
+    Each column's range is its own [min, max] (widened by 0.5 when
+    constant), and counts equal np.histogram(column, bins) bin for bin.
+    Returns (counts (C, bins), edges (C, bins + 1)).
+    """
+    n_columns = values.shape[1]
+    valid = ~np.isnan(values)
+    has_values = valid.any(axis=0)
+    low = np.where(has_values, np.where(valid, values, np.inf).min(axis=0), 0.0)
+    high = np.where(has_values, np.where(valid, values, -np.inf).max(axis=0), 1.0)
+    constant = low == high
+    low = np.where(constant, low - 0.5, low)
+    high = np.where(constant, high + 0.5, high)
+    edges = np.linspace(low, high, bins + 1, axis=1)
+
+    # Bin index as np.histogram computes it, with the same 1-ULP corrections
+    rows, columns = np.nonzero(valid)
+    x = values[rows, columns]
+    index = ((x - low[columns]) / (high[columns] - low[columns]) * bins).astype(np.intp)
+    index[index == bins] -= 1
+    index -= x < edges[columns, index]
+    index += (x >= edges[columns, index + 1]) & (index != bins - 1)
+
+    counts = np.bincount(columns * bins + index, minlength=n_columns * bins)
+    return counts.reshape(n_columns, bins), edges
+
+
+class UnitSummary:
+    """Histograms and summary statistics of every unit and metric
+
+    Statistics are (n_units, n_metrics) arrays over the non-missing samples;
+    histograms use `bins` equal-width bins spanning each unit/metric range.
+    """
+
+    def __init__(self, values, units, metrics=METRICS, bins=50):
+        """
+        Parameters:
+        -----------
+        values : array (T, n_units, n_metrics)
+            Measurements (e.g. UnitArrayStore.values)
+        units : list of str
+            Unit names
+        metrics : list of str
+            Metric names
+        bins : int
+            Histogram bins per unit and metric
+        """
+        values = np.asarray(values, dtype=np.float64)
+        n_rows, n_units, n_metrics = values.shape
+        self.units = list(units)
+        self.metrics = list(metrics)
+        self.bins = bins
+
+        valid = ~np.isnan(values)
+        zeroed = np.where(valid, values, 0.0)
+        self.count = valid.sum(axis=0)
+        self.total = zeroed.sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.mean = self.total / self.count
+            self.std = np.sqrt(((zeroed - self.mean) ** 2 * valid).sum(axis=0) / (self.count - 1))
+            self.median = np.nanmedian(values, axis=0) if n_rows else np.full((n_units, n_metrics), np.nan)
+        self.min = np.where(self.count > 0, np.where(valid, values, np.inf).min(axis=0), np.nan)
+        self.max = np.where(self.count > 0, np.where(valid, values, -np.inf).max(axis=0), np.nan)
+
+        counts, edges = _column_histograms(values.reshape(n_rows, -1), bins)
+        self.hist = counts.reshape(n_units, n_metrics, bins)
+        self.edges = edges.reshape(n_units, n_metrics, bins + 1)
+
+        # Efficiency ratios per sample, averaged like pandas Series.mean
+        # (missing and 0/0 samples skipped, division by zero kept as inf)
+        hp, mp, ee = (values[:, :, self.metrics.index(name)] for name in METRICS)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            self.ratio_means = {
+                'energy_per_hp': np.nanmean(ee / hp, axis=0),
+                'energy_per_mp': np.nanmean(ee / mp, axis=0),
+                'mp_to_hp': np.nanmean(mp / hp, axis=0),
+                'net_steam': np.nanmean(hp - mp, axis=0),
+            }
+
+    @classmethod
+    def from_store(cls, store, bins=50):
+        """Summary of a UnitArrayStore"""
+        return cls(store.values, store.units, store.metrics, bins)
+
+    def _position(self, unit, metric):
+        return self.units.index(unit), self.metrics.index(metric)
+
+    def histogram(self, unit, metric):
+        """(counts, edges) of one unit and metric, as np.histogram returns them"""
+        u, m = self._position(unit, metric)
+        return self.hist[u, m], self.edges[u, m]
+
+    def stat(self, name, unit, metric):
+        """One statistic ('count', 'mean', 'median', 'min', 'max', 'std', 'total')"""
+        u, m = self._position(unit, metric)
+        return getattr(self, name)[u, m]
+
+    def table(self):
+        """Statistics as a tidy DataFrame: unit, metric, count, mean, median, std, min, max, total"""
+        n_units, n_metrics = len(self.units), len(self.metrics)
+        return pd.DataFrame({
+            'unit': np.repeat(self.units, n_metrics),
+            'metric': np.tile(self.metrics, n_units),
+            'count': self.count.ravel(),
+            'mean': self.mean.ravel(),
+            'median': self.median.ravel(),
+            'std': self.std.ravel(),
+            'min': self.min.ravel(),
+            'max': self.max.ravel(),
+            'total': self.total.ravel(),
+        })
+
+    def efficiency(self):
+        """Efficiency metrics per unit (the EnergyEDA.calculate_efficiency_metrics table)"""
+        hp, mp, ee = (self.metrics.index(name) for name in METRICS)
+        return pd.DataFrame({
+            'GTA': self.units,
+            'Avg_Energy_per_HP': self.ratio_means['energy_per_hp'],
+            'Avg_Energy_per_MP': self.ratio_means['energy_per_mp'],
+            'Avg_MP_to_HP_Ratio': self.ratio_means['mp_to_hp'],
+            'Avg_Net_Steam': self.ratio_means['net_steam'],
+            'Total_Energy': self.total[:, ee],
+            'Avg_HP': self.mean[:, hp],
+            'Avg_MP': self.mean[:, mp],
+        })
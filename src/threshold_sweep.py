@@ -0,0 +1,214 @@
+"""
+Threshold sweeps for constraint and downtime what-ifs
+Each unit's column is sorted once; violation counts, share of data removed,
+number of violation blocks (and uptime, downtime periods and longest
+outage) for any number of candidate limits are then binary searches into
+the sorted values
+"""
+
+import numpy as np
+import pandas as pd
+from config import GTA_COLUMNS
+from unit_store import METRICS
+
+
+def _count_above(sorted_values, n_valid, thresholds):
+    """Per column, how many of the first n_valid sorted values exceed each threshold"""
+    counts = np.empty((len(thresholds), sorted_values.shape[1]), dtype=np.int64)
+    for u in range(sorted_values.shape[1]):
+        column = sorted_values[:n_valid[u], u]
+        counts[:, u] = n_valid[u] - np.searchsorted(column, thresholds, side='right')
+    return counts
+
+
+class ThresholdSweep:
+    """Violation statistics of one metric for arbitrary candidate limits
+
+    A block is a run of consecutive violating rows. Row i starts a block
+    when it violates and row i-1 does not, so for an upper limit t:
+
+        blocks(t) = #{x_i > t} - #{min(x_i-1, x_i) > t}
+
+    and both terms are searchsorted counts on presorted arrays (values and
+    adjacent-pair minima). Missing values never violate and break blocks.
+    """
+
+    def __init__(self, values, units, op='>', n_rows=None):
+        """
+        Parameters:
+        -----------
+        values : array-like, shape (T, n_units)
+            One metric for every unit, rows in time order
+        units : list of str
+            Unit names for the columns
+        op : str
+            '>' for an upper limit (violation when value > limit),
+            '<' for a lower limit (violation when value < limit)
+        n_rows : int, optional
+            Denominator for the percentage removed; defaults to T
+        """
+        if op not in ('>', '<'):
+            raise ValueError("op must be '>' or '<'")
+        values = np.asarray(values, dtype=np.float64).reshape(-1, len(units))
+        self.units = list(units)
+        self.op = op
+        self.n_rows = len(values) if n_rows is None else n_rows
+
+        # A lower limit is an upper limit on the negated values
+        signed = values if op == '>' else -values
+        pair_min = np.fmin(signed[1:], signed[:-1])
+        pair_min[np.isnan(signed[1:]) | np.isnan(signed[:-1])] = np.nan
+
+        # np.sort puts NaN last, so the valid values are a prefix of each column
+        self._sorted = np.sort(signed, axis=0)
+        self._n_valid = np.count_nonzero(~np.isnan(signed), axis=0)
+        self._sorted_pairs = np.sort(pair_min, axis=0)
+        self._n_valid_pairs = np.count_nonzero(~np.isnan(pair_min), axis=0)
+
+    @classmethod
+    def from_frame(cls, data, metric, op='>', gta_columns=GTA_COLUMNS):
+        """Sweep one metric ('HP_Admission', ...) of every unit in a wide frame"""
+        column = METRICS.index(metric)
+        values = data[[columns[column] for columns in gta_columns.values()]]
+        return cls(values.to_numpy(dtype=np.float64), list(gta_columns), op=op)
+
+    def _signed(self, thresholds):
+        thresholds = np.asarray(thresholds, dtype=np.float64).ravel()
+        return thresholds if self.op == '>' else -thresholds
+
+    def violations(self, thresholds):
+        """(n_thresholds, n_units) number of violating rows"""
+        return _count_above(self._sorted, self._n_valid, self._signed(thresholds))
+
+    def blocks(self, thresholds):
+        """(n_thresholds, n_units) number of runs of consecutive violating rows"""
+        signed = self._signed(thresholds)
+        return (_count_above(self._sorted, self._n_valid, signed)
+                - _count_above(self._sorted_pairs, self._n_valid_pairs, signed))
+
+    def sweep(self, thresholds):
+        """Tidy table: unit, threshold, violations, pct_removed, blocks"""
+        thresholds = np.asarray(thresholds, dtype=np.float64).ravel()
+        signed = self._signed(thresholds)
+        violations = _count_above(self._sorted, self._n_valid, signed)
+        blocks = violations - _count_above(self._sorted_pairs, self._n_valid_pairs, signed)
+
+        n_units = len(self.units)
+        return pd.DataFrame({
+            'unit': np.repeat(self.units, len(thresholds)),
+            'threshold': np.tile(thresholds, n_units),
+            'violations': violations.T.ravel(),
+            'pct_removed': violations.T.ravel() / self.n_rows * 100,
+            'blocks': blocks.T.ravel(),
+        })
+
+
+def _max_windows(values):
+    """First and last position of the longest run around each element in which it is the maximum
+
+    Two monotonic-stack passes find, for every element, the nearest strictly
+    greater element on each side; the run between them has that element as
+    its maximum. O(T) overall.
+    """
+    values = values.tolist()
+    n = len(values)
+
+    def previous_greater(order):
+        nearest = [0] * n
+        stack = []
+        for i in order:
+            v = values[i]
+            while stack and values[stack[-1]] <= v:
+                stack.pop()
+            nearest[i] = stack[-1] if stack else None
+            stack.append(i)
+        return nearest
+
+    before = previous_greater(range(n))
+    after = previous_greater(range(n - 1, -1, -1))
+    first = np.array([0 if b is None else b + 1 for b in before], dtype=np.int64)
+    last = np.array([n - 1 if a is None else a - 1 for a in after], dtype=np.int64)
+    return first, last
+
+
+class DowntimeSweep:
+    """Uptime, downtime periods and longest outage for arbitrary down thresholds
+
+    A unit is down at threshold t when HP <= t. Missing HP is neither up
+    nor down, as in DowntimeAnalyzer.detect_operational_states: it is left
+    out of the percentages, and a gap between two down samples does not
+    split the period (DowntimeAnalyzer.downtime_intervals). On each unit's
+    measured samples x_i, for every t:
+
+        down(t)    = #{x_i <= t}
+        periods(t) = down(t) - #{max(x_i-1, x_i) <= t}
+        longest(t) = max{w_i : x_i <= t}
+
+    where w_i is the longest run in which x_i is the maximum (any run of
+    downs is the run of its maximum). All three are binary searches into
+    arrays sorted once; run lengths are measured like StateIntervals
+    (rows spanned, and end - start as a duration).
+    """
+
+    def __init__(self, hp_values, units, index=None):
+        """
+        Parameters:
+        -----------
+        hp_values : array-like, shape (T, n_units)
+            HP admission of every unit, rows in time order
+        units : list of str
+            Unit names for the columns
+        index : DatetimeIndex, optional
+            Sample timestamps, used to express outages as durations
+        """
+        values = np.asarray(hp_values, dtype=np.float64).reshape(-1, len(units))
+        self.units = list(units)
+        times = pd.DatetimeIndex(index).as_unit('ns').asi8 if index is not None else None
+        self.has_times = times is not None
+
+        self.n_valid = []
+        self._sorted = []
+        self._sorted_pairs = []
+        self._longest_rows = []
+        self._longest_ns = []
+        for u in range(len(self.units)):
+            rows = np.flatnonzero(~np.isnan(values[:, u]))
+            column = values[rows, u]
+            self.n_valid.append(len(rows))
+            self._sorted.append(np.sort(column))
+            self._sorted_pairs.append(np.sort(np.maximum(column[1:], column[:-1])))
+
+            # Longest run whose maximum is at most the k-th smallest value
+            order = np.argsort(column, kind='stable')
+            first, last = _max_windows(column)
+            first, last = rows[first[order]], rows[last[order]]
+            self._longest_rows.append(np.maximum.accumulate(last - first + 1))
+            if self.has_times:
+                self._longest_ns.append(np.maximum.accumulate(times[last] - times[first]))
+
+    def sweep(self, thresholds):
+        """Tidy table: unit, threshold, uptime_pct, operational_records,
+        downtime_records, downtime_periods, longest_outage_samples (and
+        longest_outage when the timestamps are known)"""
+        thresholds = np.asarray(thresholds, dtype=np.float64).ravel()
+        tables = []
+        for u, unit in enumerate(self.units):
+            n_valid = self.n_valid[u]
+            down = np.searchsorted(self._sorted[u], thresholds, side='right')
+            pairs_down = np.searchsorted(self._sorted_pairs[u], thresholds, side='right')
+            last = np.maximum(down - 1, 0)
+            table = pd.DataFrame({
+                'unit': unit,
+                'threshold': thresholds,
+                'uptime_pct': (n_valid - down) / n_valid * 100 if n_valid else np.nan,
+                'operational_records': n_valid - down,
+                'downtime_records': down,
+                'downtime_periods': down - pairs_down,
+                'longest_outage_samples': np.where(down > 0, self._longest_rows[u][last], 0)
+                                          if n_valid else 0,
+            })
+            if self.has_times:
+                longest = np.where(down > 0, self._longest_ns[u][last], 0) if n_valid else 0
+                table['longest_outage'] = pd.to_timedelta(longest, unit='ns')
+            tables.append(table)
+        return pd.concat(tables, ignore_index=True)
@@ -0,0 +1,171 @@
+"""
+Fixed-frequency time grid for the 15-minute energy data
+Rows are stored against an implicit start + i * step index, so converting a
+timestamp to a row position is arithmetic instead of an index search
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_STEP = pd.Timedelta(minutes=15)
+
+
+class TimeGrid:
+    """Implicit regular index: row i <-> start + i * step"""
+
+    def __init__(self, start, step, length):
+        self.start = pd.Timestamp(start)
+        self.step = pd.Timedelta(step)
+        self.length = int(length)
+
+    def __len__(self):
+        return self.length
+
+    def __repr__(self):
+        return f"TimeGrid(start={self.start}, step={format_step(self.step)}, length={self.length})"
+
+    @property
+    def end(self):
+        """Timestamp of the last slot"""
+        return self.timestamp(self.length - 1)
+
+    def timestamp(self, position):
+        """Timestamp of a row position"""
+        return self.start + int(position) * self.step
+
+    def timestamps(self):
+        """Materialised DatetimeIndex for the whole grid"""
+        return pd.date_range(self.start, periods=self.length, freq=self.step, name='Date')
+
+    def position(self, ts, side='left'):
+        """Row position of `ts`, clipped to [0, length]
+
+        side='left' rounds an off-grid timestamp up to the next slot,
+        side='right' returns one past the last slot <= ts (like searchsorted).
+        """
+        offset = (pd.Timestamp(ts) - self.start) / self.step
+        pos = int(np.ceil(offset)) if side == 'left' else int(np.floor(offset)) + 1
+        return min(max(pos, 0), self.length)
+
+    def positions(self, index):
+        """Vectorized exact positions for on-grid timestamps (float, NaN if off-grid)"""
+        offset = ((pd.DatetimeIndex(index) - self.start) / self.step).to_numpy(dtype=np.float64)
+        return np.where(offset == np.round(offset), offset, np.nan)
+
+    def slice(self, start=None, end=None):
+        """Positional slice covering [start, end] inclusive, like .loc[start:end]"""
+        lo = 0 if start is None else self.position(start, side='left')
+        hi = self.length if end is None else self.position(end, side='right')
+        return slice(lo, max(lo, hi))
+
+    def is_compatible(self, other):
+        """True when both grids share step and phase, so rows line up exactly"""
+        if self.step != other.step:
+            return False
+        return ((other.start - self.start) % self.step) == pd.Timedelta(0)
+
+    def overlap(self, other):
+        """Slices (into self, into other) of the common time span of two compatible grids"""
+        if not self.is_compatible(other):
+            raise ValueError(f"Grids are not aligned: {self} vs {other}")
+        lo = max(self.start, other.start)
+        hi = min(self.end, other.end)
+        if lo > hi:
+            return slice(0, 0), slice(0, 0)
+        return self.slice(lo, hi), other.slice(lo, hi)
+
+
+def format_step(step):
+    """Short frequency string for a step, e.g. '15min'"""
+    return pd.tseries.frequencies.to_offset(pd.Timedelta(step)).freqstr
+
+
+def detect_step(index):
+    """Most common positive spacing of a DatetimeIndex"""
+    diffs = pd.Series(pd.DatetimeIndex(index)).diff()
+    diffs = diffs[diffs > pd.Timedelta(0)]
+    if diffs.empty:
+        return DEFAULT_STEP
+    return diffs.mode().iloc[0]
+
+
+def regularize(data, step=None, duplicates='first'):
+    """Place a time-indexed frame on a regular grid
+
+    Rows are sorted and timestamps off the grid phase are dropped; empty
+    slots become NaN rows.
+
+    Parameters:
+    -----------
+    data : DataFrame
+        Frame with a DatetimeIndex
+    step : Timedelta, optional
+        Grid step; defaults to the most common spacing of the index
+    duplicates : str
+        'first' keeps the first row (in file order) of a repeated timestamp
+        and reports the others in gap_report['duplicates'];
+        'raise' raises ValueError instead
+
+    Returns:
+    --------
+    (frame, grid, gap_report) where `frame` has one row per grid slot and
+    `gap_report` describes everything that had to be fixed.
+    """
+    if duplicates not in ('first', 'raise'):
+        raise ValueError("duplicates must be 'first' or 'raise'")
+    index = pd.DatetimeIndex(data.index)
+    step = pd.Timedelta(step) if step is not None else detect_step(index)
+
+    out_of_order = int((np.diff(index.asi8) < 0).sum()) if len(index) > 1 else 0
+    start = index.min()
+    offsets = ((index - start) / step).to_numpy(dtype=np.float64)
+    on_grid = offsets == np.round(offsets)
+
+    positions = offsets.astype(np.int64)
+    # First occurrence (in file order) of each on-grid slot wins
+    seen = np.zeros(len(index), dtype=bool)
+    valid_pos = np.flatnonzero(on_grid)
+    _, first = np.unique(positions[valid_pos], return_index=True)
+    seen[valid_pos[first]] = True
+    duplicated = on_grid & ~seen
+    if duplicates == 'raise' and duplicated.any():
+        raise ValueError(f"{int(duplicated.sum())} rows repeat a timestamp, "
+                         f"first at {index[duplicated][0]}")
+
+    length = int(positions[on_grid].max()) + 1 if on_grid.any() else 0
+    grid = TimeGrid(start, step, length)
+
+    values = data.to_numpy()
+    numeric = np.issubdtype(values.dtype, np.number)
+    block = np.full((length, values.shape[1]), np.nan if numeric else None,
+                    dtype=np.float64 if numeric else object)
+    block[positions[seen]] = values[seen]
+    frame = pd.DataFrame(block, index=grid.timestamps(), columns=data.columns)
+    if not numeric:
+        frame = frame.infer_objects()
+
+    # Runs of slots that no row landed in
+    filled = np.zeros(length, dtype=bool)
+    filled[positions[seen]] = True
+    edges = np.diff(np.concatenate(([0], (~filled).astype(np.int8), [0])))
+    gap_starts = np.flatnonzero(edges == 1)
+    gap_ends = np.flatnonzero(edges == -1)
+    gaps = pd.DataFrame({
+        'start': grid.timestamps()[gap_starts] if length else [],
+        'end': grid.timestamps()[gap_ends - 1] if length else [],
+        'missing_slots': gap_ends - gap_starts,
+    })
+
+    gap_report = {
+        'step': step,
+        'grid_slots': length,
+        'source_rows': len(index),
+        'missing_slots': int((~filled).sum()),
+        'duplicate_rows': int(duplicated.sum()),
+        'duplicate_timestamps': index[duplicated],
+        'duplicates': data[duplicated],
+        'off_grid_rows': int((~on_grid).sum()),
+        'out_of_order_rows': out_of_order,
+        'gaps': gaps,
+    }
+    return frame, grid, gap_report
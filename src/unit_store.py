@@ -0,0 +1,139 @@
+"""
+Compact (time x unit x metric) array store for the GTA measurements
+One float32 block replaces the per-GTA DataFrame copies; per-unit and
+per-metric accessors are numpy views into it
+"""
+
+import numpy as np
+import pandas as pd
+from config import GTA_COLUMNS
+
+METRICS = ['HP_Admission', 'MP_Extraction', 'Energy_Production']
+
+
+class UnitArrayStore:
+    """Measurements as a (T, n_units, 3) array sharing the data's DatetimeIndex
+
+    Arrays and frames returned by the accessors are read-only views; copy
+    them before modifying.
+    """
+
+    def __init__(self, index, values, units, metrics=METRICS):
+        values = np.asarray(values)
+        if values.shape != (len(index), len(units), len(metrics)):
+            raise ValueError(f"Expected shape {(len(index), len(units), len(metrics))}, "
+                             f"got {values.shape}")
+        # Rows live in a growable buffer so append() is amortised O(new rows);
+        # a writable contiguous input array is taken over without copying
+        self._buffer = np.require(values, requirements=['C', 'W'])
+        self._length = len(values)
+        self._index = index
+        self._index_parts = []
+        self.units = list(units)
+        self.metrics = list(metrics)
+        self._unit_pos = {name: i for i, name in enumerate(self.units)}
+        self._metric_pos = {name: i for i, name in enumerate(self.metrics)}
+
+    @property
+    def values(self):
+        """(T, n_units, n_metrics) read-only view of the stored rows"""
+        view = self._buffer[:self._length]
+        view.flags.writeable = False
+        return view
+
+    @property
+    def index(self):
+        """DatetimeIndex of the stored rows (appended parts are joined on first access)"""
+        if self._index_parts:
+            self._index = self._index.append(self._index_parts)
+            self._index_parts = []
+        return self._index
+
+    def append(self, index, values):
+        """Add rows at the end, growing the buffer geometrically when full
+
+        Views handed out earlier keep showing the rows they were taken from.
+        """
+        values = np.asarray(values, dtype=self._buffer.dtype)
+        n_new = len(values)
+        if values.shape[1:] != self._buffer.shape[1:] or len(index) != n_new:
+            raise ValueError(f"Expected rows of shape (n, {len(self.units)}, {len(self.metrics)}) "
+                             f"with a matching index")
+        if n_new == 0:
+            return
+
+        needed = self._length + n_new
+        if needed > len(self._buffer):
+            grown = np.empty((max(needed, 2 * len(self._buffer)),) + self._buffer.shape[1:],
+                             dtype=self._buffer.dtype)
+            grown[:self._length] = self._buffer[:self._length]
+            self._buffer = grown
+        self._buffer[self._length:needed] = values
+        self._length = needed
+        self._index_parts.append(index)
+
+    @classmethod
+    def from_frame(cls, data, gta_columns=GTA_COLUMNS, dtype=np.float32):
+        """Build from a wide frame with one [hp, mp, ee] column triple per unit"""
+        values = cls.block_from_frame(data, gta_columns, dtype)
+        return cls(data.index, values, list(gta_columns))
+
+    @staticmethod
+    def block_from_frame(data, gta_columns=GTA_COLUMNS, dtype=np.float32):
+        """(rows, n_units, 3) block of a wide frame, for append()"""
+        columns = [col for cols in gta_columns.values() for col in cols]
+        return data[columns].to_numpy(dtype=dtype).reshape(len(data), len(gta_columns), len(METRICS))
+
+    def __len__(self):
+        return self._length
+
+    @property
+    def nbytes(self):
+        """Size of the value block in bytes"""
+        return self.values.nbytes
+
+    def unit_position(self, unit):
+        """Axis-1 position of a unit name"""
+        if unit not in self._unit_pos:
+            raise ValueError(f"Invalid GTA name. Choose from {self.units}")
+        return self._unit_pos[unit]
+
+    def metric_position(self, metric):
+        """Axis-2 position of a metric name"""
+        if metric not in self._metric_pos:
+            raise ValueError(f"Invalid metric. Choose from {self.metrics}")
+        return self._metric_pos[metric]
+
+    def unit(self, unit):
+        """(T, 3) view of one unit"""
+        return self.values[:, self.unit_position(unit), :]
+
+    def metric(self, metric):
+        """(T, n_units) view of one metric across units"""
+        return self.values[:, :, self.metric_position(metric)]
+
+    def series(self, unit, metric):
+        """1-D view of one unit's metric"""
+        return self.values[:, self.unit_position(unit), self.metric_position(metric)]
+
+    def unit_frame(self, unit):
+        """DataFrame over the unit view (no copy), columns as in get_gta_data"""
+        return pd.DataFrame(self.unit(unit), index=self.index, columns=self.metrics, copy=False)
+
+    def metric_frame(self, metric):
+        """DataFrame of one metric with a column per unit (no copy)"""
+        return pd.DataFrame(self.metric(metric), index=self.index, columns=self.units, copy=False)
+
+    def long_frame(self):
+        """Long format (one row per timestamp and unit) with a categorical 'GTA' column
+
+        Same layout as stacking get_gta_data for every unit; built with one
+        reshape instead of per-unit copies and a concat.
+        """
+        n_time, n_units, n_metrics = self.values.shape
+        stacked = self.values.transpose(1, 0, 2).reshape(n_units * n_time, n_metrics)
+        index = self.index[np.tile(np.arange(n_time), n_units)]
+        frame = pd.DataFrame(stacked, index=index, columns=self.metrics)
+        frame['GTA'] = pd.Categorical.from_codes(
+            np.repeat(np.arange(n_units), n_time), categories=self.units)
+        return frame
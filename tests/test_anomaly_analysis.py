@@ -0,0 +1,79 @@
+"""
+AnomalyAnalyzer: temporal distribution of MP violations on and off the time grid,
+and the percentile option of the cleaned dataset
+"""
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from config import GTA_COLUMNS
+from data_loader import EnergyDataLoader
+from session import EnergyDataSession
+from anomaly_analysis import AnomalyAnalyzer
+
+
+def _analyzer(path, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return AnomalyAnalyzer(session=EnergyDataSession(EnergyDataLoader(str(path), **kwargs)))
+
+
+def _report(analyzer):
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        analyzer.analyze_temporal_distribution()
+    return output.getvalue()
+
+
+@pytest.fixture
+def energy_csv(tmp_path):
+    """MP above 100 t/h in slots 10-29 and 40-44; slots 20-23 have no rows"""
+    n_rows = 96
+    frame = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=n_rows, freq='15min')})
+    for hp_col, mp_col, ee_col in GTA_COLUMNS.values():
+        frame[hp_col] = 200.0
+        frame[mp_col] = 50.0
+        frame[ee_col] = 20.0
+    for _, mp_col, _ in GTA_COLUMNS.values():
+        frame.loc[list(range(10, 30)) + list(range(40, 45)), mp_col] = 150.0
+    frame = frame.drop(index=range(20, 24))
+    path = tmp_path / 'energy.csv'
+    frame.to_csv(path, index=False)
+    return path
+
+
+def test_temporal_distribution_uses_timestamps_off_grid(energy_csv):
+    on_grid = _report(_analyzer(energy_csv, use_cache=False))
+    off_grid = _report(_analyzer(energy_csv, use_cache=False, align_to_grid=False))
+
+    # On the grid the empty slots are NaN rows; off the grid they are missing
+    # rows, and the violations on both sides of them must not join up
+    for report in (on_grid, off_grid):
+        assert 'Total violations: 21 ' in report
+        assert 'Continuous violations: 18 ' in report
+        assert 'Violation periods: 3 (longest 0 days 02:15:00)' in report
+
+
+def test_extreme_outlier_option_uses_thresholds_of_the_original_data(tmp_path):
+    rng = np.random.default_rng(5)
+    n_rows = 3000
+    frame = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=n_rows, freq='15min')})
+    for hp_col, mp_col, ee_col in GTA_COLUMNS.values():
+        frame[hp_col] = rng.gamma(9.0, 30.0, n_rows)
+        frame[mp_col] = frame[hp_col] * rng.uniform(0.3, 0.6, n_rows)
+        frame[ee_col] = frame[hp_col] * 0.1
+    frame.loc[rng.choice(n_rows, 10, replace=False), GTA_COLUMNS['GTA_2'][1]] = np.nan
+    path = tmp_path / 'energy.csv'
+    frame.to_csv(path, index=False)
+    analyzer = _analyzer(path, use_cache=False)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned, _ = analyzer.create_cleaned_dataset(save=False)
+
+    data = analyzer.data
+    keep = np.ones(len(data), dtype=bool)
+    for hp_col, mp_col, _ in GTA_COLUMNS.values():
+        for col in (hp_col, mp_col):
+            keep &= (data[col] <= np.percentile(data[col].dropna(), 99.5)).to_numpy()
+    pd.testing.assert_frame_equal(cleaned, data[keep])
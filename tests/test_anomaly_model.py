@@ -0,0 +1,75 @@
+"""
+CompiledForest must score single rows exactly like IsolationForest.score_samples;
+a refit must only replace models of the same configuration
+"""
+
+import contextlib
+import io
+import os
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import IsolationForest
+from config import GTA_COLUMNS
+from data_loader import EnergyDataLoader
+from session import EnergyDataSession
+from anomaly_model import AnomalyModelService, CompiledForest
+
+
+def test_score_one_matches_score_samples():
+    rng = np.random.default_rng(0)
+    # Operational-like (HP, MP, EE) rows with a few far-out points
+    X = np.column_stack([rng.normal(300, 40, 2000),
+                         rng.normal(150, 25, 2000),
+                         rng.normal(40, 6, 2000)])
+    X[::97] *= 1.8
+    model = IsolationForest(n_estimators=100, max_samples=256, random_state=42).fit(X)
+    compiled = CompiledForest(model)
+
+    # Rows just above each root split in float64; in float32 about half of
+    # them fall on the other side, as scikit-learn sees them
+    edge = np.repeat(X[:1], model.n_estimators, axis=0)
+    for t, (tree, features) in enumerate(zip(model.estimators_, model.estimators_features_)):
+        edge[t, features[tree.tree_.feature[0]]] = np.nextafter(tree.tree_.threshold[0], np.inf)
+    X = np.vstack([X, edge])
+
+    batch = model.score_samples(X)
+    single = np.array([compiled.score_one(row) for row in X])
+    np.testing.assert_array_equal(single, batch)
+
+
+def test_score_one_missing_value_is_nan():
+    X = np.random.default_rng(1).normal(size=(300, 3))
+    compiled = CompiledForest(IsolationForest(n_estimators=10, random_state=0).fit(X))
+    assert np.isnan(compiled.score_one([0.0, np.nan, 1.0]))
+
+
+def _session(tmp_path, n_rows):
+    rng = np.random.default_rng(n_rows)
+    frame = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=n_rows, freq='15min')})
+    for hp_col, mp_col, ee_col in GTA_COLUMNS.values():
+        frame[hp_col] = rng.normal(300, 30, n_rows)
+        frame[mp_col] = frame[hp_col] * 0.5
+        frame[ee_col] = frame[hp_col] * 0.1
+    path = tmp_path / f'energy_{n_rows}.csv'
+    frame.to_csv(path, index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return EnergyDataSession(EnergyDataLoader(str(path), use_cache=False))
+
+
+def test_refit_keeps_models_of_other_configs(tmp_path):
+    model_dir = str(tmp_path / 'models')
+    session = _session(tmp_path, 400)
+    small = AnomalyModelService(session, model_dir=model_dir, n_estimators=10).fit()
+    large = AnomalyModelService(session, model_dir=model_dir, n_estimators=20).fit()
+    assert small.config_key() != large.config_key()
+
+    # New training data: only the n_estimators=10 models are replaced
+    refit = AnomalyModelService(_session(tmp_path, 500), model_dir=model_dir, n_estimators=10).fit()
+    for gta_name in GTA_COLUMNS:
+        assert refit.fit_report[gta_name]['status'] == 'fitted'
+        assert not os.path.exists(small.fit_report[gta_name]['path'])
+        assert os.path.exists(large.fit_report[gta_name]['path'])
+        assert os.path.exists(refit.fit_report[gta_name]['path'])
+
+    reloaded = AnomalyModelService(session, model_dir=model_dir, n_estimators=20).fit()
+    assert {info['status'] for info in reloaded.fit_report.values()} == {'loaded'}
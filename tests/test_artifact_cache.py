@@ -0,0 +1,41 @@
+"""
+source_hash must change when any project module changes, including ones only
+imported inside functions
+"""
+
+import importlib.util
+import pytest
+import artifact_cache
+from artifact_cache import source_hash
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    """A flat project directory whose `writer` module imports `helper` lazily"""
+    monkeypatch.setattr(artifact_cache, '_SOURCE_HASHES', {})
+    (tmp_path / 'helper.py').write_text("SCALE = 1\n")
+    (tmp_path / 'writer.py').write_text(
+        "def draw():\n    import helper\n    return helper.SCALE\n")
+    (tmp_path / 'notes.txt').write_text("not source\n")
+    spec = importlib.util.spec_from_file_location('writer', tmp_path / 'writer.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return tmp_path, module
+
+
+def test_function_level_import_changes_hash(project):
+    path, writer = project
+    before = source_hash(writer)
+    assert source_hash(writer) == before
+
+    (path / 'helper.py').write_text("SCALE = 2\n")
+    artifact_cache._SOURCE_HASHES.clear()
+    assert source_hash(writer) != before
+
+
+def test_non_python_files_are_ignored(project):
+    path, writer = project
+    before = source_hash(writer)
+    (path / 'notes.txt').write_text("edited\n")
+    artifact_cache._SOURCE_HASHES.clear()
+    assert source_hash(writer) == before
@@ -0,0 +1,54 @@
+"""
+PercentileFilter: thresholds from the original data, independent of column order
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from cleaning import PercentileFilter
+from quantiles import QuantileService
+
+UNITS = {'A': ['a_hp', 'a_mp'], 'B': ['b_hp', 'b_mp'], 'C': ['c_hp', 'c_mp']}
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(7)
+    columns = [col for cols in UNITS.values() for col in cols] + ['a_ee', 'b_ee', 'c_ee']
+    frame = pd.DataFrame(rng.gamma(4.0, 30.0, (5000, len(columns))), columns=columns,
+                         index=pd.date_range('2024-01-01', periods=5000, freq='15min'))
+    frame = frame.mask(rng.random(frame.shape) < 0.002)
+    return frame
+
+
+def _reference_keep(data, percentile=99.5):
+    keep = np.ones(len(data), dtype=bool)
+    for col in [col for cols in UNITS.values() for col in cols]:
+        keep &= (data[col] <= np.percentile(data[col].dropna(), percentile)).to_numpy()
+    return keep
+
+
+def test_drop_matches_thresholds_of_the_original_data(data):
+    filtered, report = PercentileFilter(UNITS).apply(data, mode='drop')
+
+    keep = _reference_keep(data)
+    pd.testing.assert_frame_equal(filtered, data[keep])
+    assert report['rows_removed'] == int((~keep).sum())
+    for col, threshold in report['thresholds'].items():
+        assert threshold == pytest.approx(np.percentile(data[col].dropna(), 99.5))
+
+
+@pytest.mark.parametrize('mode', ['drop', 'null'])
+def test_result_does_not_depend_on_column_order(data, mode):
+    units = {'A': ['a_ee', 'a_hp', 'a_mp'], 'B': ['b_ee', 'b_hp', 'b_mp'], 'C': ['c_ee', 'c_hp', 'c_mp']}
+    checked = {unit: columns[1:] for unit, columns in units.items()}
+    reordered = {unit: columns[::-1] for unit, columns in reversed(list(checked.items()))}
+
+    filtered, report = PercentileFilter(checked, gta_columns=units).apply(data, mode=mode)
+    shuffled = data[data.columns[::-1]]
+    other, other_report = PercentileFilter(reordered, quantiles=QuantileService(shuffled),
+                                           gta_columns=units).apply(shuffled, mode=mode)
+
+    pd.testing.assert_frame_equal(other[data.columns], filtered)
+    pd.testing.assert_frame_equal(other_report['by_column'].loc[report['by_column'].index],
+                                  report['by_column'])
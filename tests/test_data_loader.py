@@ -0,0 +1,180 @@
+"""
+EnergyDataLoader: per-GTA frames, duplicate policy, gaps on the time grid and the
+binary cache of the parsed CSV
+"""
+
+import contextlib
+import io
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from config import GTA_COLUMNS
+import data_loader
+from data_loader import EnergyDataLoader
+
+
+def write_csv(path, frame):
+    """Write `frame` as an energy export and return the path as a string"""
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def energy_frame(n_rows=96, start='2024-01-01', seed=0):
+    """`n_rows` 15-min records for every GTA column (3 decimals, as in the export)"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame({'Date': pd.date_range(start, periods=n_rows, freq='15min')})
+    for hp_col, mp_col, ee_col in GTA_COLUMNS.values():
+        frame[hp_col] = rng.normal(300, 30, n_rows)
+        frame[mp_col] = frame[hp_col] * 0.5
+        frame[ee_col] = frame[hp_col] * 0.1
+    return frame.round({col: 3 for col in frame.columns[1:]})
+
+
+def load(path, **kwargs):
+    """Quietly build a loader for `path` and load it"""
+    loader = EnergyDataLoader(str(path), **kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        loader.load_data()
+    return loader
+
+
+def test_gta_data_is_a_writable_float64_copy(tmp_path):
+    loader = load(write_csv(tmp_path / 'energy.csv', energy_frame()), use_cache=False)
+    hp_col = GTA_COLUMNS['GTA_1'][0]
+
+    gta_data = loader.get_gta_data('GTA_1')
+    assert list(gta_data.columns) == ['HP_Admission', 'MP_Extraction', 'Energy_Production']
+    assert (gta_data.dtypes == np.float64).all()
+    np.testing.assert_array_equal(gta_data['HP_Admission'], loader.data[hp_col])
+
+    gta_data.iloc[0, 0] = -1.0
+    assert loader.data[hp_col].iloc[0] != -1.0
+
+    view = loader.get_gta_data('GTA_1', view=True)
+    assert (view.dtypes == np.float32).all()
+    with pytest.raises(ValueError):
+        view.to_numpy()[0, 0] = -1.0
+
+
+def test_duplicate_policy_on_load(tmp_path):
+    frame = energy_frame(8)
+    repeated = pd.concat([frame, frame.iloc[[3]].assign(**{GTA_COLUMNS['GTA_1'][0]: -5.0})])
+    path = write_csv(tmp_path / 'energy.csv', repeated)
+
+    loader = load(path, use_cache=False)
+    assert len(loader.data) == 8
+    assert loader.data[GTA_COLUMNS['GTA_1'][0]].iloc[3] == frame[GTA_COLUMNS['GTA_1'][0]].iloc[3]
+    assert loader.gap_report['duplicate_rows'] == 1
+
+    with pytest.raises(ValueError, match='repeat a timestamp'):
+        load(path, use_cache=False, duplicates='raise')
+
+
+def test_append_fills_skipped_slots_and_applies_duplicate_policy(tmp_path):
+    frame = energy_frame(12)
+    path = write_csv(tmp_path / 'energy.csv', frame.iloc[:8])
+    loader = load(path, use_cache=False)
+    loader.get_store()
+
+    # Rows 9 and 10 skip slot 8; row 7 repeats an existing slot
+    added = loader.append(frame.iloc[[7, 9, 10]])
+    assert added == 3
+    assert len(loader.data) == len(loader.get_store().values) == 11
+    assert loader.data.iloc[8].isna().all()
+    np.testing.assert_array_equal(loader.data.iloc[9:].to_numpy(), frame.iloc[9:11, 1:].to_numpy())
+    assert loader.gap_report['missing_slots'] == 1
+    assert loader.gap_report['duplicate_rows'] == 1
+    assert loader.gap_report['gaps']['start'].iloc[-1] == frame['Date'].iloc[8]
+
+    strict = load(path, use_cache=False, duplicates='raise')
+    with pytest.raises(ValueError, match='repeat a timestamp'):
+        strict.append(frame.iloc[[7, 8]])
+
+
+@pytest.fixture
+def cached_csv(tmp_path, monkeypatch):
+    """A CSV whose cache has been written, and a counter of SHA-256 computations"""
+    path = write_csv(tmp_path / 'energy.csv', energy_frame(20))
+    hashes = []
+    original = data_loader.file_sha256
+
+    def counting_sha256(filepath, *args):
+        hashes.append(filepath)
+        return original(filepath, *args)
+
+    monkeypatch.setattr(data_loader, 'file_sha256', counting_sha256)
+    load(path)
+    hashes.clear()
+    return path, hashes
+
+
+def _load_reporting_cache(path, **kwargs):
+    """(loader, whether the cache was used)"""
+    loader = EnergyDataLoader(path)
+    output = io.StringIO()
+    with contextlib.redirect_stdout(output):
+        loader.load_data(**kwargs)
+    return loader, '(cached:' in output.getvalue()
+
+
+def _move_mtime(path, seconds=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10**9))
+
+
+def test_cache_reused_without_hashing_when_size_and_mtime_match(cached_csv):
+    path, hashes = cached_csv
+    loader, cached = _load_reporting_cache(path)
+    assert cached
+    assert hashes == []
+    pd.testing.assert_frame_equal(loader.data, load(path, use_cache=False).data)
+
+
+def test_size_change_rebuilds(cached_csv):
+    path, hashes = cached_csv
+    with open(path, 'a') as f:
+        f.write(energy_frame(21).iloc[[20]].to_csv(header=False, index=False))
+
+    loader, cached = _load_reporting_cache(path)
+    assert not cached
+    assert len(loader.data) == 21
+    # Only the rewrite hashes the file, no content check was needed
+    assert len(hashes) == 1
+    assert _load_reporting_cache(path)[1]
+
+
+def test_touch_checks_sha_and_reuses(cached_csv):
+    path, hashes = cached_csv
+    _move_mtime(path)
+
+    _, cached = _load_reporting_cache(path)
+    assert cached
+    assert len(hashes) == 1
+    # The refreshed metadata trusts the new mtime again
+    hashes.clear()
+    assert _load_reporting_cache(path)[1]
+    assert hashes == []
+
+
+def test_same_size_edit_fails_sha_and_rebuilds(cached_csv):
+    path, hashes = cached_csv
+    with open(path) as f:
+        text = f.read()
+    header, first, rest = text.split('\n', 2)
+    edited = first[:-1] + ('1' if first[-1] != '1' else '2')
+    with open(path, 'w') as f:
+        f.write('\n'.join([header, edited, rest]))
+    _move_mtime(path)
+
+    loader, cached = _load_reporting_cache(path)
+    assert not cached
+    assert loader.data.iloc[0, -1] == float(edited.split(',')[-1])
+
+
+def test_rebuild_cache_forces_parse(cached_csv):
+    path, hashes = cached_csv
+    _, cached = _load_reporting_cache(path, rebuild_cache=True)
+    assert not cached
+    assert len(hashes) == 1
+    assert _load_reporting_cache(path)[1]
@@ -0,0 +1,83 @@
+"""
+Missing HP is unknown: neither operational nor down, and not part of uptime
+"""
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from config import GTA_COLUMNS
+from data_loader import EnergyDataLoader
+from session import EnergyDataSession
+from downtime_analysis import DowntimeAnalyzer
+
+HP = {gta_name: columns[0] for gta_name, columns in GTA_COLUMNS.items()}
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    """One day of data: GTA_1 down in slots 20-39 with a missing sample inside,
+    missing HP at slots 50-51 and a grid gap (slots 60-63) for every GTA"""
+    n_rows = 96
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=n_rows, freq='15min')})
+    for hp_col, mp_col, ee_col in GTA_COLUMNS.values():
+        frame[hp_col] = rng.normal(300, 20, n_rows)
+        frame[mp_col] = frame[hp_col] * 0.5
+        frame[ee_col] = frame[hp_col] * 0.1
+    frame.loc[20:39, HP['GTA_1']] = 2.0
+    frame.loc[30, HP['GTA_1']] = np.nan
+    frame.loc[39:40, HP['GTA_1']] = np.nan
+    frame.loc[50:51, list(HP.values())] = np.nan
+    frame = frame.drop(index=range(60, 64))
+
+    path = tmp_path / 'energy.csv'
+    frame.to_csv(path, index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        session = EnergyDataSession(EnergyDataLoader(str(path), use_cache=False))
+    return DowntimeAnalyzer(10, session=session)
+
+
+def test_missing_samples_are_neither_state(analyzer):
+    states = analyzer.detect_operational_states()
+    assert len(states) == 96
+    for gta_name, hp_col in HP.items():
+        missing = analyzer.data[hp_col].isna().to_numpy()
+        assert not (states[f'{gta_name}_operational'].to_numpy() & missing).any()
+        assert not (states[f'{gta_name}_down'].to_numpy() & missing).any()
+        assert ((states[f'{gta_name}_operational'] | states[f'{gta_name}_down']).to_numpy()
+                == ~missing).all()
+
+
+def test_uptime_is_over_measured_records(analyzer):
+    with contextlib.redirect_stdout(io.StringIO()):
+        uptime_stats, _ = analyzer.calculate_uptime_statistics()
+
+    gta_1 = uptime_stats['GTA_1']
+    # 4 grid slots + 2 missing HP for every GTA, plus slots 30, 39 and 40 for GTA_1
+    assert gta_1['missing_records'] == 9
+    assert gta_1['downtime_records'] == 18
+    assert gta_1['operational_records'] == 96 - 9 - 18
+    assert gta_1['uptime_pct'] == pytest.approx(69 / 87 * 100)
+    assert uptime_stats['GTA_2']['missing_records'] == 6
+    assert uptime_stats['GTA_2']['uptime_pct'] == pytest.approx(100.0)
+
+
+def test_downtime_period_bridges_inner_gap_only(analyzer):
+    periods = analyzer.downtime_intervals().for_unit('GTA_1')
+    assert len(periods) == 1
+    # Slot 30 is inside the period; slots 39-40 trail it and are left out
+    assert periods['start'].iloc[0] == analyzer.data.index[20]
+    assert periods['end'].iloc[0] == analyzer.data.index[38]
+    assert periods['n_samples'].iloc[0] == 19
+
+
+def test_cleaned_dataset_drops_unmeasured_rows(analyzer):
+    with contextlib.redirect_stdout(io.StringIO()):
+        cleaned = analyzer.create_cleaned_dataset()
+
+    unmeasured = analyzer.data[list(HP.values())].isna().all(axis=1)
+    assert len(cleaned) == 96 - int(unmeasured.sum())
+    assert not cleaned.index.isin(analyzer.data.index[unmeasured]).any()
+    assert not cleaned.isna().any().any()
@@ -0,0 +1,56 @@
+"""
+DowntimeSweep rows must equal what DowntimeAnalyzer reports for the same threshold
+"""
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from config import GTA_COLUMNS
+from data_loader import EnergyDataLoader
+from session import EnergyDataSession
+from downtime_analysis import DowntimeAnalyzer
+
+
+@pytest.fixture(scope='module')
+def session(tmp_path_factory):
+    """Two weeks of 15-min data with on/off cycles, grid gaps and missing HP"""
+    rng = np.random.default_rng(0)
+    dates = pd.date_range('2024-01-01', periods=96 * 14, freq='15min')
+    frame = pd.DataFrame({'Date': dates})
+    for u, (hp_col, mp_col, ee_col) in enumerate(GTA_COLUMNS.values()):
+        running = (np.arange(len(dates)) // (37 + 11 * u)) % 3 != 0
+        hp = np.where(running, rng.normal(300, 30, len(dates)), rng.uniform(0, 15, len(dates)))
+        hp[rng.choice(len(dates), 20, replace=False)] = np.nan
+        frame[hp_col] = hp
+        frame[mp_col] = hp * 0.5
+        frame[ee_col] = hp * 0.1
+    # Empty grid slots, including some inside downtime periods
+    frame = frame.drop(index=list(range(40, 44)) + list(range(500, 509)) + [900])
+
+    path = tmp_path_factory.mktemp('data') / 'energy.csv'
+    frame.to_csv(path, index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        return EnergyDataSession(EnergyDataLoader(str(path), use_cache=False))
+
+
+@pytest.mark.parametrize('low_threshold', [5, 10, 12.5])
+def test_sweep_row_matches_analyzer(session, low_threshold):
+    analyzer = DowntimeAnalyzer(low_threshold, session=session)
+    with contextlib.redirect_stdout(io.StringIO()):
+        uptime_stats, _ = analyzer.calculate_uptime_statistics()
+    intervals = analyzer.downtime_intervals()
+    tables = analyzer.sweep_thresholds([low_threshold])
+
+    for gta_name in GTA_COLUMNS:
+        row = tables[gta_name].iloc[0]
+        stats = uptime_stats[gta_name]
+        periods = intervals.for_unit(gta_name)
+
+        assert row['uptime_pct'] == pytest.approx(stats['uptime_pct'])
+        assert row['operational_records'] == stats['operational_records']
+        assert row['downtime_records'] == stats['downtime_records']
+        assert row['downtime_periods'] == len(periods)
+        assert row['longest_outage'] == periods['duration'].max()
+        assert row['longest_outage_samples'] == periods['n_samples'].max()
@@ -0,0 +1,105 @@
+"""
+StateIntervals and bridge_unknown must match simple loops over the samples
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from intervals import StateIntervals, bridge_unknown
+
+@pytest.fixture
+def states():
+    rng = np.random.default_rng(2)
+    n_rows = 500
+    # Runs of random length, one unit never on and one always on
+    mask = np.repeat(rng.random((n_rows // 5, 2)) < 0.4, 5, axis=0)
+    mask ^= rng.random(mask.shape) < 0.05
+    # Irregular sampling: mostly 15 minutes, some longer gaps
+    steps = np.where(rng.random(n_rows) < 0.05, 60, 15)
+    index = pd.Timestamp('2024-01-01') + pd.to_timedelta(np.cumsum(steps) - steps[0], unit='min')
+    return pd.DataFrame({'A': mask[:, 0], 'B': False, 'C': True, 'D': mask[:, 1]}, index=index)
+
+
+def _runs(column):
+    """(start, stop) row positions of the True runs, stop exclusive"""
+    runs, start = [], None
+    for i, value in enumerate(column):
+        if value and start is None:
+            start = i
+        elif not value and start is not None:
+            runs.append((start, i))
+            start = None
+    if start is not None:
+        runs.append((start, len(column)))
+    return runs
+
+
+def test_intervals_match_loop(states):
+    intervals = StateIntervals.from_states(states)
+    index = states.index
+    after_last = index[-1] + (index[-1] - index[-2])
+
+    total = 0
+    for unit in states.columns:
+        runs = _runs(states[unit].to_numpy())
+        table = intervals.for_unit(unit)
+        total += len(runs)
+        assert len(table) == len(runs)
+        assert (table['unit'] == unit).all()
+        for row, (start, stop) in zip(table.itertuples(), runs):
+            assert row.start == index[start]
+            assert row.end == index[stop - 1]
+            assert row.stop == (index[stop] if stop < len(index) else after_last)
+            assert row.n_samples == stop - start
+            assert row.duration == index[stop - 1] - index[start]
+    assert len(intervals) == total
+
+
+def test_queries_match_loop(states):
+    intervals = StateIntervals.from_states(states)
+    table = intervals.table()
+    rng = np.random.default_rng(3)
+    span = states.index[-1] - states.index[0]
+
+    for _ in range(50):
+        ts = states.index[0] + span * rng.uniform(-0.05, 1.05)
+        expected = sorted(set(table.loc[(table['start'] <= ts) & (table['stop'] > ts), 'unit']))
+        assert sorted(intervals.active_at(ts)) == expected
+
+        a, b = sorted(states.index[0] + span * rng.uniform(-0.05, 1.05, 2))
+        hits = table[(table['stop'] > a) & (table['start'] <= b)]
+        found = intervals.overlapping(a, b)
+        assert sorted(zip(found['unit'], found['start'])) == sorted(zip(hits['unit'], hits['start']))
+
+    for minimum in ('0min', '1h', '3h'):
+        long = intervals.longer_than(minimum)
+        assert len(long) == int((table['duration'] > pd.Timedelta(minimum)).sum())
+        assert len(intervals.longer_than(minimum, unit='D')) == int(
+            ((table['duration'] > pd.Timedelta(minimum)) & (table['unit'] == 'D')).sum())
+
+
+def _bridge_loop(mask, known):
+    out = mask.copy()
+    n_rows, n_units = mask.shape
+    for u in range(n_units):
+        for i in range(n_rows):
+            if known[i, u]:
+                continue
+            before = [j for j in range(i - 1, -1, -1) if known[j, u]]
+            after = [j for j in range(i + 1, n_rows) if known[j, u]]
+            out[i, u] = bool(before and after and mask[before[0], u] and mask[after[0], u])
+    return out
+
+
+def test_bridge_unknown_matches_loop():
+    rng = np.random.default_rng(4)
+    mask = np.repeat(rng.random((60, 4)) < 0.5, 4, axis=0)
+    known = rng.random(mask.shape) < 0.7
+    known[:10, 0] = False          # unknown at the start
+    known[-10:, 1] = False         # unknown at the end
+    known[:, 2] = False            # never known
+    # What unknown samples hold must not matter
+    noisy = np.where(known, mask, rng.random(mask.shape) < 0.5)
+
+    np.testing.assert_array_equal(bridge_unknown(noisy, known), _bridge_loop(noisy, known))
+    np.testing.assert_array_equal(bridge_unknown(noisy, np.ones_like(known)), noisy)
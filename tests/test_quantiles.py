@@ -0,0 +1,63 @@
+"""
+QuantileService is exact; KLLSketch stays within its documented rank error
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from quantiles import KLLSketch, QuantileService
+
+PERCENTILES = [0, 0.5, 1, 5, 10, 25, 50, 75, 90, 95, 99, 99.5, 100]
+
+
+def _rank_error(sorted_values, value, q):
+    """Distance between q and the range of ranks `value` holds in the data"""
+    n = len(sorted_values)
+    low = np.searchsorted(sorted_values, value, side='left') / n
+    high = np.searchsorted(sorted_values, value, side='right') / n
+    return max(low - q, q - high, 0.0)
+
+
+def test_exact_percentiles_match_numpy():
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({'normal': rng.normal(100, 20, 4001),
+                         'ties': np.round(rng.exponential(5, 4001)),
+                         'short': np.r_[7.5, np.full(4000, np.nan)],
+                         'empty': np.full(4001, np.nan)})
+    data.loc[rng.random(4001) < 0.1, 'normal'] = np.nan
+    quantiles = QuantileService(data)
+
+    for col in ('normal', 'ties', 'short'):
+        expected = np.percentile(data[col].dropna(), PERCENTILES)
+        np.testing.assert_array_equal(quantiles.percentile(col, PERCENTILES), expected)
+        assert quantiles.percentile(col, 99.5) == np.percentile(data[col].dropna(), 99.5)
+    assert np.isnan(quantiles.percentile('empty', 50))
+    assert np.isnan(quantiles.percentile('empty', PERCENTILES)).all()
+
+
+@pytest.mark.parametrize('k', [100, 200])
+def test_kll_rank_error_within_bound(k):
+    rng = np.random.default_rng(1)
+    # Skewed, with NaN that the sketch must ignore
+    values = np.concatenate([rng.lognormal(3, 1, 150_000), rng.normal(300, 10, 50_000)])
+    rng.shuffle(values)
+    values[rng.random(len(values)) < 0.01] = np.nan
+    valid = np.sort(values[~np.isnan(values)])
+    bound = 1.7 / k
+
+    single = KLLSketch(k, seed=0)
+    for chunk in np.array_split(values, 37):
+        single.update(chunk)
+
+    # Uneven parts (like months or sites), merged in a mixed order
+    parts = [KLLSketch(k, seed=s).update(chunk)
+             for s, chunk in enumerate(np.array_split(values, [1000, 60_000, 61_000, 150_000]))]
+    merged = parts[2].merge(parts[0]).merge(parts[4]).merge(parts[1].merge(parts[3]))
+
+    for sketch in (single, merged):
+        assert sketch.count == len(valid)
+        assert sketch.size < 4 * k
+        assert sketch.quantile(0) == valid[0]
+        assert sketch.quantile(100) == valid[-1]
+        for p in PERCENTILES:
+            assert _rank_error(valid, sketch.quantile(p), p / 100) <= bound, p
@@ -0,0 +1,37 @@
+"""
+Robust scale must estimate sigma on Gaussian noise, and streaming must score like batch
+"""
+
+import numpy as np
+import pytest
+from rolling_detector import RollingAnomalyDetector
+
+
+@pytest.mark.parametrize('window, hop', [(96, 1), (96, 4), (96, 8), (240, 12)])
+def test_robust_scale_on_gaussian_noise(window, hop):
+    sigma = 20.0
+    values = np.random.default_rng(3).normal(300, sigma, (window * 300, 2, 3))
+    detector = RollingAnomalyDetector(window=window, hop=hop, min_scale=0.0)
+    location, scale = detector.robust_baseline(values)
+
+    assert np.nanmean(scale) / sigma == pytest.approx(1.0, abs=0.03)
+    assert np.nanmean(location) == pytest.approx(300, abs=0.5)
+
+
+def test_streaming_matches_batch():
+    rng = np.random.default_rng(4)
+    # Level shifts, a flat shutdown stretch and missing samples
+    values = rng.normal(300, 20, (700, 3, 3))
+    values[250:330] = 0.0
+    values[400:] += 60
+    values[rng.random(values.shape) < 0.03] = np.nan
+    values[500:520, 1] = np.nan
+
+    detector = RollingAnomalyDetector(window=48, hop=4, alpha=0.1)
+    batch = detector.score(values)
+    stream = detector.stream(3, 3)
+    streamed = [stream.update(sample) for sample in values]
+
+    for name in ('robust', 'ewma'):
+        np.testing.assert_allclose(np.stack([s[name] for s in streamed]), batch[name],
+                                   rtol=1e-9, atol=1e-9)
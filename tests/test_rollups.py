@@ -0,0 +1,81 @@
+"""
+RollupStore: appended rollups equal a full rebuild; range aggregates equal pandas
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from rollups import RollupStore
+from unit_store import METRICS
+
+UNITS = ['GTA_1', 'GTA_2', 'GTA_3']
+STEP = pd.Timedelta(minutes=15)
+
+
+@pytest.fixture(scope='module')
+def samples():
+    """Four months of 15-min (T, unit, metric) values with missing samples"""
+    rng = np.random.default_rng(9)
+    index = pd.date_range('2024-01-29 13:00', '2024-05-20 08:45', freq=STEP)
+    values = rng.gamma(4.0, 40.0, (len(index), len(UNITS), len(METRICS)))
+    values[rng.random(values.shape) < 0.02] = np.nan
+    values[3000:3100, 1] = np.nan
+    return index, values
+
+
+def _wide(index, values):
+    """Columns as in RollupStore: '<unit>_<metric>', then totals (NaN if any unit is)"""
+    frame = pd.DataFrame(values.reshape(len(index), -1), index=index,
+                         columns=[f'{u}_{m}' for u in UNITS for m in METRICS])
+    for m, metric in enumerate(METRICS):
+        frame[f'Total_{metric}'] = values[:, :, m].sum(axis=1)
+    return frame
+
+
+def test_updates_match_full_build(samples):
+    index, values = samples
+    full = RollupStore(index, values, UNITS, step=STEP)
+
+    # Cuts inside an hour, a day, a week and a month, and a single-row update
+    cuts = [0, 2000, 2001, 2003, 2050, 4500, 7000, len(index)]
+    store = RollupStore(index[:cuts[1]], values[:cuts[1]], UNITS, step=STEP)
+    for lo, hi in zip(cuts[1:-1], cuts[2:]):
+        store.update(index[lo:hi], values[lo:hi])
+
+    for name, level in full.levels.items():
+        built = store.levels[name]
+        assert len(built) == len(level), name
+        for attr in ('start', 'stop', 'count', 'min', 'max'):
+            np.testing.assert_array_equal(getattr(built, attr), getattr(level, attr), err_msg=name)
+        for attr in ('sum', 'sumsq'):
+            np.testing.assert_allclose(getattr(built, attr), getattr(level, attr), rtol=1e-12)
+
+
+def test_aggregate_matches_pandas_on_random_ranges(samples):
+    index, values = samples
+    store = RollupStore(index, values, UNITS, step=STEP)
+    wide = _wide(index, values)
+    rng = np.random.default_rng(10)
+    span = index[-1] - index[0]
+
+    ranges = [(None, None), (None, index[100]), (index[-100], None),
+              (index[0] - pd.Timedelta(days=3), index[0] - pd.Timedelta(days=1)),
+              (index[500], index[500])]
+    for _ in range(40):
+        a, b = (index[0] + span * f for f in sorted(rng.uniform(-0.02, 1.02, 2)))
+        if rng.random() < 0.5:
+            a, b = a.floor('15min'), b.floor('15min')
+        ranges.append((a, b))
+
+    for start, end in ranges:
+        result = store.aggregate(start, end)
+        window = wide.loc[start:end]
+        assert (result['count'] == window.count()).all(), (start, end)
+        np.testing.assert_allclose(result['sum'], window.sum(), rtol=1e-9, atol=1e-6)
+        np.testing.assert_allclose(result['mean'], window.mean(), rtol=1e-9)
+        np.testing.assert_allclose(result['std'], window.std(), rtol=1e-6)
+        np.testing.assert_array_equal(result['min'], window.min())
+        np.testing.assert_array_equal(result['max'], window.max())
+
+    one = store.aggregate(index[10], index[900], columns='GTA_2_MP_Extraction')
+    assert one.loc['GTA_2_MP_Extraction', 'count'] == wide.loc[index[10]:index[900], 'GTA_2_MP_Extraction'].count()
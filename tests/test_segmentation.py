@@ -0,0 +1,41 @@
+"""
+Segments must tile each unit's history, and an empty history gives an empty table
+"""
+
+import numpy as np
+import pandas as pd
+from segmentation import RegimeSegmenter
+
+UNITS = ['GTA_1', 'GTA_2']
+
+
+def test_segments_tile_history_and_find_level_shift():
+    rng = np.random.default_rng(0)
+    index = pd.date_range('2024-01-01', periods=600, freq='15min')
+    values = rng.normal(300, 5, (600, 2, 3))
+    values[350:, 0] += 80
+    values[rng.random(values.shape) < 0.02] = np.nan
+
+    segmentation = RegimeSegmenter(min_size=48).fit(index, values, UNITS)
+    for unit in UNITS:
+        table = segmentation.for_unit(unit)
+        assert table['n_samples'].sum() == len(index)
+        assert table['start'].iloc[0] == index[0]
+        assert table['end'].iloc[-1] == index[-1]
+        assert (table['start'].iloc[1:].to_numpy() == table['stop'].iloc[:-1].to_numpy()).all()
+
+    assert index[350] in set(segmentation.for_unit('GTA_1')['start'])
+    assert len(segmentation.for_unit('GTA_2')) == 1
+
+
+def test_empty_history_gives_empty_table():
+    index = pd.DatetimeIndex([], name='Date')
+    segmentation = RegimeSegmenter(min_size=4).fit(index, np.zeros((0, 2, 3)), UNITS)
+
+    assert len(segmentation) == 0
+    for table in (segmentation.table(), segmentation.for_unit('GTA_1')):
+        assert table.empty
+        assert list(table.columns) == ['unit', 'segment', 'start', 'end', 'stop', 'n_samples',
+                                       'duration', 'HP_Admission_mean', 'MP_Extraction_mean',
+                                       'Energy_Production_mean']
+    assert segmentation.labels().shape == (0, 2)
@@ -0,0 +1,77 @@
+"""
+HysteresisStateDetector: detect, update_batch and update give identical states and events
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from state_machine import HysteresisStateDetector
+
+UNITS = ['GTA_1', 'GTA_2', 'GTA_3']
+
+
+@pytest.fixture
+def hp():
+    """HP hovering around the thresholds, with dropouts and missing samples"""
+    rng = np.random.default_rng(6)
+    n_rows = 3000
+    level = np.repeat(rng.choice([0.0, 12.0, 40.0, 300.0], (n_rows // 20, 3)), 20, axis=0)
+    values = level + rng.normal(0, 4, level.shape)
+    values[rng.random(values.shape) < 0.03] = np.nan
+    values[1000:1010, 1] = np.nan
+    index = pd.date_range('2024-01-01', periods=n_rows, freq='15min')
+    return index, values
+
+
+def _streamed(detector, index, values):
+    detector.reset()
+    states, events = [], []
+    for ts, row in zip(index, values):
+        events += detector.update(ts, row)
+        states.append(detector.state.copy())
+    return np.array(states), events
+
+
+def _chunked(detector, index, values, bounds):
+    detector.reset()
+    states, events = [], []
+    for lo, hi in zip(bounds[:-1], bounds[1:]):
+        chunk_states, chunk_events = detector.update_batch(index[lo:hi], values[lo:hi])
+        states.append(chunk_states)
+        events += chunk_events
+    return np.vstack(states), events
+
+
+@pytest.mark.parametrize('params', [
+    dict(),
+    dict(on_threshold=15, off_threshold=15, min_on_samples=1, min_off_samples=1),
+    dict(on_threshold=20, off_threshold=5, min_on_samples=6, min_off_samples=2),
+    dict(initial_state=True, min_on_samples=3, min_off_samples=8),
+])
+def test_batch_streaming_and_chunks_agree(hp, params):
+    index, values = hp
+    detector = HysteresisStateDetector(UNITS, **params)
+    states, events = detector.detect(index, values)
+    events = events.to_dict('records')
+
+    streamed_states, streamed_events = _streamed(detector, index, values)
+    np.testing.assert_array_equal(streamed_states, states.to_numpy())
+    assert streamed_events == events
+
+    # Chunk boundaries inside dwell runs, single-row and empty chunks
+    rng = np.random.default_rng(7)
+    bounds = np.unique(np.concatenate([[0, 1, 1, 2, 5, len(index)],
+                                       rng.integers(0, len(index), 60)]))
+    bounds = np.sort(np.concatenate([bounds, [500, 500]]))
+    chunked_states, chunked_events = _chunked(detector, index, values, bounds)
+    np.testing.assert_array_equal(chunked_states, states.to_numpy())
+    assert chunked_events == events
+
+
+def test_no_hysteresis_is_the_threshold_rule(hp):
+    index, values = hp
+    detector = HysteresisStateDetector(UNITS, on_threshold=10, off_threshold=10,
+                                       min_on_samples=1, min_off_samples=1)
+    states, _ = detector.detect(index, values)
+    with np.errstate(invalid='ignore'):
+        np.testing.assert_array_equal(states.to_numpy(), values > 10)
@@ -0,0 +1,118 @@
+"""
+Appended rows: the live statistics, array store and session memos must match a full rebuild
+"""
+
+import contextlib
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from config import GTA_COLUMNS
+from data_loader import EnergyDataLoader
+from session import EnergyDataSession
+from downtime_analysis import DowntimeAnalyzer
+from streaming import EnergyAccumulator
+
+N_ROWS = 960
+N_LOADED = 600
+
+
+@pytest.fixture
+def frame():
+    """Ten days with shutdowns, constraint violations, missing values and empty slots"""
+    rng = np.random.default_rng(8)
+    frame = pd.DataFrame({'Date': pd.date_range('2024-01-01', periods=N_ROWS, freq='15min')})
+    for u, (hp_col, mp_col, ee_col) in enumerate(GTA_COLUMNS.values()):
+        running = (np.arange(N_ROWS) // (50 + 13 * u)) % 4 != 0
+        frame[hp_col] = np.where(running, rng.normal(190, 40, N_ROWS), rng.uniform(0, 8, N_ROWS))
+        frame[mp_col] = frame[hp_col] * rng.uniform(0.3, 0.6, N_ROWS)
+        frame[ee_col] = frame[hp_col] * 0.25
+    values = frame.columns[1:]
+    frame[values] = frame[values].mask(rng.random((N_ROWS, len(values))) < 0.01)
+    return frame.drop(index=[100, 101, 700, 701, 702])
+
+
+def _quiet(fn, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return fn(*args, **kwargs)
+
+
+@pytest.fixture
+def loaders(tmp_path, frame):
+    """(loader fed by append() in chunks, loader of the full file)"""
+    first, rest = frame[frame.index < N_LOADED], frame[frame.index >= N_LOADED]
+    first.to_csv(tmp_path / 'first.csv', index=False)
+    frame.to_csv(tmp_path / 'full.csv', index=False)
+
+    appended = EnergyDataLoader(str(tmp_path / 'first.csv'), use_cache=False)
+    _quiet(appended.load_data)
+    appended.get_live_stats()
+    appended.get_store()
+    # Uneven chunks, one of them crossing the empty slots and one repeating rows
+    for lo, hi in [(0, 1), (1, 90), (90, 130), (125, 250), (250, len(rest))]:
+        appended.append(rest.iloc[lo:hi])
+
+    full = EnergyDataLoader(str(tmp_path / 'full.csv'), use_cache=False)
+    _quiet(full.load_data)
+    return appended, full
+
+
+def test_appended_data_matches_full_load(loaders):
+    appended, full = loaders
+    pd.testing.assert_frame_equal(appended.data, full.data, check_freq=False)
+    np.testing.assert_array_equal(appended.get_store().values, full.get_store().values)
+    assert appended.get_store().index.equals(full.get_store().index)
+
+
+def test_live_statistics_match_full_rebuild(loaders):
+    appended, full = loaders
+    live = appended.get_live_stats()
+
+    basic, expected = live.get_basic_stats(), full.get_basic_stats()
+    assert basic['total_records'] == expected['total_records']
+    assert basic['date_range'] == expected['date_range']
+    assert basic['missing_values'] == expected['missing_values']
+    assert basic['data_shape'] == expected['data_shape']
+
+    report, expected = live.validate_constraints(), _quiet(full.validate_constraints)
+    for gta_name in GTA_COLUMNS:
+        for key in ('hp_violations', 'mp_violations', 'ee_violations'):
+            assert report[gta_name][key] == expected[gta_name][key]
+        for key in ('hp_range', 'mp_range', 'ee_range'):
+            np.testing.assert_allclose(report[gta_name][key], expected[gta_name][key])
+
+    summary = live.system_totals_summary()
+    described = full.calculate_system_totals().describe().loc[summary.index]
+    np.testing.assert_allclose(summary.to_numpy(), described.to_numpy(), rtol=1e-10)
+
+    uptime = live.uptime_statistics(10)
+    expected, _ = _quiet(DowntimeAnalyzer(10, session=EnergyDataSession(full)).calculate_uptime_statistics)
+    for gta_name in GTA_COLUMNS:
+        for key, value in expected[gta_name].items():
+            assert uptime[gta_name][key] == pytest.approx(value)
+
+    # One update over everything gives the same accumulator
+    rebuilt = EnergyAccumulator(list(full.data.columns), GTA_COLUMNS)
+    rebuilt.update(full.data.index, full.data.to_numpy(dtype=np.float64))
+    np.testing.assert_array_equal(live.stats.count, rebuilt.stats.count)
+    np.testing.assert_allclose(live.stats.mean, rebuilt.stats.mean, rtol=1e-12)
+    np.testing.assert_allclose(live.stats.m2, rebuilt.stats.m2, rtol=1e-9)
+    np.testing.assert_array_equal(live.violation_counts, rebuilt.violation_counts)
+
+
+def test_append_drops_stale_session_memos(tmp_path, frame):
+    frame[frame.index < N_LOADED].to_csv(tmp_path / 'first.csv', index=False)
+    session = _quiet(EnergyDataSession, EnergyDataLoader(str(tmp_path / 'first.csv'), use_cache=False))
+    hp_col = GTA_COLUMNS['GTA_1'][0]
+    before = session.quantiles().percentile(hp_col, 100)
+    fingerprint = session.fingerprint()
+
+    rows = frame[frame.index >= N_LOADED].iloc[:10].copy()
+    rows[hp_col] = 1000.0
+    session.loader.append(rows)
+
+    assert len(session.data) == len(session.loader.data)
+    assert session.quantiles().percentile(hp_col, 100) == 1000.0 != before
+    assert session.fingerprint() != fingerprint
+    states = DowntimeAnalyzer(10, session=session).detect_operational_states()
+    assert len(states) == len(session.data)
@@ -0,0 +1,78 @@
+"""
+ThresholdSweep counts and the _max_windows stack must equal brute-force scans
+"""
+
+import numpy as np
+import pytest
+from threshold_sweep import ThresholdSweep, _max_windows
+
+
+def _brute_force(column, threshold, op):
+    """Violating rows and runs of consecutive violating rows in one column"""
+    n_violating = n_runs = 0
+    previous = False
+    for x in column:
+        violating = (x > threshold) if op == '>' else (x < threshold)   # NaN never violates
+        n_violating += violating
+        n_runs += violating and not previous
+        previous = violating
+    return n_violating, n_runs
+
+
+@pytest.mark.parametrize('op', ['>', '<'])
+def test_sweep_matches_brute_force(op):
+    rng = np.random.default_rng(11)
+    # Rounded values so thresholds hit ties; NaN alone and in runs
+    values = np.round(rng.normal(100, 30, (2000, 3)))
+    values[rng.random(values.shape) < 0.05] = np.nan
+    values[500:520, 1] = np.nan
+    values[:, 2] = np.where(np.arange(2000) % 50 < 25, values[:, 2], 0.0)
+    thresholds = np.concatenate([[-1e9, 0.0, 1e9], np.arange(20.0, 181.0, 7.0), values[:5, 0]])
+    thresholds = thresholds[~np.isnan(thresholds)]
+
+    table = ThresholdSweep(values, ['A', 'B', 'C'], op=op).sweep(thresholds)
+
+    assert len(table) == 3 * len(thresholds)
+    for (unit, threshold), row in table.set_index(['unit', 'threshold'], drop=False).iterrows():
+        u = ['A', 'B', 'C'].index(unit)
+        violations, blocks = _brute_force(values[:, u], threshold, op)
+        assert row['violations'] == violations
+        assert row['blocks'] == blocks
+        assert row['pct_removed'] == pytest.approx(violations / 2000 * 100)
+
+
+def _brute_force_windows(values):
+    """For each element, the widest run around it with no strictly greater element"""
+    first, last = [], []
+    for i, v in enumerate(values):
+        lo = i
+        while lo > 0 and values[lo - 1] <= v:
+            lo -= 1
+        hi = i
+        while hi < len(values) - 1 and values[hi + 1] <= v:
+            hi += 1
+        first.append(lo)
+        last.append(hi)
+    return first, last
+
+
+@pytest.mark.parametrize('values', [
+    [3.0, 1.0, 3.0, 2.0, 2.0, 3.0, 0.0, 2.0],              # ties, equal maxima apart
+    [5.0] * 7,                                              # all equal
+    [1.0, 2.0, 2.0, 2.0, 1.0, 2.0],
+    [4.0],
+    [],
+])
+def test_max_windows_matches_brute_force(values):
+    first, last = _max_windows(np.asarray(values))
+    expected_first, expected_last = _brute_force_windows(values)
+    assert first.tolist() == expected_first
+    assert last.tolist() == expected_last
+
+
+def test_max_windows_random_ties():
+    values = np.random.default_rng(19).integers(0, 4, 300).astype(np.float64)
+    first, last = _max_windows(values)
+    expected_first, expected_last = _brute_force_windows(values.tolist())
+    assert first.tolist() == expected_first
+    assert last.tolist() == expected_last
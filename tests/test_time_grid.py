@@ -0,0 +1,56 @@
+"""
+regularize(): duplicate policy and gap insertion
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from time_grid import regularize
+
+
+def _frame(timestamps, values):
+    index = pd.DatetimeIndex(pd.to_datetime(timestamps), name='Date')
+    return pd.DataFrame({'value': np.asarray(values, dtype=np.float64)}, index=index)
+
+
+def test_duplicates_first_keeps_file_order_and_reports_the_rest():
+    data = _frame(['2024-01-01 00:00', '2024-01-01 00:15', '2024-01-01 00:15',
+                   '2024-01-01 00:30', '2024-01-01 00:15'], [1, 2, 3, 4, 5])
+    frame, grid, report = regularize(data)
+
+    np.testing.assert_array_equal(frame['value'], [1, 2, 4])
+    assert len(grid) == 3
+    assert report['duplicate_rows'] == 2
+    np.testing.assert_array_equal(report['duplicates']['value'], [3, 5])
+    assert list(report['duplicate_timestamps']) == [pd.Timestamp('2024-01-01 00:15')] * 2
+
+
+def test_duplicates_raise():
+    data = _frame(['2024-01-01 00:00', '2024-01-01 00:15', '2024-01-01 00:15'], [1, 2, 3])
+    with pytest.raises(ValueError, match='repeat a timestamp'):
+        regularize(data, duplicates='raise')
+    with pytest.raises(ValueError):
+        regularize(data, duplicates='last')
+
+
+def test_missing_slots_become_nan_rows_and_gaps():
+    step = pd.Timedelta(minutes=15)
+    start = pd.Timestamp('2024-01-01')
+    # Slots 2-4 and 7 are missing; one row is off the grid phase
+    slots = [0, 1, 5, 6, 8]
+    data = _frame([start + k * step for k in slots] + [start + 3 * step + pd.Timedelta(minutes=5)],
+                  slots + [99])
+    frame, grid, report = regularize(data)
+
+    assert len(frame) == len(grid) == 9
+    assert frame.index.equals(pd.date_range(start, periods=9, freq=step, name='Date'))
+    expected = np.full(9, np.nan)
+    expected[slots] = slots
+    np.testing.assert_array_equal(frame['value'], expected)
+
+    assert report['missing_slots'] == 4
+    assert report['off_grid_rows'] == 1
+    gaps = report['gaps']
+    assert list(gaps['start']) == [start + 2 * step, start + 7 * step]
+    assert list(gaps['end']) == [start + 4 * step, start + 7 * step]
+    assert list(gaps['missing_slots']) == [3, 1]